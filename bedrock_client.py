@@ -1,15 +1,252 @@
-import boto3
 import json
+import math
 import os
+import threading
+import time
+from llm_router import MODELS, configured_models, model_timeouts
+from telemetry import telemetry, SIZE_BUCKETS
 
 aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
 aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-region_name = os.getenv('AWS_DEFAULT_REGION', 'us-east-1') 
+region_name = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
 
-bedrock = boto3.client(
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
+# Embedding traffic is many short concurrent calls; inference is few long ones.
+# Each default can be overridden with BEDROCK_<PURPOSE>_<SETTING>, e.g.
+# BEDROCK_EMBEDDING_MAX_POOL_CONNECTIONS=64 or BEDROCK_INFERENCE_READ_TIMEOUT=600.
+CLIENT_DEFAULTS = {
+    "embedding": {
+        "max_pool_connections": max(32, int(os.getenv("EMBEDDING_WORKERS", "8")) * 2),
+        # TitanEmbeddings retries throttles itself and shrinks its concurrency
+        # limit on each one; botocore retries would hide them from it
+        "retry_mode": "standard",
+        "max_attempts": 1,
+        "connect_timeout": 5,
+        "read_timeout": 30,
+    },
+    "inference": {
+        "max_pool_connections": 10,
+        "retry_mode": "adaptive",
+        "max_attempts": 4,
+        "connect_timeout": 5,
+        "read_timeout": 300,
+    },
+}
+
+_llm_models = [model for model in configured_models() if model in MODELS]
+if len(_llm_models) > 1:
+    # LLMRouter fails over to another model faster than botocore's backoff
+    # would get a throttled one through
+    CLIENT_DEFAULTS["inference"]["max_attempts"] = 2
+# A stalled response must not outlast the router's own timeout for it
+CLIENT_DEFAULTS["inference"]["read_timeout"] = min(
+    CLIENT_DEFAULTS["inference"]["read_timeout"], math.ceil(max(model_timeouts(_llm_models or ["llama"]).values()))
+)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+class BedrockMetrics:
+    """Thread-safe per-purpose, per-model call counters and latency totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def record(self, purpose, model_id, latency, error=None, retries=0):
+        key = (purpose, model_id or "unknown")
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "calls": 0, "errors": 0, "throttles": 0, "retries": 0,
+                "total_latency": 0.0, "max_latency": 0.0
+            })
+            stats["calls"] += 1
+            stats["retries"] += retries
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            if error is not None:
+                stats["errors"] += 1
+                if is_throttling_error(error):
+                    stats["throttles"] += 1
+
+        outcome = "ok" if error is None else "throttled" if is_throttling_error(error) else "error"
+        telemetry.incr("bedrock_calls_total", purpose=purpose, model=key[1], outcome=outcome)
+        telemetry.incr("bedrock_retries_total", retries, purpose=purpose, model=key[1])
+        telemetry.observe("bedrock_call_seconds", latency, purpose=purpose, model=key[1])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                f"{purpose}:{model_id}": dict(stats, avg_latency=stats["total_latency"] / stats["calls"])
+                for (purpose, model_id), stats in self._stats.items()
+            }
+
+    def summary(self) -> str:
+        lines = []
+        for key, stats in sorted(self.snapshot().items()):
+            lines.append(
+                f"{key}: {stats['calls']} calls, avg {stats['avg_latency'] * 1000:.0f} ms, "
+                f"max {stats['max_latency'] * 1000:.0f} ms, {stats['retries']} retries, "
+                f"{stats['throttles']} throttled, {stats['errors']} errors"
+            )
+        return "\n".join(lines)
+
+
+bedrock_metrics = BedrockMetrics()
+
+
+class _TimedEventStream:
+    """Wraps a response stream body so the full streaming duration is recorded."""
+
+    def __init__(self, stream, on_done):
+        self._stream = stream
+        self._on_done = on_done
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+    def __iter__(self):
+        error = None
+        try:
+            for event in self._stream:
+                yield event
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._on_done(error)
+
+
+class InstrumentedBedrockClient:
+    """Proxy over a boto3 bedrock-runtime client that records latency, retries and throttles."""
+
+    def __init__(self, client, purpose, metrics=bedrock_metrics):
+        self._client = client
+        self.purpose = purpose
+        self.metrics = metrics
+
+    def invoke_model(self, **kwargs):
+        self._record_request(kwargs)
+        start = time.perf_counter()
+        try:
+            response = self._client.invoke_model(**kwargs)
+        except Exception as e:
+            self.metrics.record(self.purpose, kwargs.get("modelId"), time.perf_counter() - start, error=e)
+            raise
+        retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self.metrics.record(self.purpose, kwargs.get("modelId"), time.perf_counter() - start, retries=retries)
+        return response
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        self._record_request(kwargs)
+        start = time.perf_counter()
+        model_id = kwargs.get("modelId")
+        try:
+            response = self._client.invoke_model_with_response_stream(**kwargs)
+        except Exception as e:
+            self.metrics.record(self.purpose, model_id, time.perf_counter() - start, error=e)
+            raise
+        retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+
+        def on_done(error):
+            self.metrics.record(self.purpose, model_id, time.perf_counter() - start, error=error, retries=retries)
+
+        response["body"] = _TimedEventStream(response["body"], on_done)
+        return response
+
+    def _record_request(self, kwargs):
+        body = kwargs.get("body") or b""
+        telemetry.observe("bedrock_request_bytes", len(body), buckets=SIZE_BUCKETS,
+                          purpose=self.purpose, model=kwargs.get("modelId") or "unknown")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _setting(purpose, name):
+    value = os.getenv(f"BEDROCK_{purpose.upper()}_{name.upper()}")
+    return type(CLIENT_DEFAULTS[purpose][name])(value) if value else CLIENT_DEFAULTS[purpose][name]
+
+
+def create_bedrock_client(purpose="inference"):
+    """
+    Build a new bedrock-runtime client tuned for `purpose` ("embedding" or "inference").
+
+    With BEDROCK_BACKEND=fake, returns a FakeBedrockClient instead, so the
+    pipeline can run and be benchmarked without AWS.
+    """
+    if purpose not in CLIENT_DEFAULTS:
+        raise ValueError(f"Unknown Bedrock client purpose: {purpose}")
+
+    if os.getenv("BEDROCK_BACKEND", "aws") == "fake":
+        from fake_bedrock import FakeBedrockClient
+        return InstrumentedBedrockClient(FakeBedrockClient.from_env(_setting(purpose, "max_attempts")), purpose)
+
+    # boto3 takes a few hundred milliseconds to import, so it is only loaded
+    # once a client is actually needed
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        region_name=region_name,
+        max_pool_connections=_setting(purpose, "max_pool_connections"),
+        connect_timeout=_setting(purpose, "connect_timeout"),
+        read_timeout=_setting(purpose, "read_timeout"),
+        retries={"mode": _setting(purpose, "retry_mode"), "max_attempts": _setting(purpose, "max_attempts")},
+        tcp_keepalive=True
+    )
+    client = boto3.client(
         "bedrock-runtime",
         region_name=region_name,
         aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key
+        aws_secret_access_key=aws_secret_access_key,
+        config=config
     )
+    return InstrumentedBedrockClient(client, purpose)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_bedrock_client(purpose="inference"):
+    """
+    Return the shared client for `purpose`, creating it on first use.
+
+    Embedding and inference traffic get separate clients, and therefore
+    separate connection pools, so a burst of embedding calls cannot starve
+    a generation request of connections.
+    """
+    client = _clients.get(purpose)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(purpose)
+            if client is None:
+                client = _clients[purpose] = create_bedrock_client(purpose)
+    return client
+
+
+def set_bedrock_client(purpose, client):
+    """Replace the shared client for `purpose`, e.g. with a differently configured FakeBedrockClient."""
+    if purpose not in CLIENT_DEFAULTS:
+        raise ValueError(f"Unknown Bedrock client purpose: {purpose}")
+    with _clients_lock:
+        _clients[purpose] = InstrumentedBedrockClient(client, purpose)
+
 
+def __getattr__(name):
+    # Kept for callers that use the module-level client directly; created on
+    # first access rather than at import time
+    if name == "bedrock":
+        return get_bedrock_client("inference")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,126 @@
+"""
+Import-time profile of the assistant's modules.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time cli_main llm_clients --budget-ms 300
+
+Each module is imported in a fresh interpreter with `-X importtime`. The
+report shows wall time (best of --repeat runs), which heavy third-party
+packages the import pulled in, and the slowest nested imports. With
+--budget-ms, any module slower than the budget (or failing to import) makes
+the exit status 1, so the CLI prompt stays fast as dependencies grow.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "cli_main", "bedrock_client", "llm_clients", "session_engine",
+    "file_operations", "embeddings", "index_manager",
+]
+# Third-party packages that should only load once they are needed
+HEAVY_PACKAGES = ["boto3", "botocore", "langchain", "faiss", "numpy", "git", "streamlit"]
+
+RESULT_PREFIX = "IMPORT_RESULT "
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print({prefix!r} + json.dumps({{"wall_ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+
+def parse_import_times(stderr):
+    """[(cumulative_us, depth, module)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def profile_module(module):
+    """Import `module` once in a fresh interpreter; returns its result dict."""
+    command = [sys.executable, "-X", "importtime", "-c",
+               PROBE.format(module=module, heavy=HEAVY_PACKAGES, prefix=RESULT_PREFIX)]
+    # Never touch AWS while profiling, even if a module creates a client
+    env = dict(os.environ, BEDROCK_BACKEND="fake")
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            result["imports"] = parse_import_times(completed.stderr)
+            return result
+    error = completed.stderr.strip().splitlines()
+    return {"error": error[-1] if error else f"exit status {completed.returncode}"}
+
+
+def profile(module, repeat):
+    """Best wall time of `repeat` runs, with the import breakdown of that run."""
+    best = None
+    for _ in range(repeat):
+        result = profile_module(module)
+        if "error" in result:
+            return result
+        if best is None or result["wall_ms"] < best["wall_ms"]:
+            best = result
+    return best
+
+
+def slowest_imports(rows, module, top):
+    """The `top` slowest direct imports of `module`, by cumulative time."""
+    # -X importtime lists a module after everything it imports, so its
+    # subtree is the run of nested rows just before its own top-level row
+    position = max((i for i, row in enumerate(rows) if row[1] == 0 and row[2] == module), default=None)
+    children = []
+    if position is not None:
+        for cumulative, depth, name in reversed(rows[:position]):
+            if depth == 0:
+                break
+            if depth == 1:
+                children.append((cumulative, name))
+    return sorted(children, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Slowest nested imports to show per module")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if any module takes longer than this to import")
+    args = parser.parse_args()
+
+    over_budget, failed = [], []
+    print(f"{'module':<18} {'wall ms':>9}  heavy packages loaded")
+    for module in args.modules:
+        result = profile(module, args.repeat)
+        if "error" in result:
+            failed.append(module)
+            print(f"{module:<18} {'-':>9}  import failed: {result['error']}")
+            continue
+        print(f"{module:<18} {result['wall_ms']:>9.1f}  {', '.join(result['heavy']) or '-'}")
+        for cumulative, name in slowest_imports(result["imports"], module, args.top):
+            print(f"{'':<18} {cumulative / 1000:>9.1f}    {name}")
+        if args.budget_ms is not None and result["wall_ms"] > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\nOver the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+    if over_budget or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Recall vs. memory benchmark for the vector index types, run against a
+repository's own chunks.
+
+    python -m benchmarks.index_recall path/to/repo --dimensions 1024 512 256
+
+Queries are held-out chunks: they are left out of every index, so no
+configuration gets credit for finding the query itself. Ground truth is
+exact search over the remaining chunks' 1024-dimension vectors. Every chunk
+embedding goes through the persistent embedding cache, so only the first run
+against a repo pays for Bedrock calls.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+from code_processor import get_code_chunks  # noqa: E402
+from embeddings import TitanEmbeddings  # noqa: E402
+from vector_index import INDEX_TYPES, create_faiss_index, index_memory_bytes  # noqa: E402
+
+
+def recall_at_k(truth, found, k):
+    hits = sum(len(set(t[:k]) & set(f[:k])) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def run(repo_path, index_types, dimensions_list, k, query_count, seed):
+    chunks = get_code_chunks(repo_path)
+    texts = [chunk.text for chunk in chunks]
+    if not texts:
+        print(f"No chunks found in {repo_path}")
+        return []
+    print(f"{len(texts)} chunks from {repo_path}")
+
+    # Hold out up to half the chunks as queries, leaving at least k to search
+    held_out = min(query_count, len(texts) // 2, len(texts) - k)
+    if held_out < 1:
+        print(f"Too few chunks in {repo_path} for recall@{k}")
+        return []
+    rng = random.Random(seed)
+    query_ids = sorted(rng.sample(range(len(texts)), held_out))
+    queried = set(query_ids)
+    base_ids = np.array([i for i in range(len(texts)) if i not in queried], dtype='int64')
+
+    # Exact top-k at full dimensionality is the reference for every configuration
+    full = np.array(TitanEmbeddings(dimensions=1024).embed_documents(texts), dtype='float32')
+    reference, _ = create_faiss_index("flat", full.shape[1])
+    reference.add_with_ids(full[base_ids], base_ids)
+    _, truth = reference.search(full[query_ids], k)
+
+    rows = []
+    for dimensions in dimensions_list:
+        if dimensions == 1024:
+            vectors = full
+        else:
+            vectors = np.array(TitanEmbeddings(dimensions=dimensions).embed_documents(texts), dtype='float32')
+
+        for index_type in index_types:
+            index, actual_type = create_faiss_index(index_type, dimensions, vectors[base_ids])
+            index.add_with_ids(vectors[base_ids], base_ids)
+
+            start = time.perf_counter()
+            _, found = index.search(vectors[query_ids], k)
+            latency = (time.perf_counter() - start) / len(query_ids)
+
+            rows.append({
+                "index_type": actual_type,
+                "dimensions": dimensions,
+                "recall": recall_at_k(truth.tolist(), found.tolist(), k),
+                "bytes": index_memory_bytes(index),
+                "latency_ms": latency * 1000
+            })
+
+    print(f"\n{'index':<8} {'dims':>5} {'recall@' + str(k):>10} {'memory':>10} {'bytes/vec':>10} {'ms/query':>9}")
+    for row in rows:
+        print(
+            f"{row['index_type']:<8} {row['dimensions']:>5} {row['recall']:>10.3f} "
+            f"{row['bytes'] / 1e6:>8.2f}MB {row['bytes'] / len(base_ids):>10.0f} {row['latency_ms']:>9.3f}"
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo_path")
+    parser.add_argument("--index-types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--dimensions", nargs="+", type=int, default=[1024, 512, 256], choices=[256, 512, 1024])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.repo_path, args.index_types, args.dimensions, args.k, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
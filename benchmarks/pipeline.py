@@ -0,0 +1,266 @@
+"""
+End-to-end pipeline benchmark against the fake Bedrock backend:
+clone -> chunk -> embed -> FAISS index -> search -> prompt -> ask_llm -> file write -> refresh.
+
+    python -m benchmarks.pipeline --files 100 1000 5000
+    python -m benchmarks.pipeline --files 100 1000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline --files 100 1000 --baseline benchmarks/baseline.json
+
+Each repo size runs in its own subprocess so peak memory is measured per
+size. No AWS access is needed; latency and throttling of the fake backend are
+set with --latency-ms, --token-latency-ms and --throttle-rate. With
+--baseline, metrics that got worse by more than --tolerance are flagged and
+the exit status is 1.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+# Metric -> True if higher is better
+METRICS = {
+    "clone_s": False,
+    "chunk_s": False,
+    "index_s": False,
+    "index_files_per_s": True,
+    "index_chunks_per_s": True,
+    "save_s": False,
+    "search_p50_ms": False,
+    "search_p95_ms": False,
+    "search_p99_ms": False,
+    "llm_p50_ms": False,
+    "llm_p95_ms": False,
+    "first_token_p50_ms": False,
+    "refresh_p50_ms": False,
+    "prompt_tokens_mean": False,
+    "prompt_tokens_max": False,
+    "peak_rss_mb": False,
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_queries(symbols, count, edit_every=5):
+    """Questions about repo symbols; every `edit_every`-th asks for an edit so files get written."""
+    templates = [
+        "How does {symbol} work?",
+        "Where is `{symbol}` defined and who calls it?",
+        "What happens when {symbol} gets an empty list?",
+        "Explain the error handling around {symbol}",
+    ]
+    queries = []
+    for number in range(count):
+        symbol = symbols[(number * 7919) % len(symbols)]
+        if edit_every and number % edit_every == edit_every - 1:
+            queries.append(f"Edit {symbol} to log its arguments")
+        else:
+            queries.append(templates[number % len(templates)].format(symbol=symbol))
+    return queries
+
+
+def run_pipeline(files, query_count, seed, workdir):
+    """Run the whole pipeline once in this process and return its metrics."""
+    from benchmarks.synthetic_repo import make_synthetic_repo
+    from bedrock_client import bedrock_metrics
+    from code_processor import get_code_chunks
+    from embeddings import TitanEmbeddings
+    from github_fetcher import clone_repo
+    from index_manager import IncrementalIndexManager
+    from llm_clients import ask_llm
+    from prompt_builder import PromptBuilder, estimate_tokens
+
+    source_path = os.path.join(workdir, "source")
+    repo_path = os.path.join(workdir, "clone")
+    symbols = make_synthetic_repo(source_path, files, seed)
+    bedrock_metrics.reset()
+    metrics = {"files": files}
+
+    start = time.perf_counter()
+    clone_repo(source_path, repo_path)
+    metrics["clone_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_count = len(get_code_chunks(repo_path))
+    metrics["chunk_s"] = time.perf_counter() - start
+    metrics["chunks"] = chunk_count
+
+    # No embedding cache, so every chunk costs a (fake) Bedrock call
+    index_manager = IncrementalIndexManager(repo_path, TitanEmbeddings(cache=False))
+    start = time.perf_counter()
+    index_manager.build()
+    metrics["index_s"] = time.perf_counter() - start
+    metrics["index_files_per_s"] = files / metrics["index_s"]
+    metrics["index_chunks_per_s"] = chunk_count / metrics["index_s"]
+
+    start = time.perf_counter()
+    index_manager.save()
+    metrics["save_s"] = time.perf_counter() - start
+
+    prompt_builder = PromptBuilder()
+    search_times, llm_times, first_token_times, refresh_times, prompt_tokens = [], [], [], [], []
+    for query in make_queries(symbols, query_count):
+        start = time.perf_counter()
+        chunks = index_manager.search(query, k=16)
+        search_times.append(time.perf_counter() - start)
+
+        context, prompt, _ = prompt_builder.build(query, chunks, [])
+        prompt_tokens.append(estimate_tokens(context + prompt))
+
+        first_token = []
+
+        def on_token(token):
+            if not first_token:
+                first_token.append(time.perf_counter())
+
+        changes = []
+        start = time.perf_counter()
+        ask_llm(context, prompt, repo_path, changes, on_token=on_token)
+        llm_times.append(time.perf_counter() - start)
+        if first_token:
+            first_token_times.append(first_token[0] - start)
+
+        if changes:
+            start = time.perf_counter()
+            index_manager.refresh([change.path for change in changes])
+            refresh_times.append(time.perf_counter() - start)
+
+    for name, values in (("search", search_times), ("llm", llm_times)):
+        for pct in (50, 95, 99):
+            metrics[f"{name}_p{pct}_ms"] = percentile(values, pct) * 1000
+    metrics["first_token_p50_ms"] = (percentile(first_token_times, 50) or 0.0) * 1000
+    metrics["refresh_p50_ms"] = (percentile(refresh_times, 50) or 0.0) * 1000
+    metrics["edits"] = len(refresh_times)
+    metrics["prompt_tokens_mean"] = sum(prompt_tokens) / len(prompt_tokens)
+    metrics["prompt_tokens_max"] = max(prompt_tokens)
+    metrics["bedrock"] = bedrock_metrics.snapshot()
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def run_worker(files, query_count, seed):
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        metrics = run_pipeline(files, query_count, seed, workdir)
+    print(RESULT_PREFIX + json.dumps(metrics))
+
+
+def run_size(files, args):
+    env = dict(
+        os.environ,
+        BEDROCK_BACKEND="fake",
+        FAKE_BEDROCK_LATENCY_MS=str(args.latency_ms),
+        FAKE_BEDROCK_TOKEN_LATENCY_MS=str(args.token_latency_ms),
+        FAKE_BEDROCK_THROTTLE_RATE=str(args.throttle_rate),
+        FAKE_BEDROCK_SEED=str(args.seed),
+    )
+    command = [sys.executable, "-m", "benchmarks.pipeline", "--worker", str(files),
+               "--queries", str(args.queries), "--seed", str(args.seed)]
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Benchmark for {files} files failed:\n{completed.stderr[-4000:]}")
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.1f}" if abs(value) >= 10 else f"{value:.3f}"
+
+
+def print_results(results):
+    sizes = sorted(results, key=int)
+    print(f"\n{'metric':<22}" + "".join(f"{size + ' files':>16}" for size in sizes))
+    print(f"{'chunks':<22}" + "".join(f"{results[size]['chunks']:>16}" for size in sizes))
+    for metric in METRICS:
+        print(f"{metric:<22}" + "".join(f"{format_value(results[size].get(metric)):>16}" for size in sizes))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the change of every metric against the baseline.
+
+    Returns:
+        list of (files, metric, baseline value, current value) regressions
+        worse than `tolerance` (a fraction, e.g. 0.2 for 20%)
+    """
+    regressions = []
+    print(f"\n{'files':>6} {'metric':<22} {'baseline':>12} {'current':>12} {'change':>8}")
+    for size in sorted(set(results) & set(baseline), key=int):
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[size].get(metric), results[size].get(metric)
+            if old is None or new is None or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append((size, metric, old, new))
+            print(f"{size:>6} {metric:<22} {format_value(old):>12} {format_value(new):>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", help="JSON file from --save-baseline to compare against")
+    parser.add_argument("--save-baseline", help="Write these results to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.queries, args.seed)
+        return
+
+    config = {key: getattr(args, key) for key in ("queries", "seed", "latency_ms", "token_latency_ms", "throttle_rate")}
+    results = {}
+    for files in args.files:
+        print(f"Benchmarking {files} files...")
+        results[str(files)] = run_size(files, args)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"\nWarning: baseline was recorded with {baseline.get('config')}, not {config}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Deterministic synthetic repositories for benchmarks: Python, JavaScript and
+Markdown files built from a shared vocabulary, committed to a local git repo
+so they can be cloned like a real one.
+"""
+import os
+import random
+
+import git
+
+VERBS = ["load", "save", "parse", "render", "validate", "fetch", "update", "merge", "resolve", "build",
+         "compute", "index", "encode", "decode", "schedule", "notify", "register", "export"]
+NOUNS = ["user", "order", "invoice", "session", "config", "token", "report", "record", "cache", "payload",
+         "account", "event", "profile", "message", "chunk", "document", "queue", "permission"]
+
+
+def _name(rng, style="snake"):
+    verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+    if style == "camel":
+        return verb + noun.capitalize()
+    if style == "class":
+        return noun.capitalize() + verb.capitalize() + "er"
+    return f"{verb}_{noun}"
+
+
+def _python_module(rng, symbols):
+    lines = [f'"""Helpers for {rng.choice(NOUNS)} {rng.choice(NOUNS)} handling."""', "import json", ""]
+    for _ in range(rng.randint(1, 3)):
+        class_name = _name(rng, "class") + str(rng.randint(0, 999))
+        symbols.append(class_name)
+        lines += ["", f"class {class_name}:", f'    """Coordinates {rng.choice(VERBS)} steps."""', ""]
+        lines += ["    def __init__(self, store):", "        self.store = store", ""]
+        for _ in range(rng.randint(2, 6)):
+            method = _name(rng) + str(rng.randint(0, 99))
+            symbols.append(method)
+            lines += [
+                f"    def {method}(self, {rng.choice(NOUNS)}_id, options=None):",
+                f"        item = self.store.get({rng.choice(NOUNS)}_id)",
+                "        if item is None:",
+                f"            raise KeyError('missing {rng.choice(NOUNS)}')",
+                "        result = {key: value for key, value in item.items() if value is not None}",
+                f"        return json.dumps(result)  # {rng.choice(VERBS)} then {rng.choice(VERBS)}",
+                "",
+            ]
+    for _ in range(rng.randint(2, 8)):
+        function = _name(rng) + str(rng.randint(0, 999))
+        symbols.append(function)
+        lines += [
+            "",
+            f"def {function}(items, limit=10):",
+            f'    """Return up to `limit` {rng.choice(NOUNS)} entries after {rng.choice(VERBS)}."""',
+            "    selected = []",
+            "    for item in items:",
+            f"        if item.get('{rng.choice(NOUNS)}'):",
+            "            selected.append(item)",
+            "        if len(selected) >= limit:",
+            "            break",
+            "    return selected",
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _javascript_module(rng, symbols):
+    lines = []
+    for _ in range(rng.randint(2, 6)):
+        function = _name(rng, "camel") + str(rng.randint(0, 999))
+        symbols.append(function)
+        lines += [
+            f"export function {function}({rng.choice(NOUNS)}, options = {{}}) {{",
+            f"  const {rng.choice(NOUNS)}Map = new Map();",
+            f"  if (!{rng.choice(NOUNS)}) {{",
+            f"    throw new Error('cannot {rng.choice(VERBS)}');",
+            "  }",
+            "  return Object.keys(options).length;",
+            "}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _markdown_doc(rng):
+    sections = []
+    for _ in range(rng.randint(2, 4)):
+        noun = rng.choice(NOUNS)
+        sections.append(
+            f"## {noun.capitalize()}\n\n"
+            f"The {noun} service will {rng.choice(VERBS)} and {rng.choice(VERBS)} each {rng.choice(NOUNS)} "
+            f"before it is stored. See the {rng.choice(NOUNS)} module for details.\n"
+        )
+    return "# Overview\n\n" + "\n".join(sections)
+
+
+def make_synthetic_repo(path, files, seed=0):
+    """
+    Write and commit `files` source files under `path`.
+
+    Args:
+        path: Directory to create the repository in
+        files: Number of files; roughly 70% Python, 20% JavaScript, 10% Markdown
+        seed: Seed for file contents, so equal arguments give identical repos
+
+    Returns:
+        list of function and class names defined in the repo, for queries
+    """
+    rng = random.Random(seed)
+    symbols = []
+    os.makedirs(path, exist_ok=True)
+
+    for number in range(files):
+        package = os.path.join(path, f"pkg{number // 50}")
+        os.makedirs(package, exist_ok=True)
+        roll = rng.random()
+        if roll < 0.7:
+            name, content = f"{_name(rng)}_{number}.py", _python_module(rng, symbols)
+        elif roll < 0.9:
+            name, content = f"{_name(rng, 'camel')}{number}.js", _javascript_module(rng, symbols)
+        else:
+            name, content = f"{rng.choice(NOUNS)}_{number}.md", _markdown_doc(rng)
+        with open(os.path.join(package, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    repo = git.Repo.init(path)
+    repo.git.add(A=True)
+    identity = {"GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+                "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com"}
+    with repo.git.custom_environment(**identity):
+        repo.git.commit("-q", "-m", f"Synthetic repo with {files} files")
+    return symbols
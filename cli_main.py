@@ -1,68 +1,115 @@
-from github_fetcher import clone_repo
-from code_processor import get_code_chunks
-from langchain.vectorstores import FAISS
-from embeddings import TitanEmbeddings
-from llm_clients import ask_llm
-from memory import ConversationMemory
-from file_operations import RepoFileManager
+from concurrent.futures import CancelledError
+import importlib
 import os
+import threading
+from llm_router import LLMError
+from memory import ConversationMemory
+from prompt_builder import PromptBuilder
+from telemetry import start_metrics_server_from_env
+
+
+def preload_heavy_modules():
+    """Import the indexing stack (langchain, FAISS, numpy, GitPython, boto3) ahead of first use."""
+    try:
+        for module in ("embeddings", "index_manager", "session_engine"):
+            importlib.import_module(module)
+        import bedrock_client
+        bedrock_client.get_bedrock_client("inference")
+    except Exception:
+        # Any failure is raised again, with context, where the module is used
+        pass
+
+
+def main():
+    # The prompt appears immediately; the heavy imports finish while the user types
+    threading.Thread(target=preload_heavy_modules, name="preload", daemon=True).start()
+
+    start_metrics_server_from_env()
+    conversation_memory = ConversationMemory()
+    prompt_builder = PromptBuilder()
+
+    # Step 1: Get Repo URL and Repo Name from the User
+    repo_url = input("Enter the GitHub repository URL: ")
+    repo_name = input("Enter the repository name (folder name where the repo will be cloned): ")
+
+    from bedrock_client import bedrock_metrics
+    from session_engine import SessionEngine
+
+    watcher = None
+    if os.getenv("INDEX_SERVICE_URL"):
+        # Step 2-4 happen in the index service, which keeps the index loaded
+        # between sessions and shares it with other clients
+        from index_service import IndexServiceClient, RemoteIndex
+
+        client = IndexServiceClient()
+        print(f"Indexing {repo_name} in the index service at {client.base_url}...")
+        repo_path = client.add_repo(repo_name, repo_url)["path"]
+        index_manager = RemoteIndex(client, repo_name, repo_path)
+    else:
+        from embeddings import TitanEmbeddings
+        from github_fetcher import clone_repo
+        from index_manager import IncrementalIndexManager
+
+        # Step 2: Clone Repo
+        clone_repo(repo_url, repo_name)
+        repo_path = os.path.abspath(repo_name)
+
+        # Step 3 & 4: Chunk code and create vector store with LangChain,
+        # reusing the index saved next to the clone when there is one
+        embedding_model = TitanEmbeddings()
+        index_manager = IncrementalIndexManager(repo_path, embedding_model)
+        index_manager.load_or_build()
+        if os.getenv("WATCH_REPO") == "1":
+            # Edits made in an editor or by git are re-indexed as they happen
+            watcher = index_manager.watch()
+
+    print("\nInstructions:")
+    print("- Type 'exit' or 'quit' to end the session")
+    print("- The AI can modify files within the repository")
+    print("- Press Ctrl+C to cancel a response in progress")
+    print(f"- Repository base path: {repo_path}")
+
+    # Turns run on the session engine: retrieval and history are gathered
+    # concurrently and edited files are re-indexed in the background
+    engine = SessionEngine(index_manager, repo_path, conversation_memory, prompt_builder)
+
+    while True:
+        user_input = input("User: ")
+        if user_input.lower() in ["exit", "quit"]:
+            # Let a pending background re-index finish before exiting
+            engine.close()
+            if watcher is not None:
+                index_manager.stop_watching()
+            print(bedrock_metrics.summary())
+            break
+
+        # Stream the response, with file operations applied within the repository
+        print("Assistant: ", end="", flush=True)
+        streamed = []
+
+        def print_token(token):
+            streamed.append(token)
+            print(token, end="", flush=True)
+
+        try:
+            result = engine.ask(user_input, on_token=print_token)
+        except (KeyboardInterrupt, CancelledError):
+            # Ctrl+C cancels the turn in flight rather than the session
+            print("\n[cancelled]")
+            continue
+        except LLMError as e:
+            # Every model failed or timed out; the session carries on
+            print(f"\n[error] {e}")
+            continue
+
+        # Display whatever was not streamed (file update summary or an error)
+        assistant_response = result.response
+        streamed_text = "".join(streamed)
+        if assistant_response.startswith(streamed_text):
+            print(assistant_response[len(streamed_text):])
+        else:
+            print(f"\n{assistant_response}")
+
 
-conversation_memory = ConversationMemory()
-
-# Step 1: Get Repo URL and Repo Name from the User
-repo_url = input("Enter the GitHub repository URL: ")
-repo_name = input("Enter the repository name (folder name where the repo will be cloned): ")
-
-# Step 2: Clone Repo
-clone_repo(repo_url, repo_name)
-
-# Initialize file manager with absolute path
-repo_path = os.path.abspath(repo_name)
-file_manager = RepoFileManager(repo_path)
-
-# Step 3: Chunk Code
-chunks = get_code_chunks(repo_name)
-
-# Step 4: Create vector store with LangChain
-embedding_model = TitanEmbeddings()
-texts = [chunk[1] for chunk in chunks]
-metadatas = [{"path": chunk[0]} for chunk in chunks]
-vectorstore = FAISS.from_texts(texts=texts, metadatas=metadatas, embedding=embedding_model)
-
-print("\nInstructions:")
-print("- Type 'exit' or 'quit' to end the session")
-print("- The AI can modify files within the repository")
-print(f"- Repository base path: {repo_path}")
-
-while True:
-    user_input = input("User: ")
-    if user_input.lower() in ["exit", "quit"]:
-        break
-
-    # Retrieve relevant code snippets based on user input
-    query_embedding = embedding_model.embed_query(user_input)
-    relevant_docs = vectorstore.similarity_search_by_vector(query_embedding, k=20)
-    context = [(doc.metadata['path'], doc.page_content) for doc in relevant_docs]
-
-    # Combine recent history for context
-    recent_history = conversation_memory.get_recent_history()
-    history_text = ""
-    for interaction in recent_history:
-        history_text += f"User: {interaction['user_input']}\n"
-        history_text += f"Assistant: {interaction['assistant_response']}\n"
-
-    # Construct the prompt with history and current context
-    prompt = f"{history_text}\nUser: {user_input}\nContext:\n{context}\nAssistant:"
-
-    # Get response from LLM with repository path for file operations
-    assistant_response = ask_llm(context, prompt, repo_path)
-
-    # Display and store the interaction
-    print(f"Assistant: {assistant_response}")
-    conversation_memory.add_interaction(user_input, context, assistant_response)
-
-    # Refresh code chunks after potential modifications
-    chunks = get_code_chunks(repo_name)
-    texts = [chunk[1] for chunk in chunks]
-    metadatas = [{"path": chunk[0]} for chunk in chunks]
-    vectorstore = FAISS.from_texts(texts=texts, metadatas=metadatas, embedding=embedding_model)
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,203 @@
+import ast
+import hashlib
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple, Optional
+from repo_scanner import (DEFAULT_EXCLUDES, DEFAULT_EXTENSIONS, DEFAULT_MAX_FILE_SIZE, IgnoreRules,
+                          decode_source, iter_source_files, read_source_bytes)
+
+# Bump when chunk boundaries change so saved indexes get rebuilt
+CHUNKER_VERSION = "syntax-1"
+
+JS_BOUNDARY = re.compile(
+    r"^(export\s+)?(default\s+)?("
+    r"(async\s+)?function\b|"
+    r"(abstract\s+)?class\b|"
+    r"(interface|type|enum|namespace)\s+\w+|"
+    r"(const|let|var)\s+\w+\s*(:[^=]+)?=\s*(async\s*)?(\(|function\b|\w+\s*=>)"
+    r")"
+)
+MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+COMMENT_LINE = re.compile(r"^\s*(#|//|/\*|\*)")
+
+
+class CodeChunk(NamedTuple):
+    path: str
+    text: str
+    start_line: int  # 1-based, inclusive
+    end_line: int  # 1-based, inclusive
+
+
+class FileChunks(NamedTuple):
+    """Chunks of one file, with the identity of the bytes they were cut from."""
+    chunks: list
+    hash: Optional[str]  # SHA-1 of the bytes read, None if the file was not read
+    mtime: Optional[float]  # taken before reading, None if the file was not read
+
+
+def _python_boundaries(text, lines):
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+
+    def node_start(node):
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [d.lineno for d in decorators]) - 1
+
+    boundaries = set()
+    for node in tree.body:
+        boundaries.add(node_start(node))
+        # Methods get their own boundaries so oversized classes split cleanly
+        if isinstance(node, ast.ClassDef):
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    boundaries.add(node_start(child))
+    return boundaries
+
+
+def _scan_boundaries(lines, pattern):
+    return {i for i, line in enumerate(lines) if pattern.match(line)}
+
+
+def _attach_leading_comments(boundaries, lines):
+    # Keep the comment block directly above a definition with that definition
+    adjusted = set()
+    for start in boundaries:
+        while start > 0 and COMMENT_LINE.match(lines[start - 1]):
+            start -= 1
+        adjusted.add(start)
+    return adjusted
+
+
+def _line_windows(lines, start, end, chunk_size):
+    """Split lines[start:end] into (start, end) windows of at most chunk_size chars."""
+    windows = []
+    window_start, size = start, 0
+    for i in range(start, end):
+        line_size = len(lines[i])
+        if size and size + line_size > chunk_size:
+            windows.append((window_start, i))
+            window_start, size = i, 0
+        size += line_size
+    if window_start < end:
+        windows.append((window_start, end))
+    return windows
+
+
+def split_text(path, text, chunk_size=1500, overlap=0):
+    """
+    Split a file into chunks along function, class and heading boundaries.
+
+    Python is parsed with `ast`; JS/TS definitions and Markdown headings are
+    found with a line scanner. Adjacent small definitions are packed together
+    up to `chunk_size` characters, and definitions larger than that fall back
+    to line windows. `overlap` repeats that many preceding lines at the start
+    of every chunk after the first.
+
+    Returns:
+        list of CodeChunk
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    suffix = Path(path).suffix
+    boundaries = None
+    if suffix == ".py":
+        boundaries = _python_boundaries(text, lines)
+    elif suffix in (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"):
+        boundaries = _scan_boundaries(lines, JS_BOUNDARY)
+    elif suffix == ".md":
+        boundaries = _scan_boundaries(lines, MARKDOWN_HEADING)
+    boundaries = _attach_leading_comments(boundaries or set(), lines) | {0}
+
+    cuts = sorted(boundaries) + [len(lines)]
+    segments = [(cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1) if cuts[i] < cuts[i + 1]]
+
+    # Pack whole segments up to chunk_size, windowing any segment that is too big
+    spans = []
+    current_start, current_end, current_size = None, None, 0
+    for start, end in segments:
+        size = sum(len(lines[i]) for i in range(start, end))
+        if size > chunk_size:
+            if current_start is not None:
+                spans.append((current_start, current_end))
+                current_start, current_size = None, 0
+            spans.extend(_line_windows(lines, start, end, chunk_size))
+            continue
+        if current_start is not None and current_size + size > chunk_size:
+            spans.append((current_start, current_end))
+            current_start, current_size = None, 0
+        if current_start is None:
+            current_start = start
+        current_end, current_size = end, current_size + size
+    if current_start is not None:
+        spans.append((current_start, current_end))
 
-def get_code_chunks(repo_path, extensions=(".py", ".js", ".ts",".md"), chunk_size=500):
     chunks = []
-    for file_path in Path(repo_path).rglob("*"):
-        if file_path.suffix in extensions:
-            text = file_path.read_text(errors="ignore")
-            for i in range(0, len(text), chunk_size):
-                chunk = text[i:i + chunk_size]
-                chunks.append((str(file_path), chunk))
+    for index, (start, end) in enumerate(spans):
+        if index and overlap:
+            span_start = start
+            start = max(0, start - overlap)
+            # Overlap never pushes a chunk past the size limit
+            while start < span_start and sum(len(line) for line in lines[start:end]) > chunk_size:
+                start += 1
+        chunk_text = "".join(lines[start:end])
+        # A single line longer than chunk_size (e.g. minified code) is sliced by characters
+        for offset in range(0, len(chunk_text), max(chunk_size, 1)):
+            piece = chunk_text[offset:offset + chunk_size]
+            if piece.strip():
+                chunks.append(CodeChunk(str(path), piece, start + 1, end))
     return chunks
+
+
+def chunk_file(file_path, chunk_size=1500, overlap=0, max_file_size=DEFAULT_MAX_FILE_SIZE) -> FileChunks:
+    """
+    Chunk one file; binary, minified, oversized or unreadable files yield no chunks.
+
+    The hash is of the same bytes that were chunked, so an index recording
+    it can never pair a newer version of the file with older chunks.
+    """
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return FileChunks([], None, None)
+    data = read_source_bytes(file_path, max_file_size)
+    if data is None:
+        return FileChunks([], None, None)
+    text = decode_source(data)
+    chunks = split_text(file_path, text, chunk_size, overlap) if text is not None else []
+    return FileChunks(chunks, hashlib.sha1(data).hexdigest(), mtime)
+
+def iter_file_chunks(file_paths, chunk_size=1500, overlap=0, max_file_size=DEFAULT_MAX_FILE_SIZE, workers=8):
+    """
+    Read and chunk files on a worker pool, yielding (path, FileChunks) per file in input order.
+
+    Only a bounded window of files is read ahead, so memory stays flat and
+    the consumer can start embedding while later files are still being read.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file_path in file_paths:
+            pending.append((file_path, executor.submit(chunk_file, file_path, chunk_size, overlap, max_file_size)))
+            if len(pending) >= workers * 4:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+def iter_code_chunks(repo_path, extensions=DEFAULT_EXTENSIONS, chunk_size=1500, overlap=0,
+                     exclude=DEFAULT_EXCLUDES, max_file_size=DEFAULT_MAX_FILE_SIZE, workers=8):
+    """Stream CodeChunks for a repository, honoring .gitignore and `exclude` patterns."""
+    file_paths = iter_source_files(repo_path, extensions, IgnoreRules(repo_path, exclude))
+    for _, file_chunks in iter_file_chunks(file_paths, chunk_size, overlap, max_file_size, workers):
+        yield from file_chunks.chunks
+
+def get_code_chunks(repo_path, extensions=DEFAULT_EXTENSIONS, chunk_size=1500, overlap=0,
+                    exclude=DEFAULT_EXCLUDES):
+    return list(iter_code_chunks(repo_path, extensions, chunk_size, overlap, exclude))
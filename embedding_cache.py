@@ -0,0 +1,125 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "zwi_coding_assistant", "embeddings.sqlite")
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed store of embedding vectors backed by SQLite.
+
+    Entries are keyed by a hash of model id, dimensions and text, so identical
+    chunks are embedded once across turns, sessions and repository clones.
+    The cache is bounded by entry count and evicts least recently used rows.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 500_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_ENTRIES."""
+        path = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+        return cls(path, max_entries)
+
+    @staticmethod
+    def make_key(model_id: str, dimensions: int, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{dimensions}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        """Return {key: vector} for the keys that are cached."""
+        found = {}
+        if not keys:
+            return found
+
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict):
+        """Store {key: vector} and evict the least recently used entries if over the bound."""
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, array('f', vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, vector):
+        self.put_many({key: vector})
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        # Evict a little extra so we don't run a DELETE on every insert near the bound
+        overflow += self.max_entries // 20
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (overflow,)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,22 +1,162 @@
 import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.embeddings.base import Embeddings
-from bedrock_client import bedrock
+from bedrock_client import get_bedrock_client, is_throttling_error
+from embedding_cache import EmbeddingCache
+from telemetry import telemetry
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight Bedrock calls. The limit halves whenever a call is throttled
+    and grows back by one after a run of successful calls, so the pool settles
+    at whatever rate the account quota allows.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self.limit < self.max_limit and self._successes >= self.limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
 
 class TitanEmbeddings(Embeddings):
-    def embed_documents(self, texts):
-        return [self._get_titan_embedding(text) for text in texts]
+    def __init__(self, model_id="amazon.titan-embed-text-v2:0", dimensions=None, cache=None,
+                 max_workers=None, max_retries=6):
+        """
+        Args:
+            model_id: Bedrock embedding model id
+            dimensions: Output vector size requested from Titan: 256, 512 or
+                1024 (default: EMBEDDING_DIMENSIONS or 1024). Smaller vectors
+                cut index memory at some cost in recall.
+            cache: EmbeddingCache to use; None builds one from the environment,
+                False disables caching
+            max_workers: Concurrent Bedrock calls when embedding documents
+                (default: EMBEDDING_WORKERS or 8)
+            max_retries: Attempts per text before a throttling error is raised
+        """
+        self.model_id = model_id
+        self.dimensions = dimensions or int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+        if self.dimensions not in (256, 512, 1024):
+            raise ValueError(f"Titan supports 256, 512 or 1024 dimensions, got {self.dimensions}")
+        self.cache = EmbeddingCache.from_env() if cache is None else (cache or None)
+        self.max_workers = max_workers or int(os.getenv("EMBEDDING_WORKERS", "8"))
+        self.max_retries = max_retries
+        self.limiter = AdaptiveConcurrencyLimiter(self.max_workers)
+
+    def embed_documents(self, texts, progress_callback=None):
+        """
+        Embed texts concurrently, preserving input order.
+
+        Args:
+            texts: Texts to embed
+            progress_callback: Optional callable(done, total), invoked from the
+                calling thread as embeddings complete
+        """
+        with telemetry.span("embed", model=self.model_id, texts=len(texts)) as span:
+            return self._embed_documents(texts, progress_callback, span)
+
+    def _embed_documents(self, texts, progress_callback, span):
+        total = len(texts)
+        keys = [EmbeddingCache.make_key(self.model_id, self.dimensions, text) for text in texts]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in pending:
+                pending[key] = text
+
+        hits = sum(1 for key in keys if key in cached)
+        if self.cache is not None:
+            telemetry.incr("cache_requests_total", hits, cache="embedding", result="hit")
+            telemetry.incr("cache_requests_total", total - hits, cache="embedding", result="miss")
+        span.set(cache_hits=hits, embedded=len(pending))
+
+        done = total - sum(1 for key in keys if key in pending)
+        if progress_callback:
+            progress_callback(done, total)
+
+        computed = {}
+        if pending:
+            counts = {}
+            for key in keys:
+                if key in pending:
+                    counts[key] = counts.get(key, 0) + 1
+
+            workers = min(self.max_workers, len(pending))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._embed_with_backoff, text): key
+                    for key, text in pending.items()
+                }
+                unsaved = {}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    computed[key] = unsaved[key] = future.result()
+                    done += counts[key]
+                    if progress_callback:
+                        progress_callback(done, total)
+                    if self.cache is not None and len(unsaved) >= 64:
+                        self.cache.put_many(unsaved)
+                        unsaved = {}
+                if self.cache is not None:
+                    self.cache.put_many(unsaved)
+
+        return [cached[key] if key in cached else computed[key] for key in keys]
 
     def embed_query(self, text):
-        return self._get_titan_embedding(text)
+        return self.embed_documents([text])[0]
+
+    def _embed_with_backoff(self, text):
+        for attempt in range(self.max_retries):
+            self.limiter.acquire()
+            try:
+                embedding = self._get_titan_embedding(text)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                self.limiter.release(throttled=throttled)
+                if not throttled or attempt == self.max_retries - 1:
+                    raise
+                # Exponential backoff with jitter so workers don't retry in lockstep
+                time.sleep(min(20.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+            else:
+                self.limiter.release()
+                return embedding
 
     def _get_titan_embedding(self, text):
-        response = bedrock.invoke_model(
-            modelId="amazon.titan-embed-text-v2:0",
+        response = get_bedrock_client("embedding").invoke_model(
+            modelId=self.model_id,
             body=json.dumps({
                 "inputText": text,
-                "dimensions": 1024,
+                "dimensions": self.dimensions,
                 "normalize": True
             })
         )
         result = json.loads(response['body'].read())
-        return result['embedding']
\ No newline at end of file
+        telemetry.incr("bedrock_tokens_total", result.get("inputTextTokenCount", 0),
+                       model=self.model_id, direction="input")
+        return result['embedding']
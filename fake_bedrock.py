@@ -0,0 +1,164 @@
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from lexical_index import tokenize
+
+SNIPPET_HEADER = re.compile(r"^### (\S+) \(lines \d+-\d+\)$", re.MULTILINE)
+
+
+def fake_embedding(text, dimensions=1024):
+    """
+    Deterministic unit vector for `text`: a hashed bag of its code tokens, so
+    texts sharing identifiers land near each other and search stays meaningful.
+    """
+    vector = [0.0] * dimensions
+    for token in tokenize(text) or [text]:
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def fake_completion(prompt):
+    """
+    Deterministic reply to a generation prompt. Requests mentioning "edit"
+    get a <file_edit> appending a line to the first code snippet's file, so
+    the file-writing path is exercised too.
+    """
+    request = prompt.rsplit("User request:", 1)[-1].strip()
+    paths = SNIPPET_HEADER.findall(prompt)
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+    reply = f"Reviewed {len(paths)} snippets for: {request[:200]}\nReference: {digest}\n"
+    if paths:
+        reply += "Most relevant files:\n" + "\n".join(f"- {path}" for path in dict.fromkeys(paths)) + "\n"
+    if paths and "edit" in request.lower():
+        reply += (
+            f'<file_edit path="{paths[0]}">\n<<<<<<< SEARCH\n=======\n'
+            f'# edited by fake backend {digest}\n>>>>>>> REPLACE\n</file_edit>\n'
+        )
+    return reply
+
+
+class FakeBedrockClient:
+    """
+    Stand-in for a bedrock-runtime client that needs no AWS access.
+
+    Titan embedding calls return fake_embedding vectors; Llama and Claude
+    calls return fake_completion text in each model's response format,
+    buffered or streamed. Every call sleeps for a configurable latency and
+    may be throttled. Like botocore, throttled calls are retried up to
+    `max_attempts` times before a ThrottlingException is raised, so retry
+    and backoff paths behave as they would against the real service.
+    """
+
+    def __init__(self, latency=0.02, jitter=0.25, token_latency=0.0, throttle_rate=0.0, seed=0,
+                 max_attempts=1):
+        """
+        Args:
+            latency: Seconds each call takes before responding
+            jitter: Random +/- fraction applied to latency
+            token_latency: Seconds between streamed fragments
+            throttle_rate: Probability in [0, 1) that a call is throttled
+            seed: Seed for jitter and throttling decisions
+            max_attempts: Tries per call, including the first, before a
+                throttling error reaches the caller
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.throttle_rate = throttle_rate
+        self.max_attempts = max(1, max_attempts)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, max_attempts=1):
+        """Configure from FAKE_BEDROCK_LATENCY_MS, _TOKEN_LATENCY_MS, _THROTTLE_RATE and _SEED."""
+        return cls(
+            latency=float(os.getenv("FAKE_BEDROCK_LATENCY_MS", "20")) / 1000,
+            token_latency=float(os.getenv("FAKE_BEDROCK_TOKEN_LATENCY_MS", "0")) / 1000,
+            throttle_rate=float(os.getenv("FAKE_BEDROCK_THROTTLE_RATE", "0")),
+            seed=int(os.getenv("FAKE_BEDROCK_SEED", "0")),
+            max_attempts=max_attempts
+        )
+
+    def invoke_model(self, modelId, body, **kwargs):
+        retries = self._wait(modelId, "InvokeModel")
+        request = json.loads(body)
+        if "inputText" in request:
+            result = {
+                "embedding": fake_embedding(request["inputText"], request.get("dimensions", 1024)),
+                "inputTextTokenCount": len(request["inputText"]) // 4
+            }
+            usage = (result["inputTextTokenCount"], 0)
+        else:
+            prompt = self._prompt(request)
+            text = fake_completion(prompt)
+            if "messages" in request:
+                result = {"content": [{"type": "text", "text": text}]}
+            else:
+                result = {"generation": text}
+            usage = (len(prompt) // 4, len(text) // 4)
+        response = self._response(io.BytesIO(json.dumps(result).encode("utf-8")), retries)
+        response["ResponseMetadata"]["HTTPHeaders"] = {
+            "x-amzn-bedrock-input-token-count": str(usage[0]),
+            "x-amzn-bedrock-output-token-count": str(usage[1])
+        }
+        return response
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        retries = self._wait(modelId, "InvokeModelWithResponseStream")
+        request = json.loads(body)
+        prompt = self._prompt(request)
+        return self._response(self._events(prompt, fake_completion(prompt), claude="messages" in request), retries)
+
+    def _events(self, prompt, text, claude):
+        fragments = [fragment for fragment in re.findall(r"\S*\s*", text) if fragment]
+        for number, fragment in enumerate(fragments, 1):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            if claude:
+                data = {"type": "content_block_delta", "delta": {"type": "text_delta", "text": fragment}}
+            else:
+                data = {"generation": fragment}
+            if number == len(fragments):
+                # Bedrock reports token usage on the last chunk of a stream
+                data["amazon-bedrock-invocationMetrics"] = {
+                    "inputTokenCount": len(prompt) // 4,
+                    "outputTokenCount": len(text) // 4
+                }
+            yield {"chunk": {"bytes": json.dumps(data).encode("utf-8")}}
+
+    def _prompt(self, request):
+        if "messages" in request:
+            return "\n".join(
+                block.get("text", "") for message in request["messages"] for block in message["content"]
+            )
+        return request.get("prompt", "")
+
+    def _wait(self, model_id, operation):
+        """Sleep through the call's attempts; returns the retry count or raises when all are throttled."""
+        for attempt in range(self.max_attempts):
+            with self._lock:
+                throttled = self._random.random() < self.throttle_rate
+                delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            time.sleep(max(0.0, delay))
+            if not throttled:
+                return attempt
+        from botocore.exceptions import ClientError
+        raise ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": f"Rate exceeded for {model_id}"},
+             "ResponseMetadata": {"HTTPStatusCode": 429, "RetryAttempts": self.max_attempts - 1}},
+            operation
+        )
+
+    def _response(self, body, retries=0):
+        return {"body": body, "ResponseMetadata": {"HTTPStatusCode": 200, "RetryAttempts": retries}}
@@ -1,13 +1,40 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 import difflib
 import hashlib
+import shutil
+import tempfile
+import uuid
+
+# Minimum similarity for a search block to match file lines that differ from it
+FUZZY_MATCH_THRESHOLD = 0.85
+# Shortest search block (in lines) that may be located by fuzzy match
+FUZZY_MIN_LINES = 2
+# Permissions for files created by commit_changes (existing files keep theirs)
+NEW_FILE_MODE = 0o644
 
 class FileOperationError(Exception):
     """Custom exception for file operation errors"""
     pass
 
+class EditHunk(NamedTuple):
+    """Replace the lines `search` with `replace`; an empty search creates or appends to the file."""
+    search: str
+    replace: str
+    # 1-based line where the hunk is expected (from a unified diff header), or None
+    line_hint: Optional[int] = None
+
+class FileChange(NamedTuple):
+    """One file written by RepoFileManager.commit_changes."""
+    path: str  # absolute
+    action: str  # "created" or "updated"
+    old_hash: Optional[str]  # SHA-1 of the previous bytes, None for a new file
+    new_hash: str  # SHA-1 of the bytes written
+    # 1-based inclusive (start, end) line ranges of the new file that changed;
+    # a range with end < start marks lines deleted just before `start`
+    line_ranges: list
+
 class RepoFileManager:
     def __init__(self, repo_base_path: str = None):
         if repo_base_path is None:
@@ -61,6 +88,7 @@ class RepoFileManager:
         - Shows a diff if the file already exists
         - Handles encoding issues
         - Prevents accidental writes to critical system files
+        - Replaces the file atomically (see commit_changes)
 
         Args:
             file_path: Path to the file (absolute or relative to repo)
@@ -72,59 +100,196 @@ class RepoFileManager:
         Raises:
             FileOperationError: If write operation cannot be performed safely
         """
-        try:
-            # Validate and normalize path
-            abs_path = self.validate_path(file_path)
+        self.commit_changes(updates=[(file_path, content)])
+        return True
+
+    def check_not_sensitive(self, abs_path: str):
+        if any(keyword in abs_path.lower() for keyword in [
+            'passwd', 'shadow', 'hosts', 'sudoers', '.ssh', '.aws',
+            '.env', 'credential', '.git', '.github'
+        ]):
+            raise FileOperationError(f"Cannot modify potentially sensitive file: {abs_path}")
+
+    def apply_edits(self, file_path: str, hunks) -> bool:
+        """
+        Apply search/replace hunks to a file and write it atomically.
+
+        Each hunk's search text is located exactly if possible, then ignoring
+        trailing whitespace, then ignoring indentation (the replacement is
+        re-indented to match), and finally by fuzzy line similarity of at
+        least FUZZY_MATCH_THRESHOLD for blocks of FUZZY_MIN_LINES or more.
+        Matches always cover whole lines. All hunks must match before
+        anything is written, so a file is never left half-edited.
+
+        Args:
+            file_path: Path to the file (absolute or relative to repo)
+            hunks: EditHunk sequence, applied in order
+
+        Returns:
+            bool: True if write was successful
+
+        Raises:
+            FileOperationError: If the path is not writable or a hunk matches nowhere
+        """
+        self.commit_changes(edits=[(file_path, hunks)])
+        return True
+
+    def commit_changes(self, updates=(), edits=()) -> list:
+        """
+        Apply full-file updates and search/replace edits as one transaction.
+
+        All new contents are computed and checked in memory first. Each is
+        then written to a temp file beside its target and fsynced, and the
+        temp files are renamed over their targets. If any step fails, files
+        already replaced are restored and newly created ones removed, so
+        either every file changes or none does.
+
+        Args:
+            updates: (file_path, content) pairs replacing whole files
+            edits: (file_path, [EditHunk]) pairs, applied after the updates
+
+        Returns:
+            list: FileChange for each file whose content changed, in the
+                order the files were first named
+
+        Raises:
+            FileOperationError: If a path is not writable, an edit matches
+                nowhere or a write fails; the repository is left unchanged
+        """
+        staged = self._stage_changes(updates, edits)
+
+        changes, contents = [], {}
+        for abs_path, (existed, old_content, new_content) in staged.items():
+            if existed and old_content == new_content:
+                print(f" No changes needed for file: {abs_path}")
+                continue
+            if old_content is not None:
+                diff = difflib.unified_diff(
+                    old_content.splitlines(keepends=True),
+                    new_content.splitlines(keepends=True),
+                    fromfile=f"a/{os.path.basename(abs_path)}",
+                    tofile=f"b/{os.path.basename(abs_path)}"
+                )
+                print(f"\nChanges for {abs_path}:\n{''.join(diff)}")
+            elif existed:
+                print(f" Warning: Overwriting possibly binary file: {abs_path}")
+            data = new_content.encode('utf-8')
+            contents[abs_path] = data
+            changes.append(FileChange(
+                path=abs_path,
+                action="updated" if existed else "created",
+                old_hash=_file_hash(abs_path) if existed else None,
+                new_hash=hashlib.sha1(data).hexdigest(),
+                line_ranges=changed_line_ranges(old_content or "", new_content)
+            ))
 
-            # Additional safety checks for critical files
-            if any(keyword in abs_path.lower() for keyword in [
-                'passwd', 'shadow', 'hosts', 'sudoers', '.ssh', '.aws',
-                '.env', 'credential', '.git', '.github'
-            ]):
-                raise FileOperationError(f"Cannot modify potentially sensitive file: {abs_path}")
+        if contents:
+            self._replace_files(contents)
+            for change in changes:
+                print(f" Successfully wrote to file: {change.path} (SHA1: {change.new_hash})")
+        return changes
 
-            # Check if this would overwrite an existing file
-            existing_content = None
-            if os.path.exists(abs_path):
+    def _stage_changes(self, updates, edits) -> dict:
+        """Final content per file: abs path -> (existed, old text or None if unreadable, new text)."""
+        staged = {}
+
+        def current(file_path):
+            abs_path = self.validate_path(file_path)
+            self.check_not_sensitive(abs_path)
+            if abs_path not in staged:
                 try:
                     with open(abs_path, 'r', encoding='utf-8') as f:
-                        existing_content = f.read()
-
-                    # If content is identical, no need to write
-                    if existing_content == content:
-                        print(f" No changes needed for file: {abs_path}")
-                        return True
-
-                    # Generate and log the diff
-                    diff = difflib.unified_diff(
-                        existing_content.splitlines(keepends=True),
-                        content.splitlines(keepends=True),
-                        fromfile=f"a/{os.path.basename(abs_path)}",
-                        tofile=f"b/{os.path.basename(abs_path)}"
-                    )
-                    print(f"\nChanges for {abs_path}:\n{''.join(diff)}")
+                        content = f.read()
+                    staged[abs_path] = (True, content, content)
+                except FileNotFoundError:
+                    staged[abs_path] = (False, None, None)
                 except UnicodeDecodeError:
-                    # If we can't read the existing file as text, just note that we'll overwrite binary
-                    print(f" Warning: Overwriting possibly binary file: {abs_path}")
+                    staged[abs_path] = (True, None, None)
+                except OSError as e:
+                    raise FileOperationError(f"Error reading file {abs_path}: {str(e)}")
+            return abs_path, staged[abs_path]
+
+        for file_path, content in updates:
+            abs_path, (existed, old_content, _) = current(file_path)
+            staged[abs_path] = (existed, old_content, content)
+
+        for file_path, hunks in edits:
+            abs_path, (existed, old_content, content) = current(file_path)
+            if content is None:
+                if existed:
+                    raise FileOperationError(f"Cannot edit non-text file: {abs_path}")
+                if any(hunk.search.strip() for hunk in hunks):
+                    raise FileOperationError(f"Cannot edit missing file: {abs_path}")
+                content = ""
+            for number, hunk in enumerate(hunks, 1):
+                updated = apply_hunk(content, hunk)
+                if updated is None:
+                    preview = "\n".join(hunk.search.splitlines()[:5])
+                    raise FileOperationError(
+                        f"Edit {number} of {len(hunks)} does not match {abs_path}:\n{preview}"
+                    )
+                content = updated
+            staged[abs_path] = (existed, old_content, content)
+
+        return staged
 
-            # Create directory if it doesn't exist
-            directory = os.path.dirname(abs_path)
-            if directory:
+    def _replace_files(self, contents: dict):
+        """Write {abs_path: bytes} through fsynced temp files and renames, rolling back on failure."""
+        temp_paths, backups, replaced, created_dirs = {}, {}, [], []
+        try:
+            for abs_path, data in contents.items():
+                directory = os.path.dirname(abs_path)
+                missing = []
+                parent = directory
+                while parent and not os.path.isdir(parent):
+                    missing.append(parent)
+                    parent = os.path.dirname(parent)
                 Path(directory).mkdir(parents=True, exist_ok=True)
+                created_dirs.extend(reversed(missing))
 
-            # Write the content to the file
-            with open(abs_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(abs_path)}.", suffix=".tmp")
+                temp_paths[abs_path] = temp_path
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(abs_path):
+                    shutil.copymode(abs_path, temp_path)
+                else:
+                    os.chmod(temp_path, NEW_FILE_MODE)
 
-            # Generate file hash for verification
-            content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-            print(f" Successfully wrote to file: {abs_path} (MD5: {content_hash})")
-            return True
+            for abs_path, temp_path in temp_paths.items():
+                if os.path.exists(abs_path):
+                    backups[abs_path] = _backup_file(abs_path)
+                os.replace(temp_path, abs_path)
+                replaced.append(abs_path)
+
+            for directory in {os.path.dirname(abs_path) for abs_path in contents}:
+                _fsync_directory(directory)
 
-        except FileOperationError:
-            raise
         except Exception as e:
-            raise FileOperationError(f"Error writing to file {file_path}: {str(e)}")
+            for abs_path in reversed(replaced):
+                try:
+                    if abs_path in backups:
+                        os.replace(backups.pop(abs_path), abs_path)
+                    else:
+                        os.remove(abs_path)
+                except OSError as rollback_error:
+                    print(f" Failed to roll back {abs_path}: {rollback_error}")
+            for temp_path in temp_paths.values():
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            for directory in reversed(created_dirs):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+            raise FileOperationError(f"Error writing files, no changes were kept: {str(e)}")
+
+        finally:
+            for backup in backups.values():
+                if os.path.exists(backup):
+                    os.remove(backup)
 
     def read_file(self, file_path: str) -> Optional[str]:
         try:
@@ -161,3 +326,188 @@ class RepoFileManager:
             return os.path.relpath(abs_path, self.repo_base_path)
         except ValueError:
             return abs_path
+
+
+def changed_line_ranges(old_content: str, new_content: str) -> list:
+    """Line ranges of `new_content` that differ from `old_content`, as in FileChange.line_ranges."""
+    matcher = difflib.SequenceMatcher(
+        None, old_content.splitlines(), new_content.splitlines(), autojunk=False
+    )
+    return [
+        (j1 + 1, j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def format_line_ranges(line_ranges) -> str:
+    """Human-readable form of FileChange.line_ranges, e.g. "lines 3-5, 9"."""
+    parts = []
+    for start, end in line_ranges:
+        if end < start:
+            parts.append(f"{start} (deleted)")
+        elif end == start:
+            parts.append(str(start))
+        else:
+            parts.append(f"{start}-{end}")
+    return "lines " + ", ".join(parts) if parts else "no line changes"
+
+
+def _file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _backup_file(path: str) -> str:
+    """Keep the current version of `path` under a hidden name beside it, for rollback."""
+    backup = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.bak")
+    try:
+        # A hard link keeps the old inode without copying; os.replace then swaps the name
+        os.link(path, backup)
+    except OSError:
+        shutil.copy2(path, backup)
+    return backup
+
+
+def _fsync_directory(directory: str):
+    """Persist renames in `directory`; a no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _leading_whitespace(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(lines, old_indent: str, new_indent: str) -> list:
+    """Move lines from one base indentation to another, keeping relative indentation."""
+    result = []
+    for line in lines:
+        if line.strip() and line.startswith(old_indent):
+            result.append(new_indent + line[len(old_indent):])
+        else:
+            result.append(line)
+    return result
+
+
+def _find_block(file_lines, search_lines, normalize, line_hint=None):
+    """Start indexes where `search_lines` matches `file_lines` under `normalize`, nearest the hint first."""
+    wanted = [normalize(line) for line in search_lines]
+    size = len(wanted)
+    matches = [
+        start for start in range(len(file_lines) - size + 1)
+        if [normalize(line) for line in file_lines[start:start + size]] == wanted
+    ]
+    if line_hint is not None:
+        matches.sort(key=lambda start: abs(start - (line_hint - 1)))
+    return matches
+
+
+def _find_exact_lines(content: str, search: str) -> Optional[int]:
+    """Offset of the first occurrence of `search` in `content` that starts and ends on line boundaries."""
+    start = content.find(search)
+    while start != -1:
+        end = start + len(search)
+        if (start == 0 or content[start - 1] == "\n") and (
+                search.endswith("\n") or end == len(content) or content[end] in "\r\n"):
+            return start
+        start = content.find(search, start + 1)
+    return None
+
+
+def _fuzzy_find_block(file_lines, search_lines, line_hint=None):
+    """
+    Most similar window to `search_lines` by difflib ratio, allowing it to be
+    one line shorter or longer (models often drop or add a blank line).
+
+    Returns:
+        (start, size, ratio), or (None, 0, 0.0) below FUZZY_MATCH_THRESHOLD
+    """
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2("\n".join(line.strip() for line in search_lines))
+
+    best = None  # (ratio, -distance from hint, start, size)
+    for size in {max(1, len(search_lines) - 1), len(search_lines), len(search_lines) + 1}:
+        for start in range(len(file_lines) - size + 1):
+            matcher.set_seq1("\n".join(line.strip() for line in file_lines[start:start + size]))
+            # Both quick ratios are upper bounds, so most windows are rejected cheaply
+            if matcher.real_quick_ratio() < FUZZY_MATCH_THRESHOLD or matcher.quick_ratio() < FUZZY_MATCH_THRESHOLD:
+                continue
+            ratio = matcher.ratio()
+            if ratio < FUZZY_MATCH_THRESHOLD:
+                continue
+            distance = abs(start - (line_hint - 1)) if line_hint is not None else 0
+            if best is None or (ratio, -distance) > best[:2]:
+                best = (ratio, -distance, start, size)
+
+    if best is None:
+        return None, 0, 0.0
+    return best[2], best[3], best[0]
+
+
+def apply_hunk(content: str, hunk: EditHunk) -> Optional[str]:
+    """
+    Apply one search/replace hunk to `content`.
+
+    Returns:
+        The updated content, or None if the search text could not be located
+    """
+    if not hunk.search.strip():
+        # Nothing to find: the replacement is appended (or is the whole new file)
+        separator = "" if not content or content.endswith("\n") else "\n"
+        return content + separator + hunk.replace
+
+    # Exact match of whole lines first; the cheapest and most common case
+    if hunk.line_hint is None:
+        start = _find_exact_lines(content, hunk.search)
+        if start is not None:
+            return content[:start] + hunk.replace + content[start + len(hunk.search):]
+
+    file_lines = content.splitlines(keepends=True)
+    search_lines = hunk.search.splitlines(keepends=True)
+    replace_lines = hunk.replace.splitlines(keepends=True)
+    if replace_lines and not replace_lines[-1].endswith("\n"):
+        replace_lines[-1] += "\n"
+    # Blank lines at either end of a search block are a common model artifact
+    while search_lines and not search_lines[0].strip():
+        search_lines.pop(0)
+    while search_lines and not search_lines[-1].strip():
+        search_lines.pop()
+    if not search_lines:
+        return None
+
+    def splice(start, lines, size=len(search_lines)):
+        return "".join(file_lines[:start] + lines + file_lines[start + size:])
+
+    for normalize in (lambda line: line.rstrip("\r\n"), lambda line: line.rstrip()):
+        matches = _find_block(file_lines, search_lines, normalize, hunk.line_hint)
+        if matches:
+            return splice(matches[0], replace_lines)
+
+    # Same lines at a different indentation: shift the replacement to match
+    matches = _find_block(file_lines, search_lines, lambda line: line.strip(), hunk.line_hint)
+    if matches:
+        start = matches[0]
+        old_indent = _leading_whitespace(next(line for line in search_lines if line.strip()))
+        new_indent = _leading_whitespace(next(
+            line for line in file_lines[start:start + len(search_lines)] if line.strip()
+        ))
+        return splice(start, _reindent(replace_lines, old_indent, new_indent))
+
+    # A single line has no surrounding lines to confirm a near match, so
+    # `return x` would happily rewrite `return xs`
+    if len(search_lines) < FUZZY_MIN_LINES:
+        return None
+    start, size, ratio = _fuzzy_find_block(file_lines, search_lines, hunk.line_hint)
+    if start is not None:
+        print(f" Applied edit by fuzzy match (similarity {ratio:.2f}) at line {start + 1}")
+        return splice(start, replace_lines, size)
+    return None
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+
+
+class RepoWatcher:
+    """
+    Reports files changed in a repository by anything other than the
+    assistant: editors, `git pull`, branch switches.
+
+    Uses watchdog (inotify on Linux, FSEvents / ReadDirectoryChangesW
+    elsewhere) when it is installed, and otherwise polls file mtimes and
+    sizes. Events are coalesced per path and delivered once none arrived for
+    `debounce` seconds, or `max_delay` after the first, so a burst of saves
+    or a checkout of thousands of files becomes one batch.
+    """
+
+    def __init__(self, repo_path, on_change, is_relevant=None, list_files=None, debounce=0.5,
+                 max_delay=5.0, poll_interval=2.0, use_polling=None):
+        """
+        Args:
+            repo_path: Directory to watch, recursively
+            on_change: Callable receiving a sorted list of absolute paths
+                (files or directories) that changed; called from a watcher
+                thread, one batch at a time
+            is_relevant: Optional filter on absolute paths; by default
+                everything outside .git is reported
+            list_files: Callable returning the files to compare when
+                polling (default: every file outside .git)
+            debounce: Quiet period in seconds before a batch is delivered
+            max_delay: Longest a change waits while events keep arriving
+            poll_interval: Seconds between scans when polling
+            use_polling: Force (True) or forbid (False) polling; None polls
+                only when watchdog is unavailable (or WATCH_POLLING=1)
+        """
+        self.repo_path = os.path.abspath(repo_path)
+        self.on_change = on_change
+        self.is_relevant = is_relevant or self._outside_git_dir
+        self.list_files = list_files or self._walk_files
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        if use_polling is None:
+            use_polling = os.getenv("WATCH_POLLING") == "1"
+        self.use_polling = use_polling
+        self.backend = None
+
+        self._pending = set()
+        self._first_event = None
+        self._last_event = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def start(self):
+        """Start watching; returns self."""
+        if not self.use_polling:
+            try:
+                self._start_watchdog()
+            except ImportError:
+                pass
+        if self._observer is None:
+            self.backend = "polling"
+            self._spawn(self._poll_loop, "watch-poll")
+        self._spawn(self._dispatch_loop, "watch-dispatch")
+        print(f"Watching {self.repo_path} for changes ({self.backend})")
+        return self
+
+    def stop(self, timeout=5.0):
+        """
+        Stop watching; changes not yet delivered are dropped.
+
+        Args:
+            timeout: Seconds to wait for each watcher thread, e.g. one still
+                inside on_change; a thread that has not finished is left to
+                exit on its own (they are daemons)
+        """
+        with self._condition:
+            self._stopped.set()
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def record(self, path):
+        """Queue a changed path for the next batch."""
+        path = os.path.abspath(path)
+        if not self.is_relevant(path):
+            return
+        now = time.monotonic()
+        with self._condition:
+            self._pending.add(path)
+            self._last_event = now
+            if self._first_event is None:
+                self._first_event = now
+            self._condition.notify_all()
+
+    def _start_watchdog(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type not in ("created", "modified", "deleted", "moved", "closed"):
+                    return
+                if event.is_directory and event.event_type == "modified":
+                    # Fired for the parent of every file created or deleted
+                    return
+                watcher.record(event.src_path)
+                if getattr(event, "dest_path", None):
+                    watcher.record(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(Handler(), self.repo_path, recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        self.backend = type(observer).__name__.replace("Observer", "").lower() or "watchdog"
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                # Checked under the condition stop() notifies, so a stop
+                # between the check and the wait cannot be missed
+                if self._stopped.is_set():
+                    return
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                wait = min(self._last_event + self.debounce, self._first_event + self.max_delay) - now
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                batch, self._pending = sorted(self._pending), set()
+                self._first_event = self._last_event = None
+            try:
+                self.on_change(batch)
+            except Exception as e:
+                print(f"Handling changed files failed: {e}")
+
+    def _poll_loop(self):
+        snapshot = self._scan()
+        while not self._stopped.wait(self.poll_interval):
+            current = self._scan()
+            for path in snapshot.keys() | current.keys():
+                if snapshot.get(path) != current.get(path):
+                    self.record(path)
+            snapshot = current
+
+    def _scan(self) -> dict:
+        """{path: (mtime_ns, size)} for the files being polled."""
+        snapshot = {}
+        for path in self.list_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _walk_files(self):
+        for root, dirs, files in os.walk(self.repo_path):
+            dirs[:] = [name for name in dirs if name != ".git"]
+            for name in files:
+                yield os.path.join(root, name)
+
+    def _outside_git_dir(self, path) -> bool:
+        rel_path = os.path.relpath(path, self.repo_path)
+        return rel_path != ".git" and not rel_path.startswith(".git" + os.sep)
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
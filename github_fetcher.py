@@ -1,14 +1,165 @@
-import git
+import os
 from pathlib import Path
+from typing import NamedTuple, Optional
+from repo_scanner import DEFAULT_EXTENSIONS
+
+
+class RepoUpdate(NamedTuple):
+    """Outcome of clone_repo / update_repo."""
+    old_commit: Optional[str]  # HEAD before, None for a fresh clone
+    new_commit: Optional[str]  # HEAD after
+    # Absolute paths changed between the two commits; None when everything is new
+    changed_paths: Optional[list]
+
+
+def clone_repo(repo_url, target_dir="cloned_repo", depth=None, blobless=None, sparse=None, update=True):
+    """
+    Clone a repository, or bring an existing clone up to date.
+
+    Defaults come from the environment so every entry point clones the same way:
+    CLONE_DEPTH (commits of history, e.g. 1), CLONE_BLOBLESS=1 (fetch file
+    contents only when checked out) and CLONE_SPARSE=1 (check out only the
+    file types that get indexed).
+
+    Args:
+        repo_url: URL or local path of the repository
+        target_dir: Directory to clone into
+        depth: Shallow clone with this many commits; None for full history
+        blobless: Partial clone that skips file contents until needed
+        sparse: Check out only DEFAULT_EXTENSIONS files (and .gitignore files)
+        update: Fetch and fast-forward when target_dir already holds a clone
+
+    Returns:
+        RepoUpdate describing what changed
+    """
+    # GitPython is imported on first use, like boto3 in bedrock_client, so
+    # importing this module (e.g. via session_engine) stays cheap
+    import git
 
-def clone_repo(repo_url, target_dir="cloned_repo"):
     target_path = Path(target_dir)
+    depth = depth if depth is not None else int(os.getenv("CLONE_DEPTH", "0")) or None
+    blobless = blobless if blobless is not None else os.getenv("CLONE_BLOBLESS") == "1"
+    sparse = sparse if sparse is not None else os.getenv("CLONE_SPARSE") == "1"
 
     if target_path.exists() and any(target_path.iterdir()):
-        print(f"Skipping clone. Repo already exists at: {target_dir}")
-        return
+        if not update:
+            print(f"Skipping clone. Repo already exists at: {target_dir}")
+            head = get_head_commit(target_dir)
+            return RepoUpdate(head, head, [])
+        return update_repo(target_dir)
 
     target_path.mkdir(parents=True, exist_ok=True)
 
-    git.Repo.clone_from(repo_url, target_dir)
+    options = {}
+    if depth:
+        options["depth"] = depth
+    if blobless:
+        options["filter"] = "blob:none"
+    if sparse:
+        # Nothing is checked out until the sparse patterns are in place
+        options["no_checkout"] = True
+    repo = git.Repo.clone_from(repo_url, target_dir, **options)
+
+    if sparse:
+        patterns = [f"*{extension}" for extension in DEFAULT_EXTENSIONS] + [".gitignore"]
+        repo.git.sparse_checkout("set", "--no-cone", *patterns)
+        # Populate the index and working tree from HEAD through the sparse patterns
+        repo.git.read_tree("-mu", "HEAD")
+
     print(f"Repo cloned into: {target_dir}")
+    return RepoUpdate(None, get_head_commit(target_dir), None)
+
+
+def update_repo(repo_path):
+    """
+    Fetch the current branch's upstream and fast-forward to it.
+
+    A shallow clone stays shallow (and is moved to the new tip, as its
+    truncated history cannot show a fast-forward), and a partial clone only
+    downloads the contents it checks out. Uncommitted edits are kept; if the
+    branch has diverged or an edit conflicts with incoming changes, the
+    clone is left as it was.
+
+    Returns:
+        RepoUpdate; changed_paths lists the files the fast-forward touched
+    """
+    import git
+
+    try:
+        repo = git.Repo(repo_path)
+        old_commit = repo.head.commit.hexsha
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+        # Not a clone (or one that failed part-way, or has no commits yet)
+        print(f"{repo_path} is not a usable git clone, using it as is")
+        return RepoUpdate(None, None, [])
+    unchanged = RepoUpdate(old_commit, old_commit, [])
+
+    try:
+        tracking = repo.active_branch.tracking_branch()
+    except TypeError:
+        # Detached HEAD: nothing to fast-forward
+        tracking = None
+    if tracking is None:
+        print(f"Repo at {repo_path} has no upstream branch, using it as is")
+        return unchanged
+
+    try:
+        if repo.git.rev_parse("--is-shallow-repository") == "true":
+            # Local commits are those not on the upstream branch as last fetched
+            upstream_commit = tracking.commit.hexsha
+            if not repo.is_ancestor(old_commit, upstream_commit):
+                print(f"Repo at {repo_path} has local commits not on {tracking.name}, using it as is")
+                return unchanged
+            repo.git.fetch("--depth=1", tracking.remote_name, tracking.remote_head)
+            # The fetched tip's history is cut off, so git cannot prove it descends
+            # from HEAD; move to it directly, refusing if a local edit would be lost
+            repo.git.reset("--keep", tracking.name)
+        else:
+            repo.git.fetch(tracking.remote_name, tracking.remote_head)
+            repo.git.merge("--ff-only", tracking.name)
+    except git.GitCommandError as e:
+        print(f"Could not update repo at {repo_path}, using it as is: {e.stderr.strip() or e}")
+        return unchanged
+
+    new_commit = repo.head.commit.hexsha
+    if new_commit == old_commit:
+        print(f"Repo at {repo_path} is up to date")
+        return unchanged
+
+    # Only trees are compared, so this works in a partial clone without fetching file contents
+    names = repo.git.diff("--name-only", "--no-renames", old_commit, new_commit).splitlines()
+    root = repo.working_tree_dir
+    changed_paths = sorted({os.path.abspath(os.path.join(root, name)) for name in names if name})
+    print(f"Updated repo at {repo_path} to {new_commit[:12]} ({len(changed_paths)} file(s) changed)")
+    return RepoUpdate(old_commit, new_commit, changed_paths)
+
+
+def get_head_commit(repo_path):
+    """Return the HEAD commit SHA of the repo, or None if it is not a git checkout."""
+    import git
+
+    try:
+        return git.Repo(repo_path).head.commit.hexsha
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+        return None
+
+def get_changed_files(repo_path, since_commit):
+    """
+    List files that differ between `since_commit` and the working tree.
+
+    Covers committed, staged, unstaged and untracked changes.
+
+    Returns:
+        list of absolute paths, or None if the commit is unknown to the repo
+    """
+    import git
+
+    try:
+        repo = git.Repo(repo_path)
+        names = repo.git.diff("--name-only", since_commit).splitlines()
+        names += repo.untracked_files
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, git.GitCommandError):
+        return None
+
+    root = repo.working_tree_dir
+    return sorted({os.path.abspath(os.path.join(root, name)) for name in names if name})
@@ -0,0 +1,676 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+from code_processor import CHUNKER_VERSION, iter_file_chunks
+from file_watcher import RepoWatcher
+from repo_scanner import DEFAULT_EXCLUDES, DEFAULT_EXTENSIONS, DEFAULT_MAX_FILE_SIZE, IgnoreRules, iter_source_files
+from github_fetcher import get_head_commit, get_changed_files
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from prompt_builder import RetrievedChunk
+from reranker import Reranker
+from response_cache import TTLCache, normalize_prompt
+from telemetry import telemetry
+from vector_index import TRAINED_INDEX_TYPES, TRAINING_SIZE, create_faiss_index, index_type_from_env
+
+MANIFEST_VERSION = 2
+
+
+def file_hash(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class ReadWriteLock:
+    """
+    Many concurrent readers or one writer. Waiting writers block new readers,
+    so a refresh is not starved by a steady stream of searches.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read_locked(self):
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write_locked(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class IncrementalIndexManager:
+    """
+    Keeps a FAISS vector store in sync with the files of a repository.
+
+    Every indexed file remembers its mtime, content hash and the ids of its
+    vectors, so a refresh only drops and re-embeds the files that changed
+    instead of rebuilding the whole index.
+
+    The index can be saved next to the clone (``<repo>.index/``) tagged with
+    the HEAD commit and the chunking parameters, and loaded back on startup
+    so that only files differing from the saved commit are re-embedded.
+
+    Vectors are stored under explicit int64 labels in a FAISS index of
+    `index_type` (see vector_index.INDEX_TYPES), so compact quantized and
+    IVF indexes support the same incremental deletes as a flat one.
+
+    search() and save() may run from several threads while a refresh is in
+    progress: they always see the index as it was before or after a refresh,
+    never in between.
+    """
+
+    def __init__(self, repo_path, embedding_model, extensions=DEFAULT_EXTENSIONS, chunk_size=1500,
+                 overlap=0, index_dir=None, exclude=DEFAULT_EXCLUDES, max_file_size=DEFAULT_MAX_FILE_SIZE,
+                 batch_size=256, index_type=None, reranker=None):
+        self.repo_path = os.path.abspath(repo_path)
+        self.embedding_model = embedding_model
+        self.extensions = extensions
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.exclude = tuple(exclude)
+        self.max_file_size = max_file_size
+        self.batch_size = batch_size
+        self.index_type = index_type or index_type_from_env()
+        # Over-fetch, rerank and diversify results (see Reranker)
+        self.reranker = reranker or Reranker.from_env()
+        self.ignore_rules = IgnoreRules(self.repo_path, self.exclude)
+        self.index_dir = index_dir or f"{self.repo_path}.index"
+        self.vectorstore = None
+        # BM25 / identifier index over the same chunks as the vector store
+        self.lexical_index = LexicalIndex()
+        # abs path -> {"mtime": float, "hash": str, "ids": [chunk ids]}
+        self.file_states = {}
+        # True while the FAISS index is a read-only memory map of the saved file
+        self._mmapped = False
+        # chunk id -> FAISS label, and the next label to assign
+        self._labels = {}
+        self._next_label = 0
+        # (chunk_id, text, metadata, vector) held back until a trained index can be built
+        self._training_buffer = []
+        # Searches and saves read under `lock`; a refresh only write-locks to swap in its result
+        self.lock = ReadWriteLock()
+        # Serializes refreshes, which embed outside `lock`
+        self._refresh_lock = threading.RLock()
+        # Bumped whenever the indexed content changes, which invalidates cached searches
+        self.generation = 0
+        # (generation, normalized query, k, mode) -> results, so a repeated
+        # question skips the query embedding and FAISS search
+        self.search_cache = TTLCache.from_env("search", "SEARCH_CACHE", max_entries=256)
+        # RepoWatcher feeding out-of-band edits to refresh(), see watch()
+        self.watcher = None
+
+    def load_or_build(self, progress_callback=None):
+        """
+        Load the saved index and re-index files changed since its commit,
+        or build from scratch if there is no compatible saved index.
+        """
+        saved_commit = self.load()
+        if saved_commit is False:
+            self.build(progress_callback)
+        else:
+            self.refresh(self._changed_since(saved_commit), progress_callback)
+        self.save()
+
+    def build(self, progress_callback=None):
+        """Index every matching file in the repository from scratch."""
+        with self._refresh_lock:
+            with self.lock.write_locked():
+                self.generation += 1
+                self.vectorstore = None
+                self.lexical_index = LexicalIndex()
+                self.file_states = {}
+                self._mmapped = False
+                self._labels = {}
+                self._next_label = 0
+            return self.refresh(self._list_files(), progress_callback)
+
+    def refresh(self, changed_paths=None, progress_callback=None):
+        """
+        Re-index the given files, or every file whose content changed on disk.
+
+        Args:
+            changed_paths: Paths written since the last refresh (e.g. the
+                paths of the FileChange records from commit_changes); those
+                whose content already matches the index are skipped. When
+                None, changes are detected by mtime and content hash.
+            progress_callback: Optional callable(files_done, files_total)
+                reporting indexing progress
+
+        Files are read, chunked and embedded while searches keep using the
+        current index; the results are swapped in under a brief write lock.
+
+        Returns:
+            list: Absolute paths that were re-indexed or dropped
+        """
+        with self._refresh_lock:
+            if changed_paths is None:
+                changed_paths = self.detect_changes()
+            else:
+                # The same edit may be reported by both a chat turn and the watcher
+                changed_paths = [path for path in changed_paths if self._differs_from_index(path)]
+
+            changed = sorted({os.path.abspath(path) for path in changed_paths})
+            if not changed:
+                return []
+
+            with telemetry.span("reindex", files=len(changed)) as span:
+                # Nothing can be searching an index that doesn't exist yet, so a
+                # first build applies each batch as it is embedded instead of
+                # holding every vector until the end
+                staging = self.vectorstore is not None
+                if staging:
+                    self._ensure_writable()
+                else:
+                    with self.lock.write_locked():
+                        self.generation += 1
+                        for path in changed:
+                            self._remove_file(path)
+
+                indexable = [path for path in changed if self._is_indexable(path)]
+                staged, batch, embedded = [], {}, 0
+                # Chunks stream in from the reader pool and are embedded in batches,
+                # so embedding starts before the whole repository has been read
+                for files_done, (path, read) in enumerate(
+                        iter_file_chunks(indexable, self.chunk_size, self.overlap, self.max_file_size), 1):
+                    file_chunks = {}
+                    for chunk in read.chunks:
+                        chunk_id = self._chunk_id(chunk.path, chunk.start_line, chunk.text)
+                        # Identical slices of one long line add nothing to retrieval
+                        file_chunks.setdefault(chunk_id, chunk)
+                    batch[path] = (file_chunks, read.hash, read.mtime)
+
+                    pending = sum(len(file_chunks) for file_chunks, _, _ in batch.values())
+                    if pending >= self.batch_size or files_done == len(indexable):
+                        embedded_batch = self._embed_batch(batch)
+                        if staging:
+                            staged.append(embedded_batch)
+                        else:
+                            with self.lock.write_locked():
+                                self.generation += 1
+                                self._apply_batch(embedded_batch)
+                        embedded += pending
+                        batch = {}
+                        if progress_callback:
+                            progress_callback(files_done, len(indexable))
+
+                with self.lock.write_locked():
+                    self.generation += 1
+                    if staging:
+                        for path in changed:
+                            self._remove_file(path)
+                        for embedded_batch in staged:
+                            self._apply_batch(embedded_batch)
+                    if self._training_buffer:
+                        self._create_vectorstore()
+
+                span.set(chunks=embedded)
+                print(f"Re-indexed {len(changed)} file(s), embedded {embedded} chunk(s)")
+                return changed
+
+    def watch(self, debounce=0.5, poll_interval=2.0, use_polling=None):
+        """
+        Keep the index current with edits made outside the assistant (an
+        editor, `git pull`, a branch switch) by re-indexing only the changed
+        files in the background. See RepoWatcher for the backends.
+
+        Returns:
+            The RepoWatcher; stop it with stop_watching()
+        """
+        if self.watcher is None:
+            self.watcher = RepoWatcher(
+                self.repo_path,
+                self._on_files_changed,
+                is_relevant=self._is_watched,
+                list_files=self._list_files,
+                debounce=debounce,
+                poll_interval=poll_interval,
+                use_polling=use_polling
+            ).start()
+        return self.watcher
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _on_files_changed(self, paths):
+        paths = self._expand_directories(paths)
+        try:
+            if self.refresh(paths):
+                self.save()
+        except Exception as e:
+            print(f"Background re-index failed: {e}")
+
+    def _is_watched(self, path) -> bool:
+        if self.ignore_rules.is_ignored_path(path):
+            return False
+        # Directories pass so that a moved or deleted folder reaches
+        # _expand_directories; a deleted one is only recognizable by its files
+        return (
+            Path(path).suffix in self.extensions
+            or os.path.isdir(path)
+            or (not Path(path).suffix and self._has_indexed_files_under(path))
+        )
+
+    def _has_indexed_files_under(self, directory) -> bool:
+        prefix = directory.rstrip(os.sep) + os.sep
+        return any(path.startswith(prefix) for path in list(self.file_states))
+
+    def _expand_directories(self, paths) -> list:
+        """Replace directory paths with the indexed and on-disk files beneath them."""
+        expanded = set()
+        for path in paths:
+            prefix = path.rstrip(os.sep) + os.sep
+            under = [indexed for indexed in list(self.file_states) if indexed.startswith(prefix)]
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    under += [
+                        os.path.join(root, name) for name in files
+                        if self._is_indexable(os.path.join(root, name))
+                    ]
+            if under:
+                expanded.update(under)
+            elif not os.path.isdir(path):
+                expanded.add(path)
+        return sorted(expanded)
+
+    def _differs_from_index(self, path) -> bool:
+        state = self.file_states.get(os.path.abspath(path))
+        if state is None:
+            return os.path.isfile(path)
+        try:
+            return file_hash(path) != state["hash"]
+        except OSError:
+            # Deleted since it was indexed
+            return True
+
+    def search(self, query, k=8, mode="hybrid"):
+        """
+        Return the k chunks most relevant to the query.
+
+        Queries naming a known code symbol (e.g. `validate_path`) are answered
+        from the lexical index alone, without an embedding call. Otherwise
+        "hybrid" fuses vector and BM25 rankings with reciprocal rank fusion,
+        "vector" and "lexical" use a single ranking. Candidates are
+        over-fetched and narrowed by the reranker (relevance, diversity,
+        per-file caps, adaptive k), so fewer than k chunks may come back.
+        Results are cached until the index next changes.
+
+        Returns:
+            list of at most k RetrievedChunk, most relevant first
+        """
+        with telemetry.span("search", mode=mode, k=k) as span, self.lock.read_locked():
+            cache_key = (self.generation, normalize_prompt(query), k, mode)
+            chunks = self.search_cache.get(cache_key)
+            if chunks is None:
+                chunks = self._search(query, k, mode, span)
+                self.search_cache.put(cache_key, chunks)
+            else:
+                span.set(route="cache")
+            span.set(results=len(chunks))
+            return list(chunks)
+
+    def _search(self, query, k, mode, span):
+        if self.vectorstore is None:
+            return []
+        candidates, signals = self._candidates(query, self.reranker.candidates(k), mode, span)
+        chunks = self.reranker.select(query, candidates, k, signals)
+        span.set(candidates=len(candidates))
+        return chunks
+
+    def _candidates(self, query, k, mode, span):
+        """
+        Returns:
+            (RetrievedChunks, absolute relevance signals for the reranker: the
+            cosine similarity where the route measured one, else None)
+        """
+        symbols = self.lexical_index.find_symbols(query) if mode != "vector" else []
+        if symbols:
+            span.set(route="symbol")
+            hits = self.lexical_index.symbol_search(query, symbols, self._chunk_text, k=k)
+            chunks = self._to_chunks(hits)
+            # symbol_search scores a definition of the symbol at 100 or more
+            return chunks, [1.0 if chunk.score >= 100.0 else None for chunk in chunks]
+        span.set(route=mode)
+        if mode == "lexical":
+            chunks = self._to_chunks(self.lexical_index.search(query, k=k))
+            return chunks, [None] * len(chunks)
+
+        vector_hits = self._vector_search(query, k if mode == "vector" else k * 2)
+        if mode == "vector":
+            chunks = self._to_chunks(vector_hits)
+            return chunks, [chunk.score for chunk in chunks]
+
+        with telemetry.span("lexical_search"):
+            lexical_hits = self.lexical_index.search(query, k=k * 2)
+        fused = reciprocal_rank_fusion([
+            [chunk_id for chunk_id, _ in vector_hits],
+            [chunk_id for chunk_id, _ in lexical_hits]
+        ])
+        chunks = self._to_chunks(fused[:k])
+        cosines = dict(vector_hits)
+        return chunks, [cosines.get(chunk.chunk_id) for chunk in chunks]
+
+    def _vector_search(self, query, k):
+        """Return [(chunk_id, cosine similarity)] from FAISS."""
+        query_embedding = self.embedding_model.embed_query(query)
+        with telemetry.span("vector_search"):
+            results = self.vectorstore.similarity_search_with_score_by_vector(query_embedding, k=k)
+        # Titan vectors are unit length, so squared L2 distance d maps to cosine 1 - d/2
+        return [(doc.metadata["chunk_id"], 1.0 - float(distance) / 2.0) for doc, distance in results]
+
+    def _document(self, chunk_id):
+        doc = self.vectorstore.docstore.search(chunk_id)
+        # InMemoryDocstore returns an error string for unknown ids
+        return None if isinstance(doc, str) else doc
+
+    def _chunk_text(self, chunk_id):
+        doc = self._document(chunk_id)
+        return doc.page_content if doc else None
+
+    def _to_chunks(self, hits):
+        chunks = []
+        for chunk_id, score in hits:
+            doc = self._document(chunk_id)
+            if doc is None:
+                continue
+            chunks.append(RetrievedChunk(
+                chunk_id,
+                doc.metadata["path"],
+                doc.page_content,
+                doc.metadata["start_line"],
+                doc.metadata["end_line"],
+                score
+            ))
+        return chunks
+
+    def save(self):
+        """Write the index, docstore and manifest to index_dir atomically."""
+        if self.vectorstore is None:
+            return
+        import faiss
+
+        with telemetry.span("index_save", chunks=len(self._labels)), self.lock.read_locked():
+            os.makedirs(self.index_dir, exist_ok=True)
+            index_path = os.path.join(self.index_dir, "index.faiss")
+            store_path = os.path.join(self.index_dir, "index.pkl")
+            manifest_path = os.path.join(self.index_dir, "manifest.json")
+
+            # Write to temp files and rename, so a memory-mapped copy of the
+            # previous index stays valid and a crash never leaves a torn index
+            faiss.write_index(self.vectorstore.index, index_path + ".tmp")
+            with open(store_path + ".tmp", 'wb') as f:
+                pickle.dump((self.vectorstore.docstore, self.vectorstore.index_to_docstore_id), f)
+            with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": MANIFEST_VERSION,
+                    "commit": get_head_commit(self.repo_path),
+                    "params": self._params(),
+                    "file_states": self.file_states
+                }, f)
+
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(store_path + ".tmp", store_path)
+            os.replace(manifest_path + ".tmp", manifest_path)
+
+    def load(self):
+        """
+        Memory-map a previously saved index.
+
+        Returns:
+            The commit SHA the index was saved at (None if the repo was not a
+            git checkout), or False if no compatible index exists.
+        """
+        manifest_path = os.path.join(self.index_dir, "manifest.json")
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("params") != self._params():
+            print(f"Saved index at {self.index_dir} uses different parameters, rebuilding")
+            return False
+
+        import faiss
+        index_path = os.path.join(self.index_dir, "index.faiss")
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._mmapped = True
+        except RuntimeError:
+            # Older faiss builds can't mmap every index type
+            index = faiss.read_index(index_path)
+            self._mmapped = False
+        with open(os.path.join(self.index_dir, "index.pkl"), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        self.generation += 1
+        self.vectorstore = FAISS(self.embedding_model, index, docstore, index_to_docstore_id)
+        self.file_states = manifest["file_states"]
+        self._labels = {chunk_id: label for label, chunk_id in index_to_docstore_id.items()}
+        self._next_label = max(index_to_docstore_id, default=-1) + 1
+
+        # Re-tokenizing is cheap compared to embedding, so the lexical index isn't persisted
+        self.lexical_index = LexicalIndex()
+        for chunk_id in index_to_docstore_id.values():
+            self.lexical_index.add(chunk_id, self._chunk_text(chunk_id) or "")
+        print(f"Loaded saved index for commit {manifest['commit']} ({index.ntotal} vectors)")
+        return manifest["commit"]
+
+    def detect_changes(self) -> list:
+        """Return files that were added, modified or deleted since they were indexed."""
+        current = set(self._list_files())
+        changed = [path for path in self.file_states if path not in current]
+
+        for path in current:
+            state = self.file_states.get(path)
+            if state is None:
+                changed.append(path)
+                continue
+            mtime = os.path.getmtime(path)
+            if mtime == state["mtime"]:
+                continue
+            if file_hash(path) != state["hash"]:
+                changed.append(path)
+            else:
+                # Touched but identical content, nothing to re-embed
+                state["mtime"] = mtime
+
+        return changed
+
+    def _changed_since(self, saved_commit) -> list:
+        """Files differing from the saved index, narrowed by git when possible."""
+        candidates = get_changed_files(self.repo_path, saved_commit) if saved_commit else None
+        if candidates is None:
+            return self.detect_changes()
+
+        current = set(self._list_files())
+        candidates = set(candidates) | (current - set(self.file_states))
+        candidates |= {path for path in self.file_states if path not in current}
+
+        # The saved index may already include uncommitted edits, so only
+        # re-embed files whose content no longer matches what was indexed
+        changed = []
+        for path in candidates:
+            state = self.file_states.get(path)
+            if state is None or not os.path.isfile(path) or file_hash(path) != state["hash"]:
+                if state is not None or self._is_indexable(path):
+                    changed.append(path)
+        return changed
+
+    def _params(self) -> dict:
+        return {
+            "repo_path": self.repo_path,
+            "extensions": sorted(self.extensions),
+            "chunker": CHUNKER_VERSION,
+            "chunk_size": self.chunk_size,
+            "overlap": self.overlap,
+            "exclude": list(self.exclude),
+            "max_file_size": self.max_file_size,
+            "embedding_model": getattr(self.embedding_model, "model_id", None),
+            "dimensions": getattr(self.embedding_model, "dimensions", None),
+            "index_type": self.index_type
+        }
+
+    def _ensure_writable(self):
+        # A memory-mapped index is read-only; pull it into memory before mutating
+        if self._mmapped:
+            import faiss
+            self.vectorstore.index = faiss.read_index(os.path.join(self.index_dir, "index.faiss"))
+            self._mmapped = False
+
+    def _embed_batch(self, batch):
+        """
+        Embed {path: ({chunk_id: CodeChunk}, hash, mtime)} without touching the index.
+
+        Each file is recorded with the hash and mtime of the bytes its chunks
+        came from, not re-read afterwards: a save during embedding then still
+        differs from the index and gets picked up by the next refresh.
+
+        Returns:
+            (ids, texts, metadatas, vectors, file_states) for _apply_batch
+        """
+        texts, metadatas, ids = [], [], []
+        for file_chunks, _, _ in batch.values():
+            for chunk_id, chunk in file_chunks.items():
+                texts.append(chunk.text)
+                metadatas.append({
+                    "path": chunk.path,
+                    "chunk_id": chunk_id,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line
+                })
+                ids.append(chunk_id)
+
+        vectors = np.asarray(self.embedding_model.embed_documents(texts), dtype='float32') if texts else None
+        file_states = {}
+        for path, (file_chunks, digest, mtime) in batch.items():
+            if digest is None:
+                # Oversized or unreadable: nothing was chunked, so any version will do
+                try:
+                    mtime, digest = os.path.getmtime(path), file_hash(path)
+                except OSError:
+                    # Deleted while being indexed; refresh() already dropped its entry
+                    continue
+            file_states[path] = {"mtime": mtime, "hash": digest, "ids": list(file_chunks)}
+        return ids, texts, metadatas, vectors, file_states
+
+    def _apply_batch(self, embedded_batch):
+        """Add an embedded batch to the vector and lexical indexes and record its files as indexed."""
+        ids, texts, metadatas, vectors, file_states = embedded_batch
+        if texts:
+            self._add_texts(ids, texts, metadatas, vectors)
+            for chunk_id, text in zip(ids, texts):
+                self.lexical_index.add(chunk_id, text)
+        self.file_states.update(file_states)
+
+    def _add_texts(self, ids, texts, metadatas, vectors):
+        if self.vectorstore is not None:
+            self._add_vectors(ids, texts, metadatas, vectors)
+            return
+
+        # Quantized and IVF indexes are trained on the first TRAINING_SIZE
+        # vectors; refresh() creates the index early if fewer arrive
+        self._training_buffer.extend(zip(ids, texts, metadatas, vectors))
+        if self.index_type not in TRAINED_INDEX_TYPES or len(self._training_buffer) >= TRAINING_SIZE:
+            self._create_vectorstore()
+
+    def _create_vectorstore(self):
+        buffered, self._training_buffer = self._training_buffer, []
+        vectors = np.array([item[3] for item in buffered], dtype='float32')
+        dimensions = vectors.shape[1] if len(buffered) else self.embedding_model.dimensions
+
+        index, actual_type = create_faiss_index(self.index_type, dimensions, vectors if len(buffered) else None)
+        if actual_type != self.index_type:
+            print(f"Created a {actual_type} index instead of {self.index_type}")
+        self.vectorstore = FAISS(self.embedding_model, index, InMemoryDocstore({}), {})
+        self._mmapped = False
+        self._labels = {}
+        self._next_label = 0
+
+        if buffered:
+            ids, texts, metadatas, _ = zip(*buffered)
+            self._add_vectors(ids, texts, metadatas, vectors)
+
+    def _add_vectors(self, ids, texts, metadatas, vectors):
+        self._ensure_writable()
+        labels = np.arange(self._next_label, self._next_label + len(ids), dtype='int64')
+        self._next_label += len(ids)
+
+        self.vectorstore.index.add_with_ids(np.asarray(vectors, dtype='float32'), labels)
+        self.vectorstore.docstore.add({
+            chunk_id: Document(page_content=text, metadata=metadata)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        for label, chunk_id in zip(labels.tolist(), ids):
+            self.vectorstore.index_to_docstore_id[label] = chunk_id
+            self._labels[chunk_id] = label
+
+    def _delete_vectors(self, chunk_ids):
+        present = [chunk_id for chunk_id in chunk_ids if chunk_id in self._labels]
+        if not present:
+            return
+        self._ensure_writable()
+        labels = [self._labels.pop(chunk_id) for chunk_id in present]
+
+        # Explicit labels survive removal, unlike positional ids in a bare flat index
+        self.vectorstore.index.remove_ids(np.array(labels, dtype='int64'))
+        self.vectorstore.docstore.delete(present)
+        for label in labels:
+            del self.vectorstore.index_to_docstore_id[label]
+
+    def _remove_file(self, path):
+        state = self.file_states.pop(path, None)
+        if not state:
+            return
+        if self.vectorstore is not None:
+            self._delete_vectors(state["ids"])
+        for chunk_id in state["ids"]:
+            self.lexical_index.remove(chunk_id)
+
+    def _list_files(self) -> list:
+        return list(iter_source_files(self.repo_path, self.extensions, self.ignore_rules))
+
+    def _is_indexable(self, path) -> bool:
+        return (
+            os.path.isfile(path)
+            and Path(path).suffix in self.extensions
+            and not self.ignore_rules.is_ignored_path(path)
+        )
+
+    @staticmethod
+    def _chunk_id(path, start_line, text) -> str:
+        digest = hashlib.sha1(f"{path}\0{start_line}\0{text}".encode('utf-8')).hexdigest()
+        return digest[:20]
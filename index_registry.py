@@ -0,0 +1,125 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from github_fetcher import get_head_commit
+
+
+class SharedIndex:
+    """One repository index shared by every session that opened the same repo and commit."""
+
+    def __init__(self, key):
+        self.key = key
+        self.manager = None
+        self.refcount = 0
+        self.error = None
+        self.ready = threading.Event()
+
+    @property
+    def repo_path(self):
+        return self.manager.repo_path
+
+    def search(self, query, k=8, mode="hybrid"):
+        # The manager lets searches run alongside a refresh from another session
+        return self.manager.search(query, k=k, mode=mode)
+
+    def refresh(self, changed_paths=None, progress_callback=None):
+        """Apply one session's edits to the shared index, visible to all sessions afterwards."""
+        return self.manager.refresh(changed_paths, progress_callback)
+
+    def save(self):
+        self.manager.save()
+
+
+class IndexLease:
+    """
+    A session's reference to a SharedIndex. Releasing it, explicitly or when
+    the lease is garbage collected with its session, drops the refcount.
+    """
+
+    def __init__(self, registry, entry):
+        self.index = entry
+        self._finalizer = weakref.finalize(self, registry._release, entry)
+
+    def release(self):
+        self._finalizer()
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    url = repo_url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    return url.lower()
+
+
+class IndexRegistry:
+    """
+    Process-wide registry of repository indexes keyed by (repo URL, HEAD commit).
+
+    The first session to acquire a key builds (or loads) the index; later
+    sessions wait for it and share the same object. Entries nobody holds are
+    kept for reuse and evicted least recently used beyond `max_idle`.
+    """
+
+    def __init__(self, max_idle=None):
+        self.max_idle = max_idle if max_idle is not None else int(os.getenv("INDEX_REGISTRY_MAX_IDLE", "2"))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, repo_url, repo_path, factory) -> IndexLease:
+        """
+        Args:
+            repo_url: Repository URL the clone came from
+            repo_path: Local clone, used to read the HEAD commit
+            factory: Callable returning a loaded IncrementalIndexManager;
+                only invoked if no session has built this index yet
+
+        Returns:
+            IndexLease exposing search(), refresh(), save() and repo_path
+        """
+        key = (normalize_repo_url(repo_url), get_head_commit(repo_path))
+        with self._lock:
+            entry = self._entries.get(key)
+            builder = entry is None
+            if builder:
+                entry = self._entries[key] = SharedIndex(key)
+            entry.refcount += 1
+            self._entries.move_to_end(key)
+
+        if builder:
+            try:
+                entry.manager = factory()
+            except Exception as e:
+                entry.error = e
+                with self._lock:
+                    self._entries.pop(key, None)
+                raise
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+
+        return IndexLease(self, entry)
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refcount -= 1
+            idle = [key for key, other in self._entries.items() if other.refcount <= 0 and other.ready.is_set()]
+            evicted = [self._entries.pop(key) for key in idle[:max(0, len(idle) - self.max_idle)]]
+        for other in evicted:
+            # An evicted index must not keep re-indexing in the background
+            stop_watching = getattr(other.manager, "stop_watching", None)
+            if stop_watching:
+                stop_watching()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {f"{url}@{(commit or '')[:8]}": entry.refcount for (url, commit), entry in self._entries.items()}
+
+
+index_registry = IndexRegistry()
@@ -0,0 +1,565 @@
+"""
+Long-running local index daemon serving several repositories.
+
+    python index_service.py serve
+    python index_service.py add payments https://github.com/acme/payments.git
+    python index_service.py search "where is auth handled" --repos payments users
+    python index_service.py list | update NAME | remove NAME
+
+Repositories are cloned under --root, indexed once and kept loaded; the
+list survives restarts and each index is saved next to its clone, so a
+restarted daemon only re-embeds files that changed. Front ends set
+INDEX_SERVICE_URL and use IndexServiceClient / RemoteIndex instead of
+building their own index.
+"""
+import argparse
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from prompt_builder import RetrievedChunk
+from telemetry import telemetry
+
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "zwi_coding_assistant", "repos")
+REPO_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+# Host headers accepted besides the one the service binds to; anything else
+# is a DNS-rebinding attempt from a web page
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+
+class IndexServiceError(Exception):
+    """A request the index service rejected; `status` is the HTTP status code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def token_path(root_dir=None) -> str:
+    """Where the service keeps the bearer token clients must send."""
+    return os.path.join(root_dir or os.getenv("INDEX_SERVICE_ROOT") or DEFAULT_ROOT, "token")
+
+
+def read_token(root_dir=None):
+    try:
+        with open(token_path(root_dir), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def repo_name_from_url(repo_url: str) -> str:
+    name = repo_url.strip().rstrip("/").rsplit("/", 1)[-1]
+    return name[:-4] if name.endswith(".git") else name
+
+
+class RepoEntry:
+    """One repository managed by the service and its indexing state."""
+
+    def __init__(self, name, url, path):
+        self.name = name
+        self.url = url
+        self.path = path
+        self.manager = None
+        # "cloning" -> "indexing" -> "ready", or "error"
+        self.status = "cloning"
+        self.error = None
+        self.commit = None
+        self.updated_at = None
+
+    def describe(self) -> dict:
+        manager = self.manager
+        return {
+            "name": self.name,
+            "url": self.url,
+            "path": self.path,
+            "status": self.status,
+            "error": self.error,
+            "commit": self.commit,
+            "files": len(manager.file_states) if manager else 0,
+            "updated_at": self.updated_at,
+        }
+
+
+class IndexService:
+    """
+    Indexes for several repositories behind one query API.
+
+    Each repository gets an IncrementalIndexManager built from clone_repo's
+    checkout; searches fan out to the selected repositories concurrently
+    and the results are merged by score. All repositories share one
+    TitanEmbeddings, so Bedrock concurrency is limited service-wide.
+    """
+
+    def __init__(self, root_dir=DEFAULT_ROOT, max_workers=8, max_builds=2, watch=None):
+        """
+        Args:
+            root_dir: Where clones, saved indexes and repos.json live
+            max_workers: Threads for fanning searches out across repositories
+            max_builds: Repositories cloned and indexed at the same time
+            watch: Re-index out-of-band edits with a RepoWatcher per repo
+                (default: WATCH_REPO=1)
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.watch = watch if watch is not None else os.getenv("WATCH_REPO") == "1"
+        self._repos = {}
+        self._lock = threading.Lock()
+        # Serializes writes of repos.json from concurrent requests
+        self._state_lock = threading.Lock()
+        self._embeddings = None
+        self._search_executor = ThreadPoolExecutor(max_workers, thread_name_prefix="service-search")
+        self._build_executor = ThreadPoolExecutor(max_builds, thread_name_prefix="service-build")
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @property
+    def state_path(self):
+        return os.path.join(self.root_dir, "repos.json")
+
+    def load_state(self):
+        """Re-register the repositories from the last run; their saved indexes load in the background."""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                repos = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, url in repos.items():
+            self.add_repo(name, url)
+
+    def _save_state(self):
+        # The snapshot is taken under the state lock too, so the last write
+        # to land always reflects the latest registry
+        with self._state_lock:
+            with self._lock:
+                repos = {name: entry.url for name, entry in self._repos.items()}
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(repos, f, indent=2)
+            os.replace(temp_path, self.state_path)
+
+    def ensure_token(self) -> str:
+        """Return the API token, creating it (readable only by this user) on first run."""
+        path = token_path(self.root_dir)
+        token = read_token(self.root_dir)
+        if token is None:
+            token = secrets.token_urlsafe(32)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(token)
+        return token
+
+    def add_repo(self, name, url) -> dict:
+        """Register a repository and clone and index it in the background."""
+        if not REPO_NAME.match(name or ""):
+            raise IndexServiceError(f"Invalid repository name: {name!r}")
+        with self._lock:
+            entry = self._repos.get(name)
+            if entry is not None:
+                if entry.url != url:
+                    raise IndexServiceError(f"Repository {name} is already registered for {entry.url}", 409)
+                return entry.describe()
+            entry = self._repos[name] = RepoEntry(name, url, os.path.join(self.root_dir, name))
+        self._save_state()
+        self._build_executor.submit(self._build, entry)
+        return entry.describe()
+
+    def _build(self, entry):
+        from embeddings import TitanEmbeddings
+        from github_fetcher import clone_repo, get_head_commit
+        from index_manager import IncrementalIndexManager
+
+        try:
+            with telemetry.span("service_build", repo=entry.name):
+                clone_repo(entry.url, entry.path)
+                entry.status = "indexing"
+                with self._lock:
+                    if self._embeddings is None:
+                        self._embeddings = TitanEmbeddings()
+                manager = IncrementalIndexManager(entry.path, self._embeddings)
+                manager.load_or_build()
+                if self.watch:
+                    manager.watch()
+                entry.manager = manager
+                entry.commit = get_head_commit(entry.path)
+                entry.updated_at = time.time()
+                entry.status = "ready"
+        except Exception as e:
+            entry.status = "error"
+            entry.error = f"{type(e).__name__}: {e}"
+            print(f"Indexing {entry.name} failed: {entry.error}")
+
+    def remove_repo(self, name) -> dict:
+        """Stop serving a repository; its clone and saved index stay on disk."""
+        with self._lock:
+            entry = self._repos.pop(name, None)
+        if entry is None:
+            raise IndexServiceError(f"Unknown repository: {name}", 404)
+        if entry.manager is not None:
+            entry.manager.stop_watching()
+        self._save_state()
+        return entry.describe()
+
+    def update_repo(self, name) -> dict:
+        """Fetch and fast-forward a repository, then re-index only the files that changed."""
+        from github_fetcher import clone_repo
+
+        entry = self._ready(name)
+        with telemetry.span("service_update", repo=name):
+            update = clone_repo(entry.url, entry.path)
+            changed = entry.manager.refresh(update.changed_paths)
+            if changed:
+                entry.manager.save()
+        entry.commit = update.new_commit
+        entry.updated_at = time.time()
+        return dict(entry.describe(), changed=len(changed))
+
+    def refresh(self, name, paths) -> list:
+        """Re-index files a client wrote into a repository's clone."""
+        entry = self._ready(name)
+        root = entry.path + os.sep
+        outside = [path for path in paths if not os.path.abspath(path).startswith(root)]
+        if outside:
+            raise IndexServiceError(f"Paths outside repository {name}: {outside[:3]}")
+        changed = entry.manager.refresh(paths)
+        if changed:
+            entry.manager.save()
+        return changed
+
+    def repos(self) -> list:
+        with self._lock:
+            entries = list(self._repos.values())
+        return [entry.describe() for entry in entries]
+
+    def repo(self, name) -> dict:
+        with self._lock:
+            entry = self._repos.get(name)
+        if entry is None:
+            raise IndexServiceError(f"Unknown repository: {name}", 404)
+        return entry.describe()
+
+    def search(self, query, k=8, mode="hybrid", repos=None) -> dict:
+        """
+        Search the given repositories (default: all) concurrently.
+
+        Returns:
+            {"results": [chunk dicts with a "repo" key, best first],
+             "skipped": names of repositories still being indexed}
+        """
+        with self._lock:
+            if repos is None:
+                selected = list(self._repos.values())
+            else:
+                unknown = [name for name in repos if name not in self._repos]
+                if unknown:
+                    raise IndexServiceError(f"Unknown repositories: {unknown}", 404)
+                selected = [self._repos[name] for name in repos]
+
+        ready = [entry for entry in selected if entry.status == "ready"]
+        skipped = [entry.name for entry in selected if entry.status != "ready"]
+        with telemetry.span("service_search", repos=len(ready), k=k) as span:
+            futures = [
+                (entry.name, self._search_executor.submit(entry.manager.search, query, k, mode))
+                for entry in ready
+            ]
+            # Reranked scores are absolute relevance on a fixed 0-1 scale
+            # (cosine similarity blended with query-term coverage), so they
+            # compare across repositories
+            merged = [(name, chunk) for name, future in futures for chunk in future.result()]
+            merged.sort(key=lambda item: item[1].score, reverse=True)
+            span.set(results=min(k, len(merged)))
+        return {
+            "results": [dict(chunk._asdict(), repo=name) for name, chunk in merged[:k]],
+            "skipped": skipped,
+        }
+
+    def handle(self, method, parts, body) -> tuple:
+        """Route one API request; returns (HTTP status, JSON payload)."""
+        if method == "GET" and parts == ["health"]:
+            return 200, {"status": "ok", "repos": len(self._repos)}
+        if method == "GET" and parts == ["repos"]:
+            return 200, {"repos": self.repos()}
+        if method == "POST" and parts == ["repos"]:
+            url = body.get("url") or ""
+            return 202, self.add_repo(body.get("name") or repo_name_from_url(url), url)
+        if len(parts) == 2 and parts[0] == "repos":
+            if method == "GET":
+                return 200, self.repo(parts[1])
+            if method == "DELETE":
+                return 200, self.remove_repo(parts[1])
+        if method == "POST" and len(parts) == 3 and parts[0] == "repos":
+            if parts[2] == "update":
+                return 200, self.update_repo(parts[1])
+            if parts[2] == "refresh":
+                return 200, {"changed": self.refresh(parts[1], body.get("paths") or [])}
+        if method == "POST" and parts == ["search"]:
+            if not body.get("query"):
+                raise IndexServiceError("Missing query")
+            return 200, self.search(body["query"], int(body.get("k", 8)), body.get("mode", "hybrid"),
+                                    body.get("repos"))
+        raise IndexServiceError(f"No route for {method} /{'/'.join(parts)}", 404)
+
+    def serve(self, port=DEFAULT_PORT, host="127.0.0.1"):
+        """
+        Serve the JSON API at http://host:port from a thread per request; returns the server.
+
+        Every request but GET /health must carry `Authorization: Bearer <token>`
+        (see ensure_token) and a local Host header, and POSTs must be
+        application/json, so web pages the user visits cannot drive the API.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        service = self
+        token = self.ensure_token()
+        allowed_hosts = LOCAL_HOSTS | {host}
+
+        class ServiceHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def _dispatch(self, method):
+                parts = [part for part in self.path.split("?")[0].split("/") if part]
+                try:
+                    self._check_request(method, parts)
+                    body = {}
+                    length = int(self.headers.get("Content-Length") or 0)
+                    if length:
+                        body = json.loads(self.rfile.read(length))
+                    status, payload = service.handle(method, parts, body)
+                except IndexServiceError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError as e:
+                    status, payload = 400, {"error": f"Bad request: {e}"}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _check_request(self, method, parts):
+                request_host = self.headers.get("Host") or ""
+                if request_host.startswith("["):
+                    request_host = request_host[1:request_host.find("]")]
+                else:
+                    request_host = request_host.split(":")[0]
+                if request_host not in allowed_hosts:
+                    raise IndexServiceError(f"Host {request_host!r} is not allowed", 403)
+                # A form or no-cors fetch cannot send application/json without a
+                # CORS preflight, which this server never approves
+                content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+                if method == "POST" and content_type != "application/json":
+                    raise IndexServiceError("Content-Type must be application/json", 415)
+                if parts != ["health"]:
+                    authorization = self.headers.get("Authorization") or ""
+                    if not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+                        raise IndexServiceError(f"Missing or wrong token (see {token_path(service.root_dir)})", 401)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        server.daemon_threads = True
+        print(f"Index service listening at http://{host}:{server.server_address[1]}")
+        return server
+
+    def _ready(self, name) -> RepoEntry:
+        with self._lock:
+            entry = self._repos.get(name)
+        if entry is None:
+            raise IndexServiceError(f"Unknown repository: {name}", 404)
+        if entry.status != "ready":
+            raise IndexServiceError(f"Repository {name} is {entry.status}", 409)
+        return entry
+
+
+class IndexServiceClient:
+    """JSON client for a running index service."""
+
+    def __init__(self, base_url=None, timeout=60, token=None):
+        """
+        Args:
+            base_url: Service URL (default: INDEX_SERVICE_URL or DEFAULT_URL)
+            timeout: Seconds to wait for each request
+            token: API token (default: INDEX_SERVICE_TOKEN, or the token file
+                under INDEX_SERVICE_ROOT)
+        """
+        self.base_url = (base_url or os.getenv("INDEX_SERVICE_URL") or DEFAULT_URL).rstrip("/")
+        self.timeout = timeout
+        self.token = token or os.getenv("INDEX_SERVICE_TOKEN") or read_token()
+
+    def repos(self) -> list:
+        return self._request("GET", "/repos")["repos"]
+
+    def repo(self, name) -> dict:
+        return self._request("GET", f"/repos/{name}")
+
+    def add_repo(self, name, url, wait=True, poll_interval=1.0) -> dict:
+        """
+        Register a repository, by default waiting until it is indexed.
+
+        Raises:
+            IndexServiceError: If the service rejects it or indexing fails
+        """
+        info = self._request("POST", "/repos", {"name": name, "url": url})
+        while wait and info["status"] not in ("ready", "error"):
+            time.sleep(poll_interval)
+            info = self.repo(name)
+        if info["status"] == "error":
+            raise IndexServiceError(f"Indexing {name} failed: {info['error']}", 500)
+        return info
+
+    def remove_repo(self, name) -> dict:
+        return self._request("DELETE", f"/repos/{name}")
+
+    def update_repo(self, name) -> dict:
+        return self._request("POST", f"/repos/{name}/update")
+
+    def refresh(self, name, paths) -> list:
+        return self._request("POST", f"/repos/{name}/refresh", {"paths": list(paths)})["changed"]
+
+    def search(self, query, k=8, mode="hybrid", repos=None) -> list:
+        """
+        Returns:
+            list of (repo name, RetrievedChunk), most relevant first
+        """
+        payload = {"query": query, "k": k, "mode": mode}
+        if repos is not None:
+            payload["repos"] = list(repos)
+        response = self._request("POST", "/search", payload)
+        results = []
+        for result in response["results"]:
+            repo = result.pop("repo")
+            results.append((repo, RetrievedChunk(**result)))
+        return results
+
+    def _request(self, method, path, payload=None) -> dict:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise IndexServiceError(message, e.code) from None
+        except urllib.error.URLError as e:
+            raise IndexServiceError(f"Index service unreachable at {self.base_url}: {e.reason}", 503) from None
+
+
+class RemoteIndex:
+    """
+    A repository index held by the index service, usable wherever an
+    IncrementalIndexManager or IndexLease is (e.g. by SessionEngine).
+    """
+
+    def __init__(self, client, repo, repo_path, scope=None):
+        """
+        Args:
+            client: IndexServiceClient
+            repo: Service name of the repository edits are made in
+            repo_path: The service's clone of it
+            scope: Repositories searched: "repo" (just `repo`), "all", or
+                a comma-separated list of names (default: INDEX_SERVICE_SCOPE
+                or "repo")
+        """
+        self.client = client
+        self.repo = repo
+        self.repo_path = repo_path
+        scope = scope if scope is not None else os.getenv("INDEX_SERVICE_SCOPE", "repo")
+        if scope == "all":
+            self.search_repos = None
+        elif scope in ("", "repo"):
+            self.search_repos = [repo]
+        else:
+            self.search_repos = sorted({repo, *(name.strip() for name in scope.split(",") if name.strip())})
+
+    def search(self, query, k=8, mode="hybrid"):
+        return [chunk for _, chunk in self.client.search(query, k, mode, self.search_repos)]
+
+    def refresh(self, changed_paths=None, progress_callback=None):
+        if changed_paths is None:
+            return self.client.update_repo(self.repo)
+        return self.client.refresh(self.repo, changed_paths)
+
+    def save(self):
+        # The service saves after every refresh
+        pass
+
+    def release(self):
+        # The service keeps the index loaded for other clients
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Its own dest, so it cannot collide with `add`'s repository URL
+    parser.add_argument("--url", dest="service_url",
+                        help="Service URL for client commands (default: INDEX_SERVICE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the index service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=int(os.getenv("INDEX_SERVICE_PORT", DEFAULT_PORT)))
+    serve.add_argument("--root", default=os.getenv("INDEX_SERVICE_ROOT", DEFAULT_ROOT))
+
+    add = commands.add_parser("add", help="Clone and index a repository")
+    add.add_argument("name")
+    add.add_argument("repo_url", metavar="url")
+    commands.add_parser("list", help="List repositories and their status")
+    update = commands.add_parser("update", help="Fetch a repository and re-index what changed")
+    update.add_argument("name")
+    remove = commands.add_parser("remove", help="Stop serving a repository")
+    remove.add_argument("name")
+    search = commands.add_parser("search", help="Search one or more repositories")
+    search.add_argument("query")
+    search.add_argument("--repos", nargs="+")
+    search.add_argument("-k", type=int, default=8)
+    search.add_argument("--mode", default="hybrid", choices=["hybrid", "vector", "lexical"])
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = IndexService(args.root)
+        service.load_state()
+        server = service.serve(args.port, args.host)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    client = IndexServiceClient(args.service_url)
+    if args.command == "add":
+        print(json.dumps(client.add_repo(args.name, args.repo_url), indent=2))
+    elif args.command == "list":
+        for repo in client.repos():
+            print(f"{repo['name']:<24} {repo['status']:<10} {repo['files']:>7} files  {(repo['commit'] or '')[:12]}")
+    elif args.command == "update":
+        print(json.dumps(client.update_repo(args.name), indent=2))
+    elif args.command == "remove":
+        client.remove_repo(args.name)
+    elif args.command == "search":
+        for repo, chunk in client.search(args.query, args.k, args.mode, args.repos):
+            print(f"[{repo}] {chunk.path}:{chunk.start_line}-{chunk.end_line} ({chunk.score:.3f})")
+
+
+if __name__ == "__main__":
+    main()
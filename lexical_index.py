@@ -0,0 +1,173 @@
+import math
+import re
+from collections import Counter
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+")
+# Query tokens that are clearly code symbols: `backticked`, snake_case, camelCase or dotted names
+SYMBOL_CANDIDATE = re.compile(r"`([^`]+)`|\b([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)\b")
+# A dotted token ending in one of these is a file name (cli_main.py), not module.attribute
+FILE_EXTENSIONS = frozenset((
+    "py", "pyi", "js", "jsx", "ts", "tsx", "md", "rst", "txt", "json", "yaml", "yml", "toml", "ini", "cfg",
+    "html", "css", "sh", "sql", "java", "kt", "go", "rs", "rb", "php", "c", "h", "cc", "cpp", "hpp", "cs", "swift"
+))
+# Shortest attribute looked up from a dotted token; shorter ones are abbreviations (i.e., e.g.)
+MIN_DOTTED_SYMBOL_LENGTH = 3
+DEFINITION_TEMPLATE = r"\b(def|class|function|interface|type|enum|const|let|var)\s+{name}\b"
+
+
+def split_identifier(identifier: str) -> list:
+    """Split snake_case / camelCase into lowercase parts: getHTTPResponse -> get, http, response."""
+    parts = []
+    for piece in identifier.split("_"):
+        parts.extend(part.lower() for part in CAMEL_PART.findall(piece))
+    return parts
+
+
+def tokenize(text: str) -> list:
+    """Lowercased identifiers plus their sub-words, so `validate_path` also matches "validate path"."""
+    terms = []
+    for identifier in IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        terms.append(lowered)
+        parts = split_identifier(identifier)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def looks_like_symbol(token: str) -> bool:
+    return "_" in token.strip("_") or "." in token or bool(re.search(r"[a-z][A-Z]", token))
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over chunk text, plus an exact-identifier map.
+
+    Documents are added and removed by chunk id alongside the vector index,
+    so both always describe the same set of chunks.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> set of doc ids
+        self.doc_terms = {}  # doc id -> Counter of terms
+        self.doc_lengths = {}  # doc id -> number of terms
+        self.symbols = {}  # exact identifier -> set of doc ids
+        self.doc_symbols = {}  # doc id -> set of exact identifiers
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self._total_length += self.doc_lengths[doc_id]
+        for term in terms:
+            self.postings.setdefault(term, set()).add(doc_id)
+        self.doc_symbols[doc_id] = set(IDENTIFIER.findall(text))
+        for identifier in self.doc_symbols[doc_id]:
+            self.symbols.setdefault(identifier, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.postings[term]
+        for identifier in self.doc_symbols.pop(doc_id, ()):
+            docs = self.symbols.get(identifier)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.symbols[identifier]
+
+    def search(self, query, k=10, candidates=None):
+        """
+        BM25-rank documents for the query.
+
+        Args:
+            candidates: Optional set of doc ids to restrict scoring to
+
+        Returns:
+            list of (doc_id, score), best first
+        """
+        if not self.doc_terms:
+            return []
+        doc_count = len(self.doc_terms)
+        avg_length = self._total_length / doc_count or 1.0
+
+        scores = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id in docs:
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                tf = self.doc_terms[doc_id][term]
+                length = self.doc_lengths[doc_id]
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def find_symbols(self, query) -> list:
+        """Code symbols named in the query that exist verbatim in the index."""
+        found = []
+        for match in SYMBOL_CANDIDATE.finditer(query):
+            backticked, bare = match.groups()
+            token = (backticked or bare).strip().rstrip("()")
+            if not backticked and not looks_like_symbol(token):
+                continue
+            # For dotted names like module.func, the last component is the symbol
+            name = token.split(".")[-1]
+            if "." in token and (name.lower() in FILE_EXTENSIONS or len(name) < MIN_DOTTED_SYMBOL_LENGTH):
+                continue
+            if name in self.symbols and name not in found:
+                found.append(name)
+        return found
+
+    def symbol_search(self, query, symbols, doc_text, k=10):
+        """
+        Rank documents containing the given symbols: chunks that define a
+        symbol first, then by BM25 score.
+
+        Args:
+            doc_text: callable(doc_id) -> chunk text, used to spot definitions
+        """
+        candidates = set()
+        for name in symbols:
+            candidates |= self.symbols.get(name, set())
+        bm25 = dict(self.search(query + " " + " ".join(symbols), k=len(candidates), candidates=candidates))
+
+        definitions = [re.compile(DEFINITION_TEMPLATE.format(name=re.escape(name))) for name in symbols]
+
+        scores = {}
+        for doc_id in candidates:
+            text = doc_text(doc_id) or ""
+            defines = sum(1 for pattern in definitions if pattern.search(text))
+            # A definition outweighs any plausible BM25 difference between chunks
+            scores[doc_id] = 100.0 * defines + bm25.get(doc_id, 0.0)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked lists of ids into one list of (id, score), best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
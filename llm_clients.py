@@ -1,8 +1,13 @@
-from bedrock_client import bedrock
+from bedrock_client import get_bedrock_client
 import json
 import re
 import os
-from file_operations import RepoFileManager, FileOperationError
+import time
+from file_operations import EditHunk, RepoFileManager, FileOperationError, format_line_ranges
+from llm_router import MODELS, LLMRouter, is_edit_request
+from telemetry import telemetry
+
+LLAMA_MODEL_ID = "meta.llama3-70b-instruct-v1:0"
 
 
 def extract_file_updates(response: str) -> list:
@@ -41,26 +46,90 @@ def extract_file_updates(response: str) -> list:
 
     return updates
 
-def ask_llm(context, prompt, repo_path):
+SEARCH_REPLACE_BLOCK = re.compile(
+    r'^<<<<<<< SEARCH[ \t]*\n(.*?)^=======[ \t]*\n(.*?)^>>>>>>> REPLACE[ \t]*$', re.DOTALL | re.MULTILINE
+)
+DIFF_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+
+def parse_search_replace(body: str) -> list:
+    return [EditHunk(search, replace) for search, replace in SEARCH_REPLACE_BLOCK.findall(body)]
 
-    model = os.getenv("LLM_MODEL", "llama")
 
+def parse_unified_diff(body: str) -> list:
+    """Turn unified diff hunks into search/replace hunks: context and '-' lines vs. context and '+' lines."""
+    hunks = []
+    search, replace, line_hint, in_hunk = [], [], None, False
+
+    def finish():
+        if search or replace:
+            hunks.append(EditHunk("".join(search), "".join(replace), line_hint))
+
+    for line in body.splitlines(keepends=True):
+        if line.startswith("@@"):
+            finish()
+            search, replace, in_hunk = [], [], True
+            header = DIFF_HUNK_HEADER.match(line)
+            line_hint = int(header.group(1)) if header else None
+        elif not in_hunk or line.startswith(("---", "+++", "\\")):
+            continue
+        elif line.startswith("-"):
+            search.append(line[1:])
+        elif line.startswith("+"):
+            replace.append(line[1:])
+        else:
+            # Context line; models sometimes drop the leading space on blank lines
+            text = line[1:] if line.startswith(" ") else line
+            search.append(text)
+            replace.append(text)
+    finish()
+    return hunks
+
+
+def extract_file_edits(response: str) -> list:
     """
-    Sends a prompt to the chosen LLM and applies file updates.
+    Extract partial edits from the LLM response, as search/replace blocks:
+    <file_edit path="/absolute/path/to/file">
+    <<<<<<< SEARCH
+    lines to find
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+    </file_edit>
 
-    Args:
-        context: Code context to send to the LLM
-        prompt: User question
-        repo_path: Root path of the code repo
-        model: Choose between "llama", "claude", "openai" (default: llama)
+    or as unified diff hunks (@@ -12,3 +12,4 @@ ...) inside <file_edit>.
 
     Returns:
-        str: LLM's raw response + any error messages
+        list of tuples (file_path, [EditHunk])
     """
-    file_manager = RepoFileManager(repo_path)
-
-    system_prompt = f"""You are a coding agent that reads and modifies code.
-    When editing files, respond using this format:
+    edits = []
+    pattern = r'<file_edit path="([^"]+)">[ \t]*\n?(.*?)</file_edit>'
+    for match in re.finditer(pattern, response, re.DOTALL):
+        file_path = match.group(1).strip().replace('\\\\', '\\')
+        body = match.group(2)
+        hunks = parse_search_replace(body) if "<<<<<<< SEARCH" in body else parse_unified_diff(body)
+        if file_path and hunks:
+            edits.append((file_path, hunks))
+
+    if edits:
+        print(f"Found {len(edits)} file edits in LLM response")
+    return edits
+
+def build_system_prompt(context, prompt, repo_path):
+    return f"""You are a coding agent that reads and modifies code.
+    To change part of an existing file, send only the changed lines with
+    enough surrounding lines to locate them, copied exactly:
+
+    <file_edit path="/path/to/file">
+    <<<<<<< SEARCH
+    existing lines
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+    </file_edit>
+
+    A <file_edit> may hold several SEARCH/REPLACE blocks, applied in order.
+    To create a file or rewrite one completely, send its full content:
 
     <file_update path="/path/to/file">
     updated content here
@@ -75,78 +144,195 @@ def ask_llm(context, prompt, repo_path):
     User request: {prompt}
     """
 
+def _build_request(model, system_prompt):
+    """Return (model_id, JSON body) for the chosen model."""
     if model == "llama":
         body = {
             "prompt": f"Human: {system_prompt}\nAssistant:",
             "temperature": 0.5
         }
+        return LLAMA_MODEL_ID, json.dumps(body)
+
+    model_inference_Id = os.getenv('MODEL_INFERENCE_ID')
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 8000,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": system_prompt
+                    }
+                ]
+            }
+        ]
+    }
+    return model_inference_Id, json.dumps(body)
+
+def _record_usage(model_id, input_tokens, output_tokens, span=None):
+    """Count Bedrock token usage; either count may be None when the response omits it."""
+    model_id = model_id or "unknown"
+    if input_tokens is not None:
+        telemetry.incr("bedrock_tokens_total", int(input_tokens), model=model_id, direction="input")
+    if output_tokens is not None:
+        telemetry.incr("bedrock_tokens_total", int(output_tokens), model=model_id, direction="output")
+    if span is not None:
+        span.set(input_tokens=input_tokens, output_tokens=output_tokens)
+
+def _invoke(model, system_prompt) -> str:
+    """Blocking call that returns the whole completion."""
+    model_id, body = _build_request(model, system_prompt)
+    with telemetry.span("llm_generate", model=model_id, streaming=False, request_bytes=len(body)) as span:
+        response = get_bedrock_client("inference").invoke_model(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=body
+        )
+        result = json.loads(response["body"].read())
+
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+        usage = result.get("usage", {})
+        _record_usage(
+            model_id,
+            headers.get("x-amzn-bedrock-input-token-count", usage.get("input_tokens", result.get("prompt_token_count"))),
+            headers.get("x-amzn-bedrock-output-token-count", usage.get("output_tokens", result.get("generation_token_count"))),
+            span
+        )
+
+    if model == "llama":
+        return result.get("generation", "No output received.")
+    return result['content'][0]['text']
+
+def _stream_tokens(model, system_prompt, on_token=None, on_response=None):
+    """
+    Stream a completion with invoke_model_with_response_stream.
 
-        response = bedrock.invoke_model(
-            modelId="meta.llama3-70b-instruct-v1:0",
+    Yields each text fragment as it arrives, after passing it to `on_token`.
+    `on_response` receives the response's event stream once it is open, so
+    another thread can close it to abandon the call.
+    """
+    model_id, body = _build_request(model, system_prompt)
+    with telemetry.span("llm_generate", model=model_id, streaming=True, request_bytes=len(body)) as span:
+        start = time.perf_counter()
+        response = get_bedrock_client("inference").invoke_model_with_response_stream(
+            modelId=model_id,
             contentType="application/json",
             accept="application/json",
-            body=json.dumps(body)
+            body=body
         )
+        if on_response:
+            on_response(response["body"])
+
+        first_token = True
+        for event in response["body"]:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            data = json.loads(chunk["bytes"])
+
+            # Bedrock appends token counts to the last chunk of every stream
+            invocation_metrics = data.get("amazon-bedrock-invocationMetrics")
+            if invocation_metrics:
+                _record_usage(
+                    model_id,
+                    invocation_metrics.get("inputTokenCount"),
+                    invocation_metrics.get("outputTokenCount"),
+                    span
+                )
+
+            if model == "llama":
+                token = data.get("generation") or ""
+            elif data.get("type") == "content_block_delta":
+                token = data.get("delta", {}).get("text", "")
+            else:
+                token = ""
+
+            if token:
+                if first_token:
+                    first_token = False
+                    elapsed = time.perf_counter() - start
+                    telemetry.observe("llm_first_token_seconds", elapsed, model=model_id or "unknown")
+                    span.set(first_token_ms=round(elapsed * 1000, 1))
+                if on_token:
+                    on_token(token)
+                yield token
+
+def ask_llm(context, prompt, repo_path, changes=None, on_token=None, models=None):
 
-        result = json.loads(response["body"].read())
-        response_text = result.get("generation", "No output received.")
-
-    elif model == "claude":
-        model_inference_Id = os.getenv('MODEL_INFERENCE_ID')
-        body = json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 8000,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": system_prompt
-                        }
-                    ]
-                }
-            ]
-        })
-        accept = 'application/json'
-        contentType = 'application/json'
-
-        try:
-            # Make the API call to Bedrock
-            response = bedrock.invoke_model(
-                body=body,
-                modelId=model_inference_Id,
-                accept=accept,
-                contentType=contentType
-            )
-
-            # Read the response and extract the answer
-            response_body = json.loads(response['body'].read())
-            answer = response_body['content'][0]['text']  # Adjust based on actual response structure
-
-            return answer
-
-        except Exception as e:
-            print(f"Error getting Bedrock response: {str(e)}")
-            return "Error occurred while getting response."
-
-    elif model == "openai":
+    model = os.getenv("LLM_MODEL", "llama")
+
+    """
+    Sends a prompt to the chosen LLM and applies file updates.
+
+    Models are tried through LLMRouter: change requests start on
+    LLM_EDIT_MODEL and questions on LLM_READ_MODEL, a slow model is hedged
+    with the next one, and a failing or timed-out model falls back to it.
+
+    Args:
+        context: Code context to send to the LLM
+        prompt: User question
+        repo_path: Root path of the code repo
+        changes: Optional list that receives a FileChange per file written,
+            so callers can re-index or display only what changed
+        on_token: Optional callable; when given the completion is streamed
+            and each text fragment is passed to it as it arrives
+        models: Optional list that receives the model whose response was used,
+            which after a fallback or hedge may not be the first choice
+        model: Choose between "llama", "claude", "openai" (default: llama)
+
+    Returns:
+        str: LLM's raw response + any error messages
+
+    Raises:
+        LLMError: If no model produced a complete response
+    """
+    file_manager = RepoFileManager(repo_path)
+
+    system_prompt = build_system_prompt(context, prompt, repo_path)
+
+    if model == "openai":
         # Add OpenAI logic here
         response_text = "OpenAI is not yet implemented."
-
-    else:
+    elif model not in MODELS:
         return f"Unknown model: {model}"
+    else:
+        router = LLMRouter.from_env(_stream_tokens, _invoke)
+        # The prompt ends with the current request, after any history
+        edit = is_edit_request(prompt.rsplit("User:", 1)[-1])
+        answered_by, response_text = router.generate(system_prompt, on_token, edit=edit)
+        if models is not None:
+            models.append(answered_by)
 
     file_updates = extract_file_updates(response_text)
-    if file_updates:
+    file_edits = extract_file_edits(response_text)
+    file_changes = []
+    if file_updates or file_edits:
         response_text += "\n\n## File Updates Summary"
 
-    for file_path, content in file_updates:
-        try:
-            file_manager.safe_write_to_file(file_path, content)
-            response_text += f"\n Successfully updated: {file_path}"
-        except FileOperationError as e:
-            print(f" Failed to update file: {file_path}")
-            response_text += f"\n Error updating {file_path}: {str(e)}"
+        # All updates and edits from one response are committed together, so
+        # a failure part-way never leaves the repository half-edited
+        with telemetry.span("apply_file_updates", files=len(file_updates), edits=len(file_edits)) as span:
+            try:
+                file_changes = file_manager.commit_changes(file_updates, file_edits)
+                telemetry.incr("file_commits_total", result="ok")
+                telemetry.incr("file_writes_total", len(file_changes), result="ok")
+                span.set(changed=len(file_changes))
+                for change in file_changes:
+                    response_text += (
+                        f"\n Successfully {change.action}: {file_manager.get_relative_path(change.path)}"
+                        f" ({format_line_ranges(change.line_ranges)})"
+                    )
+                if not file_changes:
+                    response_text += "\n No changes needed"
+            except FileOperationError as e:
+                telemetry.incr("file_commits_total", result="error")
+                print(" Failed to apply file updates; no files were changed")
+                response_text += f"\n Error applying file updates, no files were changed: {str(e)}"
+
+    if changes is not None:
+        changes.extend(file_changes)
 
     return response_text
@@ -0,0 +1,289 @@
+import os
+import re
+import threading
+import time
+from telemetry import telemetry
+
+MODELS = ("llama", "claude")
+# Verbs that ask for a change rather than an explanation
+EDIT_INTENT = re.compile(
+    r"\b(add|change|fix|implement|refactor|rename|write|create|update|delete|remove|modify|replace|edit|"
+    r"move|convert|generate|make)\b",
+    re.IGNORECASE
+)
+
+
+class LLMError(Exception):
+    """No model produced a complete response."""
+
+
+def is_edit_request(text: str) -> bool:
+    """True if the request reads as asking for code changes rather than an answer."""
+    return bool(EDIT_INTENT.search(text))
+
+
+def model_available(model: str) -> bool:
+    # Claude runs whichever inference profile MODEL_INFERENCE_ID names
+    return model == "llama" or (model == "claude" and bool(os.getenv("MODEL_INFERENCE_ID")))
+
+
+def preferred_model(edit=False) -> str:
+    """The model a question (or, with edit=True, a change request) is sent to first."""
+    return os.getenv("LLM_EDIT_MODEL" if edit else "LLM_READ_MODEL") or os.getenv("LLM_MODEL", "llama")
+
+
+def configured_models() -> list:
+    """
+    LLM_MODEL, LLM_READ_MODEL, LLM_EDIT_MODEL and the fallbacks (LLM_FALLBACK,
+    comma-separated; default: the other model when it is configured), in
+    fallback order and without duplicates.
+    """
+    primary = os.getenv("LLM_MODEL", "llama")
+    fallback = os.getenv("LLM_FALLBACK")
+    if fallback is None:
+        fallbacks = [model for model in MODELS if model != primary and model_available(model)]
+    else:
+        fallbacks = [model.strip() for model in fallback.split(",") if model.strip()]
+    models = []
+    for model in [primary, preferred_model(False), preferred_model(True), *fallbacks]:
+        if model not in models:
+            models.append(model)
+    return models
+
+
+def model_timeouts(models) -> dict:
+    """{model: seconds} from LLM_TIMEOUT_<MODEL>, falling back to LLM_TIMEOUT (default 120)."""
+    default_timeout = os.getenv("LLM_TIMEOUT", "120")
+    return {model: float(os.getenv(f"LLM_TIMEOUT_{model.upper()}", default_timeout)) for model in models}
+
+
+class _Attempt:
+    def __init__(self, model, timeout):
+        self.model = model
+        self.deadline = time.monotonic() + timeout
+        self.timeout = timeout
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.callback_error = None
+        self.timed_out = False
+        self.cancelled = threading.Event()
+        self._response = None
+        self._response_lock = threading.Lock()
+
+    def set_response(self, response):
+        """Register the open response stream, so abort() can close it."""
+        with self._response_lock:
+            self._response = response
+            aborted = self.cancelled.is_set()
+        if aborted:
+            self._close(response)
+
+    def abort(self):
+        """
+        Abandon the attempt. Closing its response stream unblocks the thread
+        reading it and frees the connection, instead of leaving the call
+        running against a throttled endpoint until the next token arrives.
+        """
+        with self._response_lock:
+            self.cancelled.set()
+            response = self._response
+        if response is not None:
+            self._close(response)
+
+    @staticmethod
+    def _close(response):
+        try:
+            response.close()
+        except Exception:
+            # Already closed, or being read this instant; the reader stops
+            # at its next cancelled check either way
+            pass
+
+
+class LLMRouter:
+    """
+    Sends a prompt to the models in order, hedging and failing over.
+
+    The first model runs alone. If it has produced nothing (no token when
+    streaming, no response otherwise) after `hedge_after` seconds, the next
+    model is started alongside it and whichever answers first wins; the
+    other is abandoned. A model that errors or exceeds its timeout before
+    winning hands over to the next one. Once a streamed response has started
+    reaching `on_token` it cannot be swapped, so a failure after that point
+    raises LLMError.
+    """
+
+    def __init__(self, stream, invoke, models, read_model=None, edit_model=None, timeouts=None, hedge_after=None):
+        """
+        Args:
+            stream: Callable (model, system_prompt, on_response=...) -> iterator
+                of text fragments; it passes its open response stream (anything
+                with close()) to on_response, so abandoned calls can be closed
+            invoke: Callable (model, system_prompt) -> complete text
+            models: Models to try, in fallback order
+            read_model: First choice for questions (default: models[0])
+            edit_model: First choice for change requests (default: models[0])
+            timeouts: {model: seconds} for one whole response (default 120)
+            hedge_after: Seconds without output before the next model is
+                started in parallel, or None to only fail over
+        """
+        self.stream = stream
+        self.invoke = invoke
+        self.models = list(models)
+        self.read_model = read_model or self.models[0]
+        self.edit_model = edit_model or self.models[0]
+        self.timeouts = timeouts or {}
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def from_env(cls, stream, invoke):
+        """
+        Configure from LLM_MODEL (first choice), LLM_FALLBACK (comma-separated;
+        default: the other model when it is configured), LLM_READ_MODEL,
+        LLM_EDIT_MODEL, LLM_TIMEOUT / LLM_TIMEOUT_<MODEL> (seconds) and
+        LLM_HEDGE_AFTER (seconds, 0 disables hedging).
+        """
+        models = configured_models()
+        for model in models:
+            if model not in MODELS:
+                raise ValueError(f"Unknown model {model!r}, expected one of {MODELS}")
+        hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "8")) or None
+        return cls(stream, invoke, models, preferred_model(False), preferred_model(True), model_timeouts(models),
+                   hedge_after)
+
+    def plan(self, edit=False) -> list:
+        """Models in the order they would be tried for a question or a change request."""
+        first = self.edit_model if edit else self.read_model
+        return [first] + [model for model in self.models if model != first]
+
+    def generate(self, system_prompt, on_token=None, edit=False):
+        """
+        Args:
+            system_prompt: Complete prompt for the model
+            on_token: Optional callable receiving the winning model's text
+                fragments as they arrive; exceptions it raises (e.g. to
+                cancel) propagate unchanged
+            edit: Route as a change request (edit_model first)
+
+        Returns:
+            (model, text) of the response that won
+
+        Raises:
+            LLMError: If every model failed or timed out, or the streamed
+                response failed part-way
+        """
+        plan = self.plan(edit)
+        attempts = []
+        condition = threading.Condition()
+        state = {"winner": None}
+
+        def claim(attempt):
+            # Called with `condition` held; the first attempt to claim wins
+            if state["winner"] is None:
+                state["winner"] = attempt
+                for other in attempts:
+                    if other is not attempt:
+                        other.abort()
+                condition.notify_all()
+            return state["winner"] is attempt
+
+        def run(attempt):
+            try:
+                if on_token is None:
+                    text = self.invoke(attempt.model, system_prompt)
+                    with condition:
+                        if not attempt.cancelled.is_set() and claim(attempt):
+                            attempt.tokens.append(text)
+                    return
+                tokens = self.stream(attempt.model, system_prompt, on_response=attempt.set_response)
+                try:
+                    for token in tokens:
+                        with condition:
+                            if attempt.cancelled.is_set() or not claim(attempt):
+                                break
+                        attempt.tokens.append(token)
+                        try:
+                            on_token(token)
+                        except BaseException as e:
+                            attempt.callback_error = e
+                            break
+                finally:
+                    close = getattr(tokens, "close", None)
+                    if close:
+                        close()
+            except Exception as e:
+                attempt.error = e
+            finally:
+                with condition:
+                    attempt.done = True
+                    condition.notify_all()
+
+        def start_next():
+            model = plan[len(attempts)]
+            attempt = _Attempt(model, self.timeouts.get(model, 120.0))
+            attempts.append(attempt)
+            threading.Thread(target=run, args=(attempt,), name=f"llm-{model}", daemon=True).start()
+            return time.monotonic() + self.hedge_after if self.hedge_after else None
+
+        with telemetry.span("llm_route", plan=",".join(plan), edit=edit) as span:
+            with condition:
+                hedge_at = start_next()
+                while True:
+                    winner = state["winner"]
+                    if winner is not None and (winner.done or winner.timed_out):
+                        break
+                    now = time.monotonic()
+                    for attempt in attempts:
+                        if not attempt.done and not attempt.cancelled.is_set() and now >= attempt.deadline:
+                            attempt.timed_out = True
+                            attempt.abort()
+                    if winner is not None and winner.timed_out:
+                        break
+
+                    running = [a for a in attempts if not a.done and not a.cancelled.is_set()]
+                    if winner is None and len(attempts) < len(plan):
+                        if not running:
+                            # Fail over: everything started so far errored or timed out
+                            hedge_at = start_next()
+                            continue
+                        if hedge_at is not None and now >= hedge_at:
+                            telemetry.incr("llm_hedges_total", model=plan[len(attempts)])
+                            hedge_at = start_next()
+                            continue
+                    elif winner is None and not running:
+                        break
+
+                    wake = [a.deadline for a in running]
+                    if winner is None and hedge_at is not None and len(attempts) < len(plan):
+                        wake.append(hedge_at)
+                    condition.wait(max(0.0, min(wake) - now) if wake else None)
+
+            winner = state["winner"]
+            for attempt in attempts:
+                if attempt.timed_out:
+                    result = "timeout"
+                elif attempt is winner and attempt.error is None:
+                    result = "won"
+                elif attempt.cancelled.is_set():
+                    result = "abandoned"
+                else:
+                    result = "error"
+                telemetry.incr("llm_attempts_total", model=attempt.model, result=result)
+            span.set(attempts=len(attempts), winner=winner.model if winner else None)
+
+        if winner is not None:
+            if winner.callback_error is not None:
+                raise winner.callback_error
+            if winner.timed_out:
+                raise LLMError(f"{winner.model} timed out after {winner.timeout:g}s part-way through its response")
+            if winner.error is not None:
+                raise LLMError(f"{winner.model} failed part-way through its response: {winner.error}") from winner.error
+            return winner.model, "".join(winner.tokens)
+
+        failures = "; ".join(
+            f"{a.model}: timed out after {a.timeout:g}s" if a.timed_out else f"{a.model}: {a.error}"
+            for a in attempts
+        )
+        print(f"Error getting Bedrock response: {failures}")
+        raise LLMError(f"No model could answer ({failures})") from attempts[-1].error
@@ -1,13 +1,120 @@
+import math
+import re
+from array import array
+from prompt_builder import estimate_tokens
+
+FILE_UPDATE_BLOCK = re.compile(r'(<file_update path="[^"]+">)(.*?)(</file_update>)', re.DOTALL)
+
+
+def compact_response(response: str) -> str:
+    """Replace full-file bodies of <file_update> blocks with a line count; the files themselves are indexed."""
+    return FILE_UPDATE_BLOCK.sub(
+        lambda m: f"{m.group(1)}[{m.group(2).strip().count(chr(10)) + 1} lines]{m.group(3)}", response
+    )
+
+
+def context_refs(retrieved_context) -> list:
+    """Reduce retrieved chunks to (path, start_line, end_line) references instead of text copies."""
+    if not retrieved_context or isinstance(retrieved_context, str):
+        return []
+    refs = []
+    for item in retrieved_context:
+        if hasattr(item, "path"):
+            refs.append((item.path, getattr(item, "start_line", None), getattr(item, "end_line", None)))
+        elif isinstance(item, (tuple, list)) and item:
+            refs.append((item[0], None, None))
+    return refs
+
+
+def summarize_turn(summary: str, turn: dict) -> str:
+    """Default extractive roll-up: one short line per turn, no LLM call."""
+    answer = turn["assistant_response"].strip().split("\n", 1)[0]
+    line = f"- User asked: {turn['user_input'][:150]} | Assistant: {answer[:200]}"
+    files = sorted({ref[0] for ref in turn["context_refs"]})
+    if files:
+        line += f" | Files: {', '.join(files[:5])}"
+    return f"{summary}\n{line}" if summary else line
+
+
 class ConversationMemory:
-    def __init__(self):
+    """
+    Conversation history bounded by a token budget.
+
+    Turns are stored compactly (file-update bodies elided, retrieved context
+    kept as chunk references). When the stored turns exceed `token_budget`,
+    the oldest are folded into a rolling summary, itself capped at
+    `summary_budget` tokens. If an embedding model is supplied, past turns can
+    be retrieved by similarity to the current query instead of recency.
+    """
+
+    def __init__(self, token_budget=3000, summary_budget=500, summarizer=summarize_turn, embedding_model=None):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summarizer = summarizer
+        self.embedding_model = embedding_model
         self.history = []
+        self.summary = ""
+        self._tokens = 0
 
     def add_interaction(self, user_input, retrieved_context, assistant_response):
-        self.history.append({
+        turn = {
             "user_input": user_input,
-            "retrieved_context": retrieved_context,
-            "assistant_response": assistant_response
-        })
+            "context_refs": context_refs(retrieved_context),
+            "assistant_response": compact_response(assistant_response)
+        }
+        turn["tokens"] = estimate_tokens(turn["user_input"]) + estimate_tokens(turn["assistant_response"])
+        if self.embedding_model is not None:
+            turn["embedding"] = array('f', self.embedding_model.embed_query(
+                f"{user_input}\n{turn['assistant_response'][:1000]}"
+            ))
+
+        self.history.append(turn)
+        self._tokens += turn["tokens"]
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        # Always keep the latest turn verbatim, however large
+        while self._tokens > self.token_budget and len(self.history) > 1:
+            oldest = self.history.pop(0)
+            self._tokens -= oldest["tokens"]
+            self.summary = self.summarizer(self.summary, oldest)
+
+        while self.summary and estimate_tokens(self.summary) > self.summary_budget:
+            if "\n" not in self.summary:
+                self.summary = self.summary[-self.summary_budget * 4:]
+                break
+            self.summary = self.summary.split("\n", 1)[1]
 
     def get_recent_history(self, n=20):
         return self.history[-n:]
+
+    def get_relevant_history(self, query, n=4, recent=2):
+        """
+        The `recent` latest turns plus up to `n` earlier turns most similar to
+        the query, in chronological order. Falls back to recency without an
+        embedding model.
+        """
+        if self.embedding_model is None or len(self.history) <= recent:
+            return self.get_recent_history(n + recent)
+
+        query_vector = self.embedding_model.embed_query(query)
+        older = self.history[:-recent] if recent else self.history
+        ranked = sorted(
+            range(len(older)),
+            key=lambda i: _cosine(query_vector, older[i]["embedding"]),
+            reverse=True
+        )[:n]
+        return [older[i] for i in sorted(ranked)] + self.history[len(older):]
+
+    def get_history_for_prompt(self, query=None, n=6):
+        """Turns to show the model: the rolling summary (if any) followed by recent or relevant turns."""
+        turns = self.get_relevant_history(query, n - 2) if query and self.embedding_model else self.get_recent_history(n)
+        if self.summary:
+            return [{"summary": self.summary}] + turns
+        return turns
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
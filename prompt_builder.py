@@ -0,0 +1,151 @@
+import hashlib
+import math
+import os
+from typing import NamedTuple
+from telemetry import telemetry, SIZE_BUCKETS
+
+# Input-token budgets per LLM_MODEL value. Llama 3 70B has an 8k window, so
+# leave room for the generation; Claude's window is far larger but input
+# tokens drive both latency and cost, so cap it well below the limit.
+MODEL_TOKEN_BUDGETS = {
+    "llama": 5500,
+    "claude": 24000,
+}
+DEFAULT_TOKEN_BUDGET = 6000
+# Fixed instructions added around the context by llm_clients.build_system_prompt
+SYSTEM_PROMPT_OVERHEAD = 150
+
+
+class RetrievedChunk(NamedTuple):
+    chunk_id: str
+    path: str
+    text: str
+    start_line: int
+    end_line: int
+    score: float  # higher is more relevant
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for code and English)."""
+    return math.ceil(len(text) / 4)
+
+
+def budget_for_model(model: str = None) -> int:
+    if os.getenv("PROMPT_TOKEN_BUDGET"):
+        return int(os.getenv("PROMPT_TOKEN_BUDGET"))
+    model = model or os.getenv("LLM_MODEL", "llama")
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def dedupe_chunks(chunks):
+    """Drop chunks with identical text or whose lines are covered by a better chunk of the same file."""
+    kept, seen_text = [], set()
+    for chunk in sorted(chunks, key=lambda c: c.score, reverse=True):
+        digest = hashlib.sha1(chunk.text.strip().encode('utf-8')).hexdigest()
+        if digest in seen_text:
+            continue
+        covered = any(
+            other.path == chunk.path
+            and other.start_line <= chunk.start_line
+            and chunk.end_line <= other.end_line
+            for other in kept
+        )
+        if covered:
+            continue
+        seen_text.add(digest)
+        kept.append(chunk)
+    return kept
+
+
+def merge_adjacent_chunks(chunks):
+    """Merge chunks of the same file whose line ranges touch or overlap into one chunk."""
+    merged = []
+    for chunk in sorted(chunks, key=lambda c: (c.path, c.start_line)):
+        previous = merged[-1] if merged else None
+        if previous and previous.path == chunk.path and chunk.start_line <= previous.end_line + 1:
+            lines = chunk.text.splitlines(keepends=True)
+            # Ranges are unreliable for chunks sliced out of one very long line
+            if len(lines) == chunk.end_line - chunk.start_line + 1:
+                skip = max(0, previous.end_line - chunk.start_line + 1)
+                text = previous.text
+                if text and not text.endswith("\n"):
+                    text += "\n"
+                merged[-1] = RetrievedChunk(
+                    previous.chunk_id,
+                    previous.path,
+                    text + "".join(lines[skip:]),
+                    previous.start_line,
+                    max(previous.end_line, chunk.end_line),
+                    max(previous.score, chunk.score)
+                )
+                continue
+        merged.append(chunk)
+    return merged
+
+
+def format_chunk(chunk) -> str:
+    return f"### {chunk.path} (lines {chunk.start_line}-{chunk.end_line})\n```\n{chunk.text.rstrip()}\n```"
+
+
+def format_turn(turn) -> str:
+    if "summary" in turn:
+        return f"Summary of earlier conversation:\n{turn['summary']}"
+    return f"User: {turn['user_input']}\nAssistant: {turn['assistant_response']}"
+
+
+class PromptBuilder:
+    """
+    Assembles the context and conversation prompt for ask_llm within a token budget.
+
+    Retrieved chunks are deduplicated, merged when adjacent in the same file
+    and admitted by score until the context share of the budget is spent.
+    History is added newest-first and capped at `history_share` of the budget.
+    """
+
+    def __init__(self, model: str = None, token_budget: int = None, history_share: float = 0.25):
+        self.token_budget = token_budget or budget_for_model(model)
+        self.history_share = history_share
+
+    def build(self, user_input, chunks, history=()):
+        """
+        Args:
+            user_input: The current question or instruction
+            chunks: RetrievedChunk results, in any order
+            history: Past turns as dicts with user_input / assistant_response,
+                optionally led by a {"summary": ...} entry
+
+        Returns:
+            (context, prompt, used_chunks): formatted context, the history and
+            user message, and the chunks that made it into the context
+        """
+        remaining = self.token_budget - SYSTEM_PROMPT_OVERHEAD - estimate_tokens(user_input) - 10
+
+        history_budget = min(max(remaining, 0), int(self.token_budget * self.history_share))
+        history_parts = []
+        for turn in reversed(list(history)):
+            text = format_turn(turn)
+            cost = estimate_tokens(text) + 1
+            if cost > history_budget:
+                break
+            history_parts.insert(0, text)
+            history_budget -= cost
+            remaining -= cost
+
+        candidates = merge_adjacent_chunks(dedupe_chunks(chunks))
+        used = []
+        for chunk in sorted(candidates, key=lambda c: c.score, reverse=True):
+            cost = estimate_tokens(format_chunk(chunk)) + 1
+            if cost <= remaining:
+                used.append(chunk)
+                remaining -= cost
+
+        # Present admitted chunks in file order so related code reads top to bottom
+        used.sort(key=lambda c: (c.path, c.start_line))
+        context = "\n\n".join(format_chunk(chunk) for chunk in used)
+
+        history_text = "\n".join(history_parts)
+        prompt = f"{history_text}\nUser: {user_input}" if history_text else f"User: {user_input}"
+        telemetry.observe("prompt_tokens", estimate_tokens(context + prompt), buckets=SIZE_BUCKETS)
+        telemetry.incr("prompt_chunks_total", len(used), result="used")
+        telemetry.incr("prompt_chunks_total", len(candidates) - len(used), result="dropped")
+        return context, prompt, used
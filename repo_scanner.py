@@ -0,0 +1,203 @@
+import os
+import re
+from pathlib import Path
+
+# Always skipped, on top of the repository's own .gitignore files
+DEFAULT_EXCLUDES = (
+    ".git/", "node_modules/", "dist/", "build/", "out/", "target/", ".venv/", "venv/",
+    "__pycache__/", ".next/", "coverage/", "vendor/", "*.min.js", "*.min.css", "*.map", "*.lock"
+)
+DEFAULT_MAX_FILE_SIZE = 1_000_000
+# File types chunked and indexed unless a caller asks for others
+DEFAULT_EXTENSIONS = (".py", ".js", ".ts", ".md")
+
+
+def _glob_to_regex(pattern: str) -> str:
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "(?:/.*)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+def compile_ignore_pattern(pattern: str):
+    """
+    Compile one .gitignore line.
+
+    Returns:
+        (regex, negate, dir_only) or None for blank lines and comments
+    """
+    pattern = pattern.rstrip("\n").rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    if pattern.startswith("\\"):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    prefix = "^" if anchored else "^(?:.*/)?"
+    return re.compile(prefix + _glob_to_regex(pattern) + "$"), negate, dir_only
+
+
+class IgnoreRules:
+    """
+    Gitignore-style matcher for a repository.
+
+    Honors the root and nested .gitignore files (loaded lazily per directory)
+    plus extra exclude patterns, which use the same syntax and apply from the
+    repository root. Paths are repo-relative and use forward slashes.
+    """
+
+    def __init__(self, repo_path, exclude=DEFAULT_EXCLUDES):
+        self.repo_path = os.path.abspath(repo_path)
+        self._extra = [rule for rule in map(compile_ignore_pattern, exclude) if rule]
+        # repo-relative dir ("" for the root) -> compiled rules of its .gitignore
+        self._rules = {}
+
+    def _rules_for(self, rel_dir):
+        if rel_dir not in self._rules:
+            rules = []
+            gitignore = os.path.join(self.repo_path, rel_dir, ".gitignore")
+            try:
+                with open(gitignore, "r", encoding="utf-8", errors="ignore") as f:
+                    rules = [rule for rule in map(compile_ignore_pattern, f) if rule]
+            except OSError:
+                pass
+            self._rules[rel_dir] = rules
+        return self._rules[rel_dir]
+
+    def _matches(self, rel_path, is_dir):
+        ignored = False
+        for regex, negate, dir_only in self._extra:
+            if (is_dir or not dir_only) and regex.match(rel_path):
+                ignored = not negate
+
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            base = "/".join(parts[:depth])
+            local_path = "/".join(parts[depth:])
+            for regex, negate, dir_only in self._rules_for(base):
+                if (is_dir or not dir_only) and regex.match(local_path):
+                    ignored = not negate
+        return ignored
+
+    def is_ignored(self, rel_path, is_dir=False, check_parents=True) -> bool:
+        """Whether a repo-relative path is excluded, including via an ignored parent directory."""
+        rel_path = rel_path.replace(os.sep, "/").strip("/")
+        if rel_path in ("", "."):
+            return False
+        if rel_path == ".." or rel_path.startswith("../"):
+            return True
+        if check_parents:
+            parts = rel_path.split("/")
+            for depth in range(1, len(parts)):
+                if self._matches("/".join(parts[:depth]), True):
+                    return True
+        return self._matches(rel_path, is_dir)
+
+    def is_ignored_path(self, abs_path) -> bool:
+        rel_path = os.path.relpath(os.path.abspath(abs_path), self.repo_path)
+        return self.is_ignored(rel_path, os.path.isdir(abs_path))
+
+
+def iter_source_files(repo_path, extensions, ignore_rules=None):
+    """
+    Walk a repository and yield absolute paths of files with the given
+    extensions, pruning ignored directories instead of descending into them.
+    """
+    repo_path = os.path.abspath(repo_path)
+    ignore_rules = ignore_rules or IgnoreRules(repo_path)
+
+    for root, dirs, files in os.walk(repo_path):
+        rel_root = os.path.relpath(root, repo_path).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root + "/"
+
+        dirs[:] = sorted(
+            d for d in dirs
+            if not ignore_rules.is_ignored(rel_root + d, is_dir=True, check_parents=False)
+        )
+        for name in sorted(files):
+            if Path(name).suffix in extensions and not ignore_rules.is_ignored(rel_root + name, check_parents=False):
+                yield os.path.join(root, name)
+
+
+def is_binary(data: bytes) -> bool:
+    return b"\0" in data[:8192]
+
+
+def is_minified(text: str) -> bool:
+    """Heuristic for generated or minified sources: very long average line length."""
+    if len(text) < 2000:
+        return False
+    return len(text) / (text.count("\n") + 1) > 300
+
+
+def read_source_bytes(file_path, max_file_size=DEFAULT_MAX_FILE_SIZE):
+    """Raw contents of a file, or None if it is too large or unreadable."""
+    try:
+        if os.path.getsize(file_path) > max_file_size:
+            return None
+        with open(file_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def decode_source(data: bytes):
+    """Text of a source file's bytes, or None if they are binary or minified."""
+    if is_binary(data):
+        return None
+    text = data.decode("utf-8", errors="ignore")
+    if is_minified(text):
+        return None
+    return text
+
+
+def read_source_file(file_path, max_file_size=DEFAULT_MAX_FILE_SIZE):
+    """
+    Read a source file as text.
+
+    Returns:
+        str, or None if the file is too large, binary, minified or unreadable
+    """
+    data = read_source_bytes(file_path, max_file_size)
+    return None if data is None else decode_source(data)
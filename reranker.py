@@ -0,0 +1,145 @@
+import math
+import os
+from lexical_index import tokenize
+
+# Similarity assumed between chunks of one file whose line ranges touch or
+# overlap: successive windows of the same code are near-duplicates even when
+# their token sets differ
+ADJACENT_SIMILARITY = 0.8
+
+
+class Reranker:
+    """
+    Post-retrieval stage that turns an over-fetched candidate list into fewer,
+    more useful chunks.
+
+    1. Relevance: each candidate's absolute signal (cosine similarity when
+       the route has one, otherwise the IDF-weighted share of query terms it
+       contains) is blended with that query-term coverage. Scores are on a
+       fixed 0-1 scale, so they mean the same across queries and repositories.
+    2. Adaptive k: candidates below `min_relevance` are dropped, and the rest
+       are cut at the first drop of at least `gap` after the first `min_k`,
+       so a few clear matches are not padded with weak ones.
+    3. Diversity: maximal marginal relevance picks from what is left, with
+       token-set Jaccard (or ADJACENT_SIMILARITY for neighbouring windows of
+       one file) as the redundancy measure, and at most `max_per_file` chunks
+       per file.
+    """
+
+    def __init__(self, overfetch=3, mmr_lambda=0.7, max_per_file=3, lexical_weight=0.3, min_k=4, gap=0.15,
+                 min_relevance=0.2, enabled=True):
+        """
+        Args:
+            overfetch: Candidates retrieved per chunk returned
+            mmr_lambda: Relevance vs. diversity trade-off (1.0 ignores diversity)
+            max_per_file: Most chunks returned from one file (0 for no cap)
+            lexical_weight: Share of relevance from query-term coverage
+            min_k: Chunks always kept before the gap cut-off applies
+            gap: Relevance drop (on the 0-1 scale) that ends the result list
+            min_relevance: Candidates scoring below this are never returned
+                (0 keeps everything)
+            enabled: False returns the top k candidates unchanged
+        """
+        self.overfetch = max(1, overfetch)
+        self.mmr_lambda = mmr_lambda
+        self.max_per_file = max_per_file
+        self.lexical_weight = lexical_weight
+        self.min_k = min_k
+        self.gap = gap
+        self.min_relevance = min_relevance
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls):
+        """
+        Configure from RERANK (0 disables) and
+        RERANK_<OVERFETCH|MMR_LAMBDA|MAX_PER_FILE|LEXICAL_WEIGHT|MIN_K|GAP|MIN_RELEVANCE>.
+        """
+        return cls(
+            overfetch=int(os.getenv("RERANK_OVERFETCH", "3")),
+            mmr_lambda=float(os.getenv("RERANK_MMR_LAMBDA", "0.7")),
+            max_per_file=int(os.getenv("RERANK_MAX_PER_FILE", "3")),
+            lexical_weight=float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.3")),
+            min_k=int(os.getenv("RERANK_MIN_K", "4")),
+            gap=float(os.getenv("RERANK_GAP", "0.15")),
+            min_relevance=float(os.getenv("RERANK_MIN_RELEVANCE", "0.2")),
+            enabled=os.getenv("RERANK", "1") != "0"
+        )
+
+    def candidates(self, k) -> int:
+        """How many chunks to retrieve for a request of k."""
+        return k * self.overfetch if self.enabled else k
+
+    def select(self, query, chunks, k, signals=None):
+        """
+        Args:
+            query: The search query
+            chunks: Candidate RetrievedChunks, most relevant first
+            k: Most chunks to return
+            signals: Optional absolute relevance per candidate in [0, 1]
+                (e.g. cosine similarity), or None where the route has none;
+                coverage of the query terms stands in for missing ones
+
+        Returns:
+            Up to k RetrievedChunks in selection order, each scored with its
+            reranked relevance in [0, 1]
+        """
+        if not self.enabled:
+            return list(chunks[:k])
+        if not chunks:
+            return []
+
+        terms = [set(tokenize(chunk.text)) for chunk in chunks]
+        relevance = self._relevance(query, terms, signals or [None] * len(chunks))
+        ranked = sorted(range(len(chunks)), key=lambda i: relevance[i], reverse=True)
+        ranked = [i for i in ranked if relevance[i] >= self.min_relevance]
+
+        target = min(k, len(ranked))
+        for position in range(max(1, self.min_k), target):
+            if relevance[ranked[position - 1]] - relevance[ranked[position]] >= self.gap:
+                ranked = ranked[:position]
+                target = position
+                break
+
+        selected, per_file = [], {}
+        pool = list(ranked)
+        while pool and len(selected) < target:
+            best, best_value = None, None
+            for i in pool:
+                redundancy = max((self._similarity(chunks, terms, i, j) for j in selected), default=0.0)
+                value = self.mmr_lambda * relevance[i] - (1.0 - self.mmr_lambda) * redundancy
+                if best_value is None or value > best_value:
+                    best, best_value = i, value
+            pool.remove(best)
+            path = chunks[best].path
+            if self.max_per_file and per_file.get(path, 0) >= self.max_per_file:
+                continue
+            per_file[path] = per_file.get(path, 0) + 1
+            selected.append(best)
+
+        return [chunks[i]._replace(score=relevance[i]) for i in selected]
+
+    def _relevance(self, query, terms, signals):
+        query_terms = set(tokenize(query))
+        # IDF within the candidates, so words every chunk contains ("the",
+        # the module name) count for little
+        weights = {
+            term: math.log(1.0 + len(terms) / (1.0 + sum(1 for chunk_terms in terms if term in chunk_terms)))
+            for term in query_terms
+        }
+        total = sum(weights.values())
+        relevance = []
+        for signal, chunk_terms in zip(signals, terms):
+            coverage = sum(weight for term, weight in weights.items() if term in chunk_terms) / total if total else 0.0
+            absolute = coverage if signal is None else min(1.0, max(0.0, signal))
+            relevance.append((1.0 - self.lexical_weight) * absolute + self.lexical_weight * coverage)
+        return relevance
+
+    @staticmethod
+    def _similarity(chunks, terms, i, j) -> float:
+        a, b = chunks[i], chunks[j]
+        union = terms[i] | terms[j]
+        similarity = len(terms[i] & terms[j]) / len(union) if union else 1.0
+        if a.path == b.path and a.start_line <= b.end_line + 1 and b.start_line <= a.end_line + 1:
+            similarity = max(similarity, ADJACENT_SIMILARITY)
+        return similarity
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from telemetry import telemetry
+
+
+def normalize_prompt(text: str) -> str:
+    """Case- and whitespace-insensitive form of a question, so trivially different phrasings share a key."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def make_cache_key(*parts) -> str:
+    """Stable key for any mix of strings, numbers and sequences of them."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            part = "\x1f".join(str(item) for item in part)
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries also expire after `ttl` seconds.
+
+    Lookups are counted in the cache_requests_total metric under `name`.
+    """
+
+    def __init__(self, name: str, max_entries: int = 512, ttl: float = None):
+        """
+        Args:
+            name: Label for metrics
+            max_entries: Entries kept before the least recently used is
+                evicted; 0 disables the cache
+            ttl: Seconds an entry stays valid, or None for no expiry
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, max_entries: int = 512, ttl: float = None):
+        """Override the defaults with <prefix>_MAX_ENTRIES and <prefix>_TTL (seconds, 0 for none)."""
+        max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", str(max_entries)))
+        ttl = float(os.getenv(f"{prefix}_TTL", str(ttl or 0))) or None
+        return cls(name, max_entries, ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        telemetry.incr("cache_requests_total", cache=self.name, result="miss" if entry is None else "hit")
+        return None if entry is None else entry[1]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# Shared by every session in the process, so a question one user asked about
+# a commit is answered from memory for the next
+response_cache = TTLCache.from_env("response", "RESPONSE_CACHE", max_entries=512, ttl=3600)
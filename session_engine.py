@@ -0,0 +1,239 @@
+import asyncio
+import contextvars
+import functools
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from github_fetcher import get_head_commit
+from llm_clients import ask_llm, extract_file_edits, extract_file_updates
+from llm_router import is_edit_request, preferred_model
+from memory import ConversationMemory
+from prompt_builder import PromptBuilder
+from response_cache import make_cache_key, normalize_prompt, response_cache
+from telemetry import telemetry
+
+
+class TurnResult(NamedTuple):
+    user_input: str
+    response: str
+    used_chunks: list
+    changes: list  # FileChange per file the turn wrote
+
+    @property
+    def written_paths(self) -> list:
+        return [change.path for change in self.changes]
+
+
+# Queued after a turn's last token by SessionEngine.ask
+_TURN_DONE = object()
+
+
+def _shutdown(loop, executor):
+    loop.call_soon_threadsafe(loop.stop)
+    executor.shutdown(wait=False)
+
+
+class SessionEngine:
+    """
+    Runs one chat session's turns on a private asyncio loop.
+
+    Within a turn, retrieval (query embedding + search) and history
+    formatting run concurrently. Files written by a turn are re-indexed in
+    the background, so the next turn starts immediately; its searches see a
+    consistent snapshot of the index (see IncrementalIndexManager.refresh).
+    A turn in flight can be cancelled with cancel(). Read-only answers are
+    cached by prompt, retrieved chunks, model and commit, so a repeated
+    question is answered without calling the LLM.
+
+    Synchronous front ends call ask(); async callers can await run_turn()
+    on `engine.loop`.
+    """
+
+    def __init__(self, index, repo_path, memory=None, prompt_builder=None, k=16, max_workers=4,
+                 cache=response_cache):
+        """
+        Args:
+            index: Object with search(query, k), refresh(paths) and save(),
+                e.g. an IncrementalIndexManager or an IndexLease
+            repo_path: Repository that file updates are written to
+            memory: ConversationMemory for this session (default: a new one)
+            prompt_builder: PromptBuilder (default: budget for LLM_MODEL)
+            k: Chunks retrieved per turn before the prompt budget is applied
+            max_workers: Threads for blocking retrieval, generation and indexing
+            cache: TTLCache for responses (default: the process-wide one)
+        """
+        self.index = index
+        self.repo_path = repo_path
+        self.memory = memory or ConversationMemory()
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.k = k
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="session")
+        self._pending_paths = set()
+        self._reindex_task = None
+        self._turn_task = None
+        self._turn_lock = None
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="session-loop", daemon=True).start()
+        self._finalizer = weakref.finalize(self, _shutdown, self.loop, self._executor)
+
+    async def run_turn(self, user_input, on_token=None) -> TurnResult:
+        """
+        Answer one user message. Must run on `self.loop`.
+
+        Args:
+            user_input: The user's message
+            on_token: Optional callable receiving streamed text fragments;
+                called from a worker thread
+
+        Raises:
+            asyncio.CancelledError: If the turn was cancelled; no files are
+                written and the turn is not added to memory
+        """
+        if self._turn_lock is None:
+            self._turn_lock = asyncio.Lock()
+        async with self._turn_lock:
+            self._turn_task = asyncio.current_task()
+            try:
+                with telemetry.span("turn"):
+                    return await self._run_turn(user_input, on_token)
+            finally:
+                self._turn_task = None
+
+    async def _run_turn(self, user_input, on_token):
+        chunks, history, commit = await asyncio.gather(
+            self._run(self.index.search, user_input, k=self.k),
+            self._run(self.memory.get_history_for_prompt, user_input),
+            self._run(get_head_commit, self.repo_path)
+        )
+        context, prompt, used_chunks = self.prompt_builder.build(user_input, chunks, history)
+
+        # Chunk ids hash their content, so edits to the retrieved code change
+        # the key. Answers are stored under the model that gave them, so a
+        # fallback model's answer is never replayed as the first choice's.
+        def cache_key(model):
+            return make_cache_key(model, commit, normalize_prompt(prompt), [chunk.chunk_id for chunk in used_chunks])
+
+        response = self.cache.get(cache_key(preferred_model(is_edit_request(user_input))))
+        if response is not None:
+            if on_token:
+                on_token(response)
+            self.memory.add_interaction(user_input, used_chunks, response)
+            return TurnResult(user_input, response, used_chunks, [])
+
+        cancelled = threading.Event()
+
+        def forward_token(token):
+            # Raising inside the stream closes the Bedrock connection and
+            # stops ask_llm before it applies any file updates
+            if cancelled.is_set():
+                raise asyncio.CancelledError()
+            if on_token:
+                on_token(token)
+
+        changes, models = [], []
+        generation = self._submit(ask_llm, context, prompt, self.repo_path, changes, on_token=forward_token,
+                                  models=models)
+        try:
+            # Shielded so the worker's completion is still observed after a cancel
+            response = await asyncio.shield(generation)
+        except asyncio.CancelledError:
+            cancelled.set()
+            # Updates already being applied when the cancel arrived still get indexed
+            generation.add_done_callback(lambda _: changes and self.schedule_reindex(changes))
+            raise
+
+        self.memory.add_interaction(user_input, used_chunks, response)
+        if changes:
+            self.schedule_reindex(changes)
+        elif models and self._cacheable(response):
+            self.cache.put(cache_key(models[0]), response)
+        return TurnResult(user_input, response, used_chunks, changes)
+
+    @staticmethod
+    def _cacheable(response) -> bool:
+        """Only answers that did not request file changes are replayed."""
+        return not (extract_file_updates(response) or extract_file_edits(response))
+
+    def schedule_reindex(self, changes):
+        """Queue FileChange records for background re-indexing; must be called on `self.loop`."""
+        self._pending_paths.update(change.path for change in changes)
+        if self._reindex_task is None or self._reindex_task.done():
+            self._reindex_task = self.loop.create_task(self._reindex())
+
+    async def _reindex(self):
+        # Edits arriving while a refresh runs are batched into the next one
+        while self._pending_paths:
+            paths, self._pending_paths = sorted(self._pending_paths), set()
+            try:
+                if await self._run(self.index.refresh, paths):
+                    await self._run(self.index.save)
+            except Exception as e:
+                print(f"Background re-index failed: {e}")
+
+    async def wait_for_reindex(self):
+        while self._reindex_task is not None and not self._reindex_task.done():
+            await self._reindex_task
+
+    @property
+    def reindexing(self) -> bool:
+        return self._reindex_task is not None and not self._reindex_task.done()
+
+    def ask(self, user_input, on_token=None) -> TurnResult:
+        """
+        Blocking run_turn() for synchronous callers.
+
+        `on_token` is called on the calling thread, so it may touch UI state.
+        If the caller is interrupted (e.g. KeyboardInterrupt, or Streamlit
+        stopping the script), the turn is cancelled before re-raising.
+        Must not be called from `self.loop`.
+
+        Raises:
+            concurrent.futures.CancelledError: If cancel() stopped the turn
+            LLMError: If no model produced a response
+        """
+        tokens = queue.SimpleQueue()
+        future = asyncio.run_coroutine_threadsafe(self.run_turn(user_input, tokens.put), self.loop)
+        # Wakes the loop below as soon as the turn ends, e.g. on a cache hit
+        future.add_done_callback(lambda _: tokens.put(_TURN_DONE))
+        try:
+            while True:
+                try:
+                    token = tokens.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if token is _TURN_DONE:
+                    break
+                if on_token:
+                    on_token(token)
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def cancel(self):
+        """Cancel the turn in flight, if any. Safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self._cancel_turn)
+
+    def _cancel_turn(self):
+        if self._turn_task is not None:
+            self._turn_task.cancel()
+
+    def close(self, wait_for_reindex=True):
+        """Stop the loop and worker threads, by default after pending re-indexing finishes."""
+        # A stopping loop may still report running, and would never run the wait
+        if wait_for_reindex and self._finalizer.alive and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.wait_for_reindex(), self.loop).result()
+        self._finalizer()
+
+    def _submit(self, func, *args, **kwargs):
+        # Copy the context so telemetry spans in the worker nest under this turn
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return self.loop.run_in_executor(self._executor, call)
+
+    async def _run(self, func, *args, **kwargs):
+        return await self._submit(func, *args, **kwargs)
@@ -1,12 +1,11 @@
 import os
 import streamlit as st
 from github_fetcher import clone_repo
-from code_processor import get_code_chunks
-from embeddings import TitanEmbeddings
-from langchain.vectorstores import FAISS
-from llm_clients import ask_llm
+from index_registry import index_registry
 from memory import ConversationMemory
-from file_operations import RepoFileManager
+from file_operations import RepoFileManager, format_line_ranges
+from session_engine import SessionEngine
+from telemetry import start_metrics_server_from_env
 
 # --- Check AWS Credentials ---
 aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
@@ -21,6 +20,9 @@ if not aws_access_key_id or not aws_secret_access_key:
     """)
     st.stop()
 
+# Serves /metrics once per process when METRICS_PORT is set
+start_metrics_server_from_env()
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Zwis Coding Agent",
@@ -32,10 +34,12 @@ st.set_page_config(
 # --- Session State Initialization ---
 if 'conversation_memory' not in st.session_state:
     st.session_state.conversation_memory = ConversationMemory()
-if 'vector_store' not in st.session_state:
-    st.session_state.vector_store = None
-if 'embedding_model' not in st.session_state:
-    st.session_state.embedding_model = TitanEmbeddings()
+# Lease on the process-wide index for this repo; shared with other sessions on the same commit
+if 'index' not in st.session_state:
+    st.session_state.index = None
+# Runs this session's turns and background re-indexing
+if 'engine' not in st.session_state:
+    st.session_state.engine = None
 if 'repo_cloned' not in st.session_state:
     st.session_state.repo_cloned = False
 if 'chat_history' not in st.session_state:
@@ -52,6 +56,10 @@ def show_sidebar():
             st.caption(f"Location: {st.session_state.get('repo_path', '')}")
             
             if st.button("Clear Session 🔄"):
+                if st.session_state.get('engine'):
+                    st.session_state.engine.close()
+                if st.session_state.get('index'):
+                    st.session_state.index.release()
                 st.session_state.clear()
                 st.rerun()
         
@@ -100,24 +108,56 @@ def main():
             if repo_url and repo_name:
                 try:
                     with st.status("Cloning repository...", expanded=True) as status:
-                        st.write("🔗 Connecting to GitHub...")
-                        clone_repo(repo_url, repo_name)
-                        st.session_state.repo_path = os.path.abspath(repo_name)
+                        if st.session_state.engine:
+                            st.session_state.engine.close()
+                        if st.session_state.index:
+                            st.session_state.index.release()
+
+                        if os.getenv("INDEX_SERVICE_URL"):
+                            # The index service clones and indexes; this page only queries it
+                            from index_service import IndexServiceClient, RemoteIndex
+                            client = IndexServiceClient()
+                            st.write(f"🛰️ Indexing in the index service at {client.base_url}...")
+                            progress_bar = st.progress(0.0)
+                            info = client.add_repo(repo_name, repo_url)
+                            st.session_state.index = RemoteIndex(client, repo_name, info["path"])
+                        else:
+                            st.write("🔗 Connecting to GitHub...")
+                            update = clone_repo(repo_url, repo_name)
+                            if update.changed_paths:
+                                st.write(f"⬇️ Pulled {len(update.changed_paths)} changed file(s) from upstream")
+                            repo_path = os.path.abspath(repo_name)
+
+                            st.write("🧠 Indexing codebase...")
+                            progress_bar = st.progress(0.0)
+
+                            def show_progress(done, total):
+                                progress_bar.progress(done / total if total else 1.0, text=f"Indexed {done}/{total} files")
+
+                            # Only the first session to open this repo and commit builds the index
+                            def build_index():
+                                # langchain, FAISS and numpy load on first use so the page renders quickly
+                                from embeddings import TitanEmbeddings
+                                from index_manager import IncrementalIndexManager
+                                manager = IncrementalIndexManager(repo_path, TitanEmbeddings())
+                                manager.load_or_build(progress_callback=show_progress)
+                                if os.getenv("WATCH_REPO") == "1":
+                                    # One watcher per shared index keeps every session's retrieval current
+                                    manager.watch()
+                                return manager
+
+                            st.session_state.index = index_registry.acquire(repo_url, repo_path, build_index)
+                        progress_bar.progress(1.0, text="Index ready")
+
+                        # Work in the clone the shared index describes so edits refresh it
+                        st.session_state.repo_path = st.session_state.index.repo_path
                         st.session_state.file_manager = RepoFileManager(st.session_state.repo_path)
-                        
-                        st.write("🔍 Analyzing code structure...")
-                        chunks = get_code_chunks(repo_name)
-                        
-                        st.write("🧠 Indexing codebase...")
-                        texts = [chunk[1] for chunk in chunks]
-                        metadatas = [{"path": chunk[0]} for chunk in chunks]
-                        
-                        st.session_state.vector_store = FAISS.from_texts(
-                            texts=texts,
-                            metadatas=metadatas,
-                            embedding=st.session_state.embedding_model
+                        st.session_state.engine = SessionEngine(
+                            st.session_state.index,
+                            st.session_state.repo_path,
+                            st.session_state.conversation_memory
                         )
-                        
+
                         status.update(label="Repository ready!", state="complete")
                         st.session_state.repo_cloned = True
                         st.toast("Repository cloned successfully!", icon="🎉")
@@ -152,41 +192,31 @@ def main():
             
             with st.status("Processing...", state="running") as status:
                 try:
-                    # Context retrieval
-                    st.write("🔎 Searching code context...")
-                    query_embedding = st.session_state.embedding_model.embed_query(prompt)
-                    relevant_docs = st.session_state.vector_store.similarity_search_by_vector(
-                        query_embedding, 
-                        k=20
-                    )
-                    relevant_chunks = [(doc.metadata['path'], doc.page_content) for doc in relevant_docs]
-                    context = "\n\n".join([f"**{path}**:\n```{code}```" for path, code in relevant_chunks])
-                    
-                    # Generate response
-                    st.write("💡 Generating response...")
-                    recent_history = st.session_state.conversation_memory.get_recent_history()
-                    history_text = "\n".join(
-                        [f"User: {ih['user_input']}\nAssistant: {ih['assistant_response']}" 
-                         for ih in recent_history]
-                    )
-                    full_prompt = f"{history_text}\nUser: {prompt}\nContext:\n{context}\nAssistant:"
-                    response = ask_llm(context, full_prompt, st.session_state.repo_path)
-                    
-                    # Update conversation
-                    st.session_state.conversation_memory.add_interaction(prompt, context, response)
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
-                    
-                    # Refresh index
-                    st.write("🔄 Updating code index...")
-                    chunks = get_code_chunks(st.session_state.repo_path)
-                    texts = [chunk[1] for chunk in chunks]
-                    metadatas = [{"path": chunk[0]} for chunk in chunks]
-                    st.session_state.vector_store = FAISS.from_texts(
-                        texts=texts,
-                        metadatas=metadatas,
-                        embedding=st.session_state.embedding_model
-                    )
-                    
+                    st.write("🔎 Searching code context and generating response...")
+
+                    # Render tokens live in the chat as they stream in
+                    with chat_container:
+                        with st.chat_message("assistant", avatar="🤖"):
+                            live_response = st.empty()
+                    streamed = []
+
+                    def show_token(token):
+                        streamed.append(token)
+                        live_response.markdown("".join(streamed) + "▌")
+
+                    # Stopping the script (Stop button or a new message) cancels the turn
+                    result = st.session_state.engine.ask(prompt, on_token=show_token)
+                    live_response.markdown(result.response)
+                    st.write(f"📎 Used {len(result.used_chunks)} code snippets")
+                    st.session_state.chat_history.append({"role": "assistant", "content": result.response})
+
+                    if result.changes:
+                        for change in result.changes:
+                            relative_path = st.session_state.file_manager.get_relative_path(change.path)
+                            st.write(f"✏️ {change.action.capitalize()} `{relative_path}` "
+                                     f"({format_line_ranges(change.line_ranges)})")
+                        st.write("🔄 Updating code index in the background...")
+
                     status.update(label="Response ready!", state="complete")
                 except Exception as e:
                     st.error(f"🚨 Processing error: {str(e)}")
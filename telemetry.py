@@ -0,0 +1,228 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (100, 1_000, 4_000, 16_000, 64_000, 256_000, 1_000_000)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed pipeline stage. Attributes set during the span end up in its log record."""
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self._perf_start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Telemetry:
+    """
+    Process-wide spans, counters and histograms.
+
+    Every finished span is observed in the `stage_duration_seconds` histogram
+    labelled by stage and, when a log sink is configured, written as one JSON
+    line. Metrics are exposed in Prometheus text format by render_prometheus()
+    and serve().
+    """
+
+    def __init__(self, log_sink=None):
+        """
+        Args:
+            log_sink: "stdout", "stderr", a file path for JSON span logs, or
+                None to keep metrics without logging
+        """
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._buckets = {}  # name -> bucket bounds
+        self._help = {}
+        self._log_file = None
+        if log_sink in ("stdout", "stderr"):
+            self._log_file = getattr(sys, log_sink)
+        elif log_sink:
+            self._log_file = open(log_sink, "a", encoding="utf-8", buffering=1)
+
+    @classmethod
+    def from_env(cls):
+        """Log spans to TELEMETRY_LOG ("stdout", "stderr" or a path) if it is set."""
+        return cls(os.getenv("TELEMETRY_LOG") or None)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a stage. Spans opened inside another span in the same thread or
+        task share its trace id, so one turn's stages can be correlated.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else uuid.uuid4().hex,
+            parent.span_id if parent else None,
+            attributes
+        )
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A generator span finalized from another context
+                pass
+            span.duration = time.perf_counter() - span._perf_start
+            self.observe("stage_duration_seconds", span.duration, stage=name)
+            if error is not None:
+                self.incr("stage_errors_total", stage=name)
+            self._log_span(span, error)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Record a value in a histogram; the first observation of `name` fixes its buckets."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            bounds = self._buckets.setdefault(name, tuple(buckets))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(bounds) + [0.0, 0]
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def counter(self, name, **labels):
+        """Current value of a counter, 0 if never incremented."""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render_prometheus(self) -> str:
+        """All counters and histograms in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(values)) for key, values in histograms]
+
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), values in histograms:
+            header(name, "histogram")
+            for bound, count in zip(self._buckets[name], values):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{name}_sum{_labels(labels)} {values[-2]}")
+            lines.append(f"{name}_count{_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve render_prometheus() at http://host:port/metrics from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def _log_span(self, span, error):
+        if self._log_file is None:
+            return
+        record = {
+            "ts": round(span.start, 6),
+            "event": "span",
+            "name": span.name,
+            "duration_ms": round(span.duration * 1000, 3),
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            **span.attributes
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._log_file.write(line + "\n")
+            self._log_file.flush()
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels) + "}"
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server_from_env():
+    """Start the /metrics endpoint once per process when METRICS_PORT is set."""
+    global _metrics_server
+    port = os.getenv("METRICS_PORT")
+    with _metrics_server_lock:
+        if port and _metrics_server is None:
+            _metrics_server = telemetry.serve(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+    return _metrics_server
+
+
+telemetry = Telemetry.from_env()
+telemetry.describe("stage_duration_seconds", "Wall time per pipeline stage")
+telemetry.describe("bedrock_calls_total", "Bedrock calls by purpose, model and outcome")
+telemetry.describe("bedrock_tokens_total", "Bedrock tokens by model and direction")
+telemetry.describe("bedrock_request_bytes", "Bedrock request payload size")
+telemetry.describe("cache_requests_total", "Cache lookups by cache and result")
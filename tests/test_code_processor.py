@@ -0,0 +1,76 @@
+from code_processor import split_text
+
+PYTHON_SOURCE = '''import os
+
+
+# Reads the settings file
+@cached
+def load_settings(path):
+    with open(path) as f:
+        return f.read()
+
+
+class Store:
+    def get(self, key):
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+'''
+
+
+def assert_ranges_match_text(text, chunks):
+    lines = text.splitlines(keepends=True)
+    for chunk in chunks:
+        assert chunk.text == "".join(lines[chunk.start_line - 1:chunk.end_line])
+
+
+def test_python_chunks_follow_definitions_and_keep_leading_comments():
+    chunks = split_text("settings.py", PYTHON_SOURCE, chunk_size=80)
+
+    assert_ranges_match_text(PYTHON_SOURCE, chunks)
+    starts = [chunk.text.splitlines()[0] for chunk in chunks]
+    assert "# Reads the settings file" in starts
+    assert "class Store:" in starts
+    assert "    def put(self, key, value):" in starts
+    assert all(len(chunk.text) <= 80 for chunk in chunks)
+
+
+def test_small_definitions_are_packed_together():
+    chunks = split_text("settings.py", PYTHON_SOURCE, chunk_size=1500)
+    assert [(chunk.start_line, chunk.end_line) for chunk in chunks] == [(1, 16)]
+
+
+def test_oversized_definition_falls_back_to_line_windows():
+    body = "def big():\n" + "".join(f"    value_{n} = {n}\n" for n in range(40))
+    chunks = split_text("big.py", body, chunk_size=120)
+
+    assert_ranges_match_text(body, chunks)
+    assert all(len(chunk.text) <= 120 for chunk in chunks)
+    assert chunks[0].start_line == 1 and chunks[-1].end_line == 41
+    # Windows tile the definition without gaps
+    assert all(b.start_line == a.end_line + 1 for a, b in zip(chunks, chunks[1:]))
+
+
+def test_overlap_repeats_preceding_lines_within_the_size_limit():
+    body = "".join(f"line_{n:02d} = {n}\n" for n in range(30))
+    plain = split_text("data.py", body, chunk_size=100)
+    overlapped = split_text("data.py", body, chunk_size=100, overlap=2)
+
+    assert_ranges_match_text(body, overlapped)
+    assert overlapped[0] == plain[0]
+    for before, after in zip(plain[1:], overlapped[1:]):
+        assert after.end_line == before.end_line
+        assert before.start_line - 2 <= after.start_line <= before.start_line
+        assert len(after.text) <= 100
+    assert any(after.start_line < before.start_line for before, after in zip(plain[1:], overlapped[1:]))
+
+
+def test_markdown_splits_at_headings_and_bad_python_still_chunks():
+    doc = "# Title\nintro\n\n## Install\n" + "step\n" * 20 + "## Usage\nrun it\n"
+    chunks = split_text("README.md", doc, chunk_size=60)
+    assert_ranges_match_text(doc, chunks)
+    assert {"## Install\n", "## Usage\n"} <= {chunk.text.splitlines(keepends=True)[0] for chunk in chunks}
+
+    broken = "def f(:\n    pass\n"
+    assert [(c.start_line, c.end_line) for c in split_text("broken.py", broken)] == [(1, 2)]
@@ -0,0 +1,74 @@
+import pytest
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_round_trips_vectors_and_counts_hits_and_misses():
+    cache = EmbeddingCache(":memory:")
+    key = EmbeddingCache.make_key("titan", 256, "def f(): pass")
+    cache.put(key, [0.5, -0.25, 1.0])
+
+    assert cache.get_many([key, key, "missing"]) == {key: [0.5, -0.25, 1.0]}
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_keys_depend_on_model_dimensions_and_text():
+    keys = {
+        EmbeddingCache.make_key("titan", 1024, "text"),
+        EmbeddingCache.make_key("titan", 256, "text"),
+        EmbeddingCache.make_key("other", 1024, "text"),
+        EmbeddingCache.make_key("titan", 1024, "text "),
+    }
+    assert len(keys) == 4
+
+
+def test_evicts_least_recently_used_entries(clock):
+    cache = EmbeddingCache(":memory:", max_entries=3)
+    for n, key in enumerate("abc"):
+        clock[0] += 1
+        cache.put(key, [float(n)])
+    clock[0] += 1
+    cache.get("a")  # "b" is now the least recently used
+
+    clock[0] += 1
+    cache.put("d", [3.0])
+
+    assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.stats()["entries"] == 3
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "nested" / "embeddings.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put("k", [1.0, 2.0])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    assert reopened.get("k") == [1.0, 2.0]
+    reopened.close()
+
+
+def test_titan_embeddings_only_embeds_uncached_texts(monkeypatch):
+    pytest.importorskip("langchain")
+    from embeddings import TitanEmbeddings
+
+    embedded = []
+
+    def fake_embedding(text):
+        embedded.append(text)
+        return [float(len(text))]
+
+    model = TitanEmbeddings(dimensions=256, cache=EmbeddingCache(":memory:"), max_workers=2)
+    monkeypatch.setattr(model, "_get_titan_embedding", fake_embedding)
+
+    assert model.embed_documents(["aa", "b", "aa"]) == [[2.0], [1.0], [2.0]]
+    assert sorted(embedded) == ["aa", "b"]
+    assert model.embed_documents(["b", "ccc", "aa"]) == [[1.0], [3.0], [2.0]]
+    assert sorted(embedded) == ["aa", "b", "ccc"]
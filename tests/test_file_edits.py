@@ -0,0 +1,108 @@
+import file_operations
+from file_operations import EditHunk, _fuzzy_find_block, apply_hunk
+from llm_clients import extract_file_edits, parse_search_replace, parse_unified_diff
+
+
+def test_parse_search_replace_blocks_in_order():
+    body = (
+        "<<<<<<< SEARCH\n"
+        "a = 1\n"
+        "=======\n"
+        "a = 2\n"
+        ">>>>>>> REPLACE\n"
+        "<<<<<<< SEARCH\n"
+        "b = 1\n"
+        "=======\n"
+        ">>>>>>> REPLACE\n"
+    )
+    assert parse_search_replace(body) == [EditHunk("a = 1\n", "a = 2\n"), EditHunk("b = 1\n", "")]
+
+
+def test_parse_unified_diff_keeps_context_and_line_hint():
+    body = (
+        "--- a/app.py\n"
+        "+++ b/app.py\n"
+        "@@ -10,3 +10,3 @@\n"
+        " def f():\n"
+        "-    return 1\n"
+        "+    return 2\n"
+        "\n"
+        "@@ -40 +40,2 @@ class A:\n"
+        " x = 1\n"
+        "+y = 2\n"
+    )
+    assert parse_unified_diff(body) == [
+        EditHunk("def f():\n    return 1\n\n", "def f():\n    return 2\n\n", 10),
+        EditHunk("x = 1\n", "x = 1\ny = 2\n", 40),
+    ]
+
+
+def test_extract_file_edits_picks_format_per_block():
+    response = (
+        'Here you go.\n'
+        '<file_edit path="src/a.py">\n'
+        "<<<<<<< SEARCH\nold\n=======\nnew\n>>>>>>> REPLACE\n"
+        "</file_edit>\n"
+        '<file_edit path="src/b.py">\n'
+        "@@ -1 +1 @@\n-old\n+new\n"
+        "</file_edit>\n"
+    )
+    assert extract_file_edits(response) == [
+        ("src/a.py", [EditHunk("old\n", "new\n")]),
+        ("src/b.py", [EditHunk("old\n", "new\n", 1)]),
+    ]
+
+
+def test_apply_hunk_exact_and_whitespace_tolerant():
+    content = "def f():\n    x = 1   \n    return x\n"
+    assert apply_hunk(content, EditHunk("    return x\n", "    return x + 1\n")) == \
+        "def f():\n    x = 1   \n    return x + 1\n"
+    # Trailing whitespace in the file does not prevent a match
+    assert apply_hunk(content, EditHunk("    x = 1\n", "    x = 2\n")) == \
+        "def f():\n    x = 2\n    return x\n"
+
+
+def test_apply_hunk_reindents_replacement():
+    content = "class A:\n    def f(self):\n        return 1\n"
+    hunk = EditHunk("def f(self):\n    return 1\n", "def f(self):\n    return 2\n")
+    assert apply_hunk(content, hunk) == "class A:\n    def f(self):\n        return 2\n"
+
+
+def test_apply_hunk_prefers_match_nearest_line_hint():
+    content = "x = 1\ny = 0\nx = 1\n"
+    assert apply_hunk(content, EditHunk("x = 1\n", "x = 2\n", line_hint=3)) == "x = 1\ny = 0\nx = 2\n"
+
+
+def test_apply_hunk_empty_search_appends_and_missing_search_fails():
+    assert apply_hunk("a\n", EditHunk("", "b\n")) == "a\nb\n"
+    assert apply_hunk("a", EditHunk("", "b\n")) == "a\nb\n"
+    assert apply_hunk("a\n", EditHunk("nothing like it\n", "b\n")) is None
+
+
+def test_fuzzy_find_block_tolerates_small_differences():
+    file_lines = [
+        "def total(items):\n",
+        "    result = 0\n",
+        "    for item in items:\n",
+        "        result += item.price\n",
+        "    return result\n",
+    ]
+    search = ["    for item in items:\n", "        result += item.prices\n", "    return result\n"]
+    start, size, ratio = _fuzzy_find_block(file_lines, search)
+    assert (start, size) == (2, 3)
+    assert file_operations.FUZZY_MATCH_THRESHOLD <= ratio < 1.0
+
+    assert _fuzzy_find_block(file_lines, ["something else entirely\n"]) == (None, 0, 0.0)
+
+
+def test_apply_hunk_only_matches_whole_lines():
+    # "count = 0" also occurs at the end of "total_count = 0"
+    assert apply_hunk("total_count = 0\ncount = 0\n", EditHunk("count = 0\n", "count = 1\n")) == \
+        "total_count = 0\ncount = 1\n"
+    assert apply_hunk("def f():\n    return xs\n    return x\n", EditHunk("    return x", "    return y")) == \
+        "def f():\n    return xs\n    return y\n"
+
+
+def test_apply_hunk_does_not_fuzzy_match_a_single_line():
+    assert apply_hunk("def f():\n    return xs\n", EditHunk("    return x\n", "    return y\n")) is None
+    assert apply_hunk("total_count = 0\n", EditHunk("count = 0\n", "count = 1\n")) is None
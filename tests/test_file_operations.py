@@ -0,0 +1,87 @@
+import os
+import pytest
+import file_operations
+from file_operations import EditHunk, FileOperationError, RepoFileManager, changed_line_ranges, format_line_ranges
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "a.py").write_text("def a():\n    return 1\n")
+    (tmp_path / "b.py").write_text("def b():\n    return 2\n")
+    return tmp_path
+
+
+def test_commit_changes_reports_change_set(repo):
+    manager = RepoFileManager(str(repo))
+    changes = manager.commit_changes(
+        updates=[("new/pkg/c.py", "c = 3\n")],
+        edits=[("a.py", [EditHunk("    return 1\n", "    return 10\n")])]
+    )
+
+    assert [(os.path.relpath(c.path, repo), c.action) for c in changes] == [
+        ("new/pkg/c.py", "created"), ("a.py", "updated")
+    ]
+    assert changes[1].line_ranges == [(2, 2)]
+    assert changes[0].old_hash is None
+    assert (repo / "a.py").read_text() == "def a():\n    return 10\n"
+    assert oct(os.stat(repo / "new/pkg/c.py").st_mode & 0o777) == oct(file_operations.NEW_FILE_MODE)
+
+
+def test_failing_edit_leaves_every_file_unchanged(repo):
+    manager = RepoFileManager(str(repo))
+    with pytest.raises(FileOperationError, match="Edit 1 of 1 does not match"):
+        manager.commit_changes(
+            updates=[("a.py", "rewritten\n"), ("new/c.py", "c = 3\n")],
+            edits=[("b.py", [EditHunk("def missing():\n    pass\n", "x\n")])]
+        )
+
+    assert (repo / "a.py").read_text() == "def a():\n    return 1\n"
+    assert (repo / "b.py").read_text() == "def b():\n    return 2\n"
+    assert not (repo / "new").exists()
+
+
+def test_failed_write_rolls_back_replaced_files_and_created_directories(repo, monkeypatch):
+    real_replace = os.replace
+    target = str(repo / "b.py")
+
+    def failing_replace(src, dst):
+        if dst == target:
+            raise OSError("disk full")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(file_operations.os, "replace", failing_replace)
+    manager = RepoFileManager(str(repo))
+    with pytest.raises(FileOperationError, match="no changes were kept"):
+        manager.commit_changes(updates=[
+            ("a.py", "rewritten a\n"),
+            ("new/deep/c.py", "c = 3\n"),
+            ("b.py", "rewritten b\n"),
+        ])
+
+    assert (repo / "a.py").read_text() == "def a():\n    return 1\n"
+    assert (repo / "b.py").read_text() == "def b():\n    return 2\n"
+    assert not (repo / "new").exists()
+    # No temp files or backups are left beside the targets
+    assert sorted(os.listdir(repo)) == ["a.py", "b.py"]
+
+
+def test_rejects_paths_outside_repo_and_sensitive_files(repo):
+    manager = RepoFileManager(str(repo))
+    with pytest.raises(FileOperationError):
+        manager.commit_changes(updates=[("../escape.py", "x")])
+    with pytest.raises(FileOperationError):
+        manager.commit_changes(updates=[(".env", "SECRET=1")])
+
+
+def test_changed_line_ranges_marks_insertions_and_deletions():
+    old = "one\ntwo\nthree\nfour\n"
+    assert changed_line_ranges(old, "one\nTWO\nthree\nfour\n") == [(2, 2)]
+    assert changed_line_ranges(old, "one\ntwo\nnew\nnewer\nthree\nfour\n") == [(3, 4)]
+    # Deleting "three" leaves nothing in the new file: end < start just before line 3
+    assert changed_line_ranges(old, "one\ntwo\nfour\n") == [(3, 2)]
+    assert changed_line_ranges(old, old) == []
+
+
+def test_format_line_ranges():
+    assert format_line_ranges([(2, 4), (7, 7), (9, 8)]) == "lines 2-4, 7, 9 (deleted)"
+    assert format_line_ranges([]) == "no line changes"
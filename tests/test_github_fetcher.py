@@ -0,0 +1,103 @@
+import os
+import subprocess
+import pytest
+
+pytest.importorskip("git")
+
+from github_fetcher import RepoUpdate, clone_repo, get_changed_files, update_repo  # noqa: E402
+
+
+def git(cwd, *args):
+    result = subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, check=True, capture_output=True, text=True
+    )
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """A bare repository plus a working copy used to push new commits to it."""
+    for name in ("CLONE_DEPTH", "CLONE_BLOBLESS", "CLONE_SPARSE"):
+        monkeypatch.delenv(name, raising=False)
+    bare = tmp_path / "upstream.git"
+    git(tmp_path, "init", "-q", "--bare", "-b", "main", str(bare))
+    work = tmp_path / "work"
+    git(tmp_path, "clone", "-q", str(bare), str(work))
+    git(work, "checkout", "-q", "-b", "main")
+    (work / "app.py").write_text("x = 1\n")
+    (work / "README.md").write_text("# App\n")
+    git(work, "add", "-A")
+    git(work, "commit", "-q", "-m", "initial")
+    git(work, "push", "-q", "origin", "main")
+    return bare, work
+
+
+def push_change(work, name, text):
+    (work / name).write_text(text)
+    git(work, "add", "-A")
+    git(work, "commit", "-q", "-m", f"change {name}")
+    git(work, "push", "-q", "origin", "main")
+    return git(work, "rev-parse", "HEAD")
+
+
+def test_update_fast_forwards_and_lists_changed_files(upstream, tmp_path):
+    bare, work = upstream
+    target = tmp_path / "clone"
+    fresh = clone_repo(str(bare), str(target))
+    assert fresh.old_commit is None and fresh.changed_paths is None
+
+    new_commit = push_change(work, "app.py", "x = 2\n")
+    update = clone_repo(str(bare), str(target))
+
+    assert update == RepoUpdate(fresh.new_commit, new_commit, [os.path.abspath(target / "app.py")])
+    assert (target / "app.py").read_text() == "x = 2\n"
+    assert update_repo(str(target)) == RepoUpdate(new_commit, new_commit, [])
+
+
+def test_update_keeps_a_conflicting_local_edit(upstream, tmp_path):
+    bare, work = upstream
+    target = tmp_path / "clone"
+    head = clone_repo(str(bare), str(target)).new_commit
+    (target / "app.py").write_text("x = 'local'\n")
+
+    push_change(work, "app.py", "x = 2\n")
+    assert update_repo(str(target)) == RepoUpdate(head, head, [])
+    assert (target / "app.py").read_text() == "x = 'local'\n"
+    assert get_changed_files(str(target), head) == [os.path.abspath(target / "app.py")]
+
+
+def test_shallow_clone_moves_to_the_new_tip(upstream, tmp_path):
+    bare, work = upstream
+    push_change(work, "README.md", "# App v2\n")
+    target = tmp_path / "clone"
+    head = clone_repo(f"file://{bare}", str(target), depth=1).new_commit
+    assert git(target, "rev-parse", "--is-shallow-repository") == "true"
+
+    new_commit = push_change(work, "app.py", "x = 3\n")
+    update = update_repo(str(target))
+
+    assert update == RepoUpdate(head, new_commit, [os.path.abspath(target / "app.py")])
+    assert git(target, "rev-parse", "--is-shallow-repository") == "true"
+
+
+def test_shallow_clone_with_local_commits_is_left_alone(upstream, tmp_path):
+    bare, work = upstream
+    target = tmp_path / "clone"
+    clone_repo(f"file://{bare}", str(target), depth=1)
+    (target / "local.py").write_text("mine = True\n")
+    git(target, "add", "-A")
+    git(target, "commit", "-q", "-m", "local work")
+    local_commit = git(target, "rev-parse", "HEAD")
+
+    push_change(work, "app.py", "x = 4\n")
+    assert update_repo(str(target)) == RepoUpdate(local_commit, local_commit, [])
+    assert (target / "local.py").exists()
+
+
+def test_non_git_directory_is_used_as_is(tmp_path):
+    target = tmp_path / "plain"
+    target.mkdir()
+    (target / "app.py").write_text("x = 1\n")
+
+    assert clone_repo("https://example.invalid/repo.git", str(target)) == RepoUpdate(None, None, [])
@@ -0,0 +1,209 @@
+import os
+import subprocess
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain")
+
+from fake_bedrock import fake_embedding  # noqa: E402
+from index_manager import IncrementalIndexManager, file_hash  # noqa: E402
+from reranker import Reranker  # noqa: E402
+
+
+class FakeEmbeddings:
+    """Deterministic embedding model; `on_embed` runs inside embed_documents."""
+
+    model_id = "fake"
+    dimensions = 64
+
+    def __init__(self):
+        self.embedded = []
+        self.on_embed = None
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        if self.on_embed is not None:
+            self.on_embed()
+        return [fake_embedding(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text):
+        return fake_embedding(text, self.dimensions)
+
+    def __call__(self, text):
+        return self.embed_query(text)
+
+
+def make_manager(repo, embeddings):
+    return IncrementalIndexManager(
+        str(repo), embeddings, index_dir=str(repo) + ".index", index_type="flat", reranker=Reranker(enabled=False)
+    )
+
+
+def test_manifest_records_the_bytes_that_were_chunked(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    source = repo / "app.py"
+    source.write_text("def first_version():\n    return 1\n")
+    embeddings = FakeEmbeddings()
+    manager = make_manager(repo, embeddings)
+    manager.build()
+
+    # The file is saved again while its previous contents are being embedded
+    embeddings.on_embed = lambda: source.write_text("def second_version():\n    return 2\n")
+    source.write_text("def middle_version():\n    return 3\n")
+    manager.refresh([str(source)])
+    embeddings.on_embed = None
+
+    state = manager.file_states[str(source)]
+    assert state["hash"] != file_hash(str(source))
+    # So the watcher's event for the second save is not skipped as already indexed
+    assert manager.refresh([str(source)]) == [str(source)]
+    assert "second_version" in manager.search("second_version", k=1)[0].text
+
+
+def write_repo(repo, files):
+    for name, text in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    write_repo(repo, {
+        "billing.py": "def charge_card(amount):\n    return amount * 100\n",
+        "users.py": "def create_user(name):\n    return {'name': name}\n",
+        "docs/guide.md": "# Guide\n\nHow to charge a card.\n",
+        "ignored.log": "not indexed\n",
+    })
+    return repo
+
+
+def indexed_paths(manager):
+    return sorted(os.path.relpath(path, manager.repo_path) for path in manager.file_states)
+
+
+def test_refresh_only_re_embeds_changed_files(repo):
+    embeddings = FakeEmbeddings()
+    manager = make_manager(repo, embeddings)
+    manager.build()
+    assert indexed_paths(manager) == ["billing.py", "docs/guide.md", "users.py"]
+
+    embeddings.embedded.clear()
+    (repo / "billing.py").write_text("def charge_card(amount, currency):\n    return amount * 100\n")
+    (repo / "users.py").unlink()
+    (repo / "orders.py").write_text("def place_order(items):\n    return len(items)\n")
+    # Touched but identical: detected by mtime, skipped by hash
+    os.utime(repo / "docs" / "guide.md", (1, 1))
+
+    changed = manager.refresh()
+
+    assert sorted(os.path.relpath(path, repo) for path in changed) == ["billing.py", "orders.py", "users.py"]
+    assert len(embeddings.embedded) == 2
+    assert indexed_paths(manager) == ["billing.py", "docs/guide.md", "orders.py"]
+    assert manager.refresh() == []
+    assert all(chunk.path != str(repo / "users.py") for chunk in manager.search("create_user name", k=8))
+    assert manager.search("place_order", k=1)[0].path == str(repo / "orders.py")
+
+
+def test_refresh_skips_reported_paths_that_match_the_index(repo):
+    embeddings = FakeEmbeddings()
+    manager = make_manager(repo, embeddings)
+    manager.build()
+    embeddings.embedded.clear()
+
+    # The same edit reported twice, e.g. by a chat turn and by the watcher
+    (repo / "users.py").write_text("def create_admin(name):\n    return {'name': name}\n")
+    assert manager.refresh([str(repo / "users.py")]) == [str(repo / "users.py")]
+    assert manager.refresh([str(repo / "users.py"), str(repo / "billing.py")]) == []
+    assert len(embeddings.embedded) == 1
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo, check=True, capture_output=True
+    )
+
+
+def test_saved_index_loads_without_re_embedding(repo):
+    manager = make_manager(repo, FakeEmbeddings())
+    manager.build()
+    manager.save()
+    expected = manager.search("charge card", k=2)
+
+    embeddings = FakeEmbeddings()
+    reopened = make_manager(repo, embeddings)
+    reopened.load_or_build()
+
+    assert embeddings.embedded == []
+    assert indexed_paths(reopened) == indexed_paths(manager)
+    assert [chunk.chunk_id for chunk in reopened.search("charge card", k=2)] == [c.chunk_id for c in expected]
+
+
+def test_reopening_re_embeds_only_files_changed_since_the_saved_commit(repo):
+    git(repo, "init", "-q")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "initial")
+    manager = make_manager(repo, FakeEmbeddings())
+    manager.load_or_build()
+
+    (repo / "users.py").write_text("def create_admin(name):\n    return {'name': name}\n")
+    git(repo, "commit", "-q", "-am", "admins")
+    (repo / "notes.md").write_text("# Notes\n")  # untracked
+
+    embeddings = FakeEmbeddings()
+    reopened = make_manager(repo, embeddings)
+    reopened.load_or_build()
+
+    assert sorted(embeddings.embedded) == ["# Notes\n", "def create_admin(name):\n    return {'name': name}\n"]
+    assert "notes.md" in indexed_paths(reopened)
+
+
+def test_changed_chunking_parameters_rebuild_the_saved_index(repo):
+    manager = make_manager(repo, FakeEmbeddings())
+    manager.build()
+    manager.save()
+
+    embeddings = FakeEmbeddings()
+    reopened = IncrementalIndexManager(
+        str(repo), embeddings, chunk_size=500, index_dir=str(repo) + ".index", index_type="flat",
+        reranker=Reranker(enabled=False)
+    )
+    reopened.load_or_build()
+    assert len(embeddings.embedded) == 3
+
+
+def test_quantized_index_supports_incremental_updates_and_reload(repo):
+    import faiss
+
+    manager = IncrementalIndexManager(
+        str(repo), FakeEmbeddings(), index_dir=str(repo) + ".index", index_type="int8",
+        reranker=Reranker(enabled=False)
+    )
+    manager.build()
+    assert isinstance(faiss.downcast_index(manager.vectorstore.index.index), faiss.IndexScalarQuantizer)
+
+    (repo / "users.py").write_text("def create_admin(name):\n    return {'name': name}\n")
+    manager.refresh()
+    ids = [chunk_id for state in manager.file_states.values() for chunk_id in state["ids"]]
+    assert manager.vectorstore.index.ntotal == len(ids) == len(manager._labels)
+    manager.save()
+
+    reopened = IncrementalIndexManager(
+        str(repo), FakeEmbeddings(), index_dir=str(repo) + ".index", index_type="int8",
+        reranker=Reranker(enabled=False)
+    )
+    reopened.load_or_build()
+    assert reopened.search("create_admin", k=1)[0].path == str(repo / "users.py")
+
+
+def test_untrainable_index_types_fall_back_to_flat():
+    import numpy as np
+    from vector_index import create_faiss_index
+
+    vectors = np.random.default_rng(0).random((10, 32), dtype="float32")
+    for index_type in ("pq", "ivf", "ivf_pq"):
+        assert create_faiss_index(index_type, 32, vectors)[1] == "flat"
+    assert create_faiss_index("int8", 32, vectors)[1] == "int8"
@@ -0,0 +1,160 @@
+import http.client
+import json
+import subprocess
+import threading
+import pytest
+import bedrock_client
+import index_service
+from index_service import IndexService, IndexServiceClient, IndexServiceError
+
+
+class RecordingClient:
+    """Stands in for IndexServiceClient and records what the CLI asked of it."""
+
+    instances = []
+
+    def __init__(self, base_url=None, timeout=60, token=None):
+        self.base_url = base_url
+        self.calls = []
+        RecordingClient.instances.append(self)
+
+    def add_repo(self, name, url):
+        self.calls.append(("add_repo", name, url))
+        return {"name": name}
+
+    def update_repo(self, name):
+        self.calls.append(("update_repo", name))
+        return {"name": name}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    RecordingClient.instances = []
+    monkeypatch.setattr(index_service, "IndexServiceClient", RecordingClient)
+    return RecordingClient.instances
+
+
+def test_cli_add_sends_repo_url_to_the_service_not_to_the_repo(client, capsys):
+    index_service.main(["add", "payments", "https://github.com/acme/payments.git"])
+
+    assert client[0].base_url is None  # INDEX_SERVICE_URL or the default
+    assert client[0].calls == [("add_repo", "payments", "https://github.com/acme/payments.git")]
+
+
+def test_cli_url_option_selects_the_service(client, capsys):
+    index_service.main(["--url", "http://127.0.0.1:9000", "add", "payments", "/src/payments"])
+    index_service.main(["--url", "http://127.0.0.1:9000", "update", "payments"])
+
+    assert [c.base_url for c in client] == ["http://127.0.0.1:9000"] * 2
+    assert client[0].calls == [("add_repo", "payments", "/src/payments")]
+    assert client[1].calls == [("update_repo", "payments")]
+
+
+@pytest.fixture
+def service(tmp_path):
+    """An IndexService listening on a free local port, with no repositories yet."""
+    service = IndexService(str(tmp_path / "root"), watch=False)
+    server = service.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield service, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def raw_request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_health_needs_no_token(service):
+    _, port = service
+    assert raw_request(port, "GET", "/health") == (200, {"status": "ok", "repos": 0})
+
+
+def test_requests_without_the_token_are_refused(service):
+    service, port = service
+    status, payload = raw_request(port, "GET", "/repos")
+    assert status == 401
+
+    with pytest.raises(IndexServiceError) as error:
+        IndexServiceClient(f"http://127.0.0.1:{port}", timeout=5, token="wrong").repos()
+    assert error.value.status == 401
+
+    client = IndexServiceClient(f"http://127.0.0.1:{port}", timeout=5, token=service.ensure_token())
+    assert client.repos() == []
+
+
+def test_requests_for_other_hosts_are_refused(service):
+    service, port = service
+    headers = {"Host": "attacker.example", "Authorization": f"Bearer {service.ensure_token()}"}
+    assert raw_request(port, "GET", "/repos", headers=headers)[0] == 403
+
+
+def test_posts_must_be_json(service):
+    service, port = service
+    headers = {"Content-Type": "application/x-www-form-urlencoded",
+               "Authorization": f"Bearer {service.ensure_token()}"}
+    assert raw_request(port, "POST", "/search", body="query=auth", headers=headers)[0] == 415
+
+
+def test_rejected_requests_report_their_status(service):
+    service, port = service
+    client = IndexServiceClient(f"http://127.0.0.1:{port}", timeout=5, token=service.ensure_token())
+
+    for call, status in [
+        (lambda: client.repo("missing"), 404),
+        (lambda: client.add_repo("../escape", "/src/app", wait=False), 400),
+        (lambda: client.search("auth", repos=["missing"]), 404),
+        (lambda: client._request("POST", "/search", {}), 400),
+    ]:
+        with pytest.raises(IndexServiceError) as error:
+            call()
+        assert error.value.status == status
+
+
+def test_added_repositories_are_indexed_searched_and_updated(service, tmp_path, monkeypatch):
+    for module in ("faiss", "langchain", "git"):
+        pytest.importorskip(module)
+    monkeypatch.setenv("BEDROCK_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_BEDROCK_LATENCY_MS", "0")
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.setenv("VECTOR_INDEX_TYPE", "flat")
+    monkeypatch.setattr(bedrock_client, "_clients", {})
+
+    def git(*args):
+        subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                       cwd=source, check=True, capture_output=True)
+
+    source = tmp_path / "payments"
+    source.mkdir()
+    (source / "billing.py").write_text("def charge_card(amount):\n    return amount\n")
+    git("init", "-q", "-b", "main")
+    git("add", "-A")
+    git("commit", "-q", "-m", "initial")
+
+    service, port = service
+    client = IndexServiceClient(f"http://127.0.0.1:{port}", timeout=30, token=service.ensure_token())
+    info = client.add_repo("payments", str(source), poll_interval=0.1)
+    assert info["status"] == "ready", info
+
+    results = client.search("charge_card", k=4)
+    assert results and results[0][0] == "payments"
+    assert results[0][1].path.endswith("billing.py")
+    with pytest.raises(IndexServiceError) as error:
+        client.add_repo("payments", "/elsewhere", wait=False)
+    assert error.value.status == 409
+
+    (source / "refunds.py").write_text("def refund_card(amount):\n    return -amount\n")
+    git("add", "-A")
+    git("commit", "-q", "-m", "add refunds")
+    assert client.update_repo("payments")["changed"] == 1
+    assert any(chunk.path.endswith("refunds.py") for _, chunk in client.search("refund_card", k=4))
+
+    client.remove_repo("payments")
+    assert client.repos() == []
+    assert json.loads((tmp_path / "root" / "repos.json").read_text()) == {}
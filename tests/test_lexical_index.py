@@ -0,0 +1,63 @@
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, split_identifier, tokenize
+
+
+def test_tokenize_splits_identifiers():
+    assert split_identifier("getHTTPResponse") == ["get", "http", "response"]
+    assert tokenize("validate_path(x)") == ["validate_path", "validate", "path", "x"]
+
+
+def test_bm25_ranks_matching_documents_and_forgets_removed_ones():
+    index = LexicalIndex()
+    index.add("a", "def validate_path(path): check the path is inside the repo")
+    index.add("b", "def write_file(content): write bytes")
+    index.add("c", "unrelated prose about cooking")
+
+    ranked = index.search("validate path")
+    assert [doc_id for doc_id, _ in ranked] == ["a"]
+
+    index.remove("a")
+    assert index.search("validate path") == []
+    assert len(index) == 2
+    assert "validate_path" not in index.symbols
+
+
+def test_re_adding_a_document_replaces_it():
+    index = LexicalIndex()
+    index.add("a", "alpha")
+    index.add("a", "beta")
+    assert index.search("alpha") == []
+    assert [doc_id for doc_id, _ in index.search("beta")] == ["a"]
+    assert index._total_length == 1
+
+
+def test_symbol_search_puts_definitions_first():
+    texts = {
+        "use": "result = load_config(path)\nload_config(other)\nload_config(third)",
+        "define": "def load_config(path):\n    return {}",
+    }
+    index = LexicalIndex()
+    for doc_id, text in texts.items():
+        index.add(doc_id, text)
+
+    symbols = index.find_symbols("where is load_config defined? and config")
+    assert symbols == ["load_config"]
+    ranked = index.symbol_search("where is load_config defined", symbols, texts.get)
+    assert [doc_id for doc_id, _ in ranked] == ["define", "use"]
+    assert ranked[0][1] >= 100.0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"], ["b"]])
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == 1 / 62 + 1 / 61 + 1 / 61
+
+
+def test_file_names_and_abbreviations_are_not_symbols():
+    index = LexicalIndex()
+    index.add("a", "import py\ne = 1\ng = 2\ndef validate_path(path):\n    return os.path.join(path)")
+
+    assert index.find_symbols("explain what cli_main.py does") == []
+    assert index.find_symbols("what is in `config.json`") == []
+    assert index.find_symbols("where are errors logged, i.e. printed, e.g. to stderr") == []
+    assert index.find_symbols("how is os.path.join used") == ["join"]
+    assert index.find_symbols("what does RepoFileManager.validate_path do") == ["validate_path"]
@@ -0,0 +1,170 @@
+import threading
+import time
+import pytest
+from llm_router import LLMError, LLMRouter
+
+
+class FakeResponse:
+    """Stands in for a Bedrock EventStream: close() unblocks whoever is reading it."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def fake_stream(behaviours, responses=None):
+    """
+    stream callable whose per-model behaviour is a list of tokens, an
+    exception to raise before the first token, or "hang" to produce nothing
+    until the response is closed.
+    """
+    def stream(model, system_prompt, on_response=None):
+        response = FakeResponse()
+        if responses is not None:
+            responses[model] = response
+        if on_response is not None:
+            on_response(response)
+        behaviour = behaviours[model]
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        if behaviour == "hang":
+            response.closed.wait(5)
+            raise ConnectionError("stream closed")
+        for token in behaviour:
+            if isinstance(token, Exception):
+                raise token
+            if isinstance(token, float):
+                time.sleep(token)
+                continue
+            yield token
+    return stream
+
+
+def fake_invoke(behaviours):
+    def invoke(model, system_prompt):
+        behaviour = behaviours[model]
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        if isinstance(behaviour, float):
+            time.sleep(behaviour)
+            return f"late answer from {model}"
+        return behaviour
+    return invoke
+
+
+def unused(*args, **kwargs):
+    raise AssertionError("not expected to be called")
+
+
+def test_invoke_fails_over_to_next_model():
+    router = LLMRouter(unused, fake_invoke({"llama": RuntimeError("throttled"), "claude": "hi"}), ["llama", "claude"])
+    assert router.generate("prompt") == ("claude", "hi")
+
+
+def test_stream_fails_over_before_first_token():
+    stream = fake_stream({"llama": RuntimeError("throttled"), "claude": ["he", "llo"]})
+    tokens = []
+    router = LLMRouter(stream, unused, ["llama", "claude"])
+
+    assert router.generate("prompt", on_token=tokens.append) == ("claude", "hello")
+    assert tokens == ["he", "llo"]
+
+
+def test_every_model_failing_raises_llm_error():
+    invoke = fake_invoke({"llama": RuntimeError("throttled"), "claude": ValueError("bad request")})
+    router = LLMRouter(unused, invoke, ["llama", "claude"])
+    with pytest.raises(LLMError, match="llama: throttled; claude: bad request"):
+        router.generate("prompt")
+
+
+def test_timeout_fails_over_without_waiting_for_the_slow_model():
+    invoke = fake_invoke({"llama": 2.0, "claude": "fast"})
+    router = LLMRouter(unused, invoke, ["llama", "claude"], timeouts={"llama": 0.1, "claude": 5})
+
+    started = time.monotonic()
+    assert router.generate("prompt") == ("claude", "fast")
+    assert time.monotonic() - started < 1.0
+
+
+def test_every_model_timing_out_raises_llm_error():
+    invoke = fake_invoke({"llama": 1.0, "claude": 1.0})
+    router = LLMRouter(unused, invoke, ["llama", "claude"], timeouts={"llama": 0.05, "claude": 0.05})
+    with pytest.raises(LLMError, match="llama: timed out after 0.05s; claude: timed out after 0.05s"):
+        router.generate("prompt")
+
+
+def test_timed_out_stream_is_closed():
+    responses = {}
+    stream = fake_stream({"llama": "hang", "claude": ["ok"]}, responses)
+    router = LLMRouter(stream, unused, ["llama", "claude"], timeouts={"llama": 0.1, "claude": 5})
+
+    assert router.generate("prompt", on_token=lambda token: None) == ("claude", "ok")
+    assert responses["llama"].closed.wait(1)
+
+
+def test_hedge_starts_next_model_and_abandons_the_loser():
+    responses = {}
+    stream = fake_stream({"llama": "hang", "claude": ["quick"]}, responses)
+    router = LLMRouter(stream, unused, ["llama", "claude"], hedge_after=0.05)
+
+    started = time.monotonic()
+    assert router.generate("prompt", on_token=lambda token: None) == ("claude", "quick")
+    assert time.monotonic() - started < 1.0
+    # The abandoned call's stream is closed as soon as the other model wins
+    assert responses["llama"].closed.wait(1)
+    assert not responses["claude"].closed.is_set()
+
+
+def test_no_hedge_once_the_first_model_is_streaming():
+    responses = {}
+    stream = fake_stream({"llama": ["a", 0.2, "b"], "claude": ["other"]}, responses)
+    router = LLMRouter(stream, unused, ["llama", "claude"], hedge_after=0.05)
+
+    assert router.generate("prompt", on_token=lambda token: None) == ("llama", "ab")
+    assert "claude" not in responses
+
+
+def test_failure_after_first_token_is_not_swapped():
+    stream = fake_stream({"llama": ["par", RuntimeError("connection reset")], "claude": ["whole"]})
+    tokens = []
+    router = LLMRouter(stream, unused, ["llama", "claude"])
+
+    with pytest.raises(LLMError, match="llama failed part-way"):
+        router.generate("prompt", on_token=tokens.append)
+    assert tokens == ["par"]
+
+
+def test_timeout_after_first_token_raises():
+    stream = fake_stream({"llama": ["par", 1.0, "tial"], "claude": ["whole"]})
+    router = LLMRouter(stream, unused, ["llama", "claude"], timeouts={"llama": 0.1})
+    with pytest.raises(LLMError, match="llama timed out after 0.1s part-way"):
+        router.generate("prompt", on_token=lambda token: None)
+
+
+def test_on_token_exception_propagates_unchanged():
+    class Cancelled(Exception):
+        pass
+
+    def on_token(token):
+        raise Cancelled()
+
+    router = LLMRouter(fake_stream({"llama": ["a", "b"]}), unused, ["llama"])
+    with pytest.raises(Cancelled):
+        router.generate("prompt", on_token=on_token)
+
+
+def test_routes_questions_and_edits_to_their_models():
+    invoke = fake_invoke({"llama": "from llama", "claude": "from claude"})
+    router = LLMRouter(unused, invoke, ["llama", "claude"], read_model="llama", edit_model="claude")
+
+    assert router.plan(edit=True) == ["claude", "llama"]
+    assert router.generate("prompt") == ("llama", "from llama")
+    assert router.generate("prompt", edit=True) == ("claude", "from claude")
+
+
+def test_from_env_rejects_unknown_models(monkeypatch):
+    monkeypatch.setenv("LLM_MODEL", "gpt")
+    with pytest.raises(ValueError, match="Unknown model 'gpt'"):
+        LLMRouter.from_env(unused, unused)
@@ -0,0 +1,29 @@
+from memory import ConversationMemory
+from prompt_builder import RetrievedChunk, estimate_tokens
+
+
+def test_memory_rolls_old_turns_into_a_bounded_summary():
+    memory = ConversationMemory(token_budget=300, summary_budget=60)
+    for n in range(20):
+        memory.add_interaction(f"question {n}", [], f"answer {n} " + "words " * 40)
+
+    assert sum(turn["tokens"] for turn in memory.history) <= 300
+    assert memory.history[-1]["user_input"] == "question 19"
+    assert estimate_tokens(memory.summary) <= 60
+    # The summary keeps the most recent of the folded turns
+    assert "question 0" not in memory.summary
+    assert f"question {19 - len(memory.history)}" in memory.summary
+
+    prompt_history = memory.get_history_for_prompt(n=2)
+    assert prompt_history[0] == {"summary": memory.summary}
+    assert [turn["user_input"] for turn in prompt_history[1:]] == ["question 18", "question 19"]
+
+
+def test_memory_keeps_an_oversized_latest_turn_and_elides_file_bodies():
+    memory = ConversationMemory(token_budget=10)
+    response = '<file_update path="a.py">\n' + "x = 1\n" * 500 + "</file_update>"
+    memory.add_interaction("rewrite a.py", [RetrievedChunk("1", "a.py", "x = 1\nx = 2\n", 1, 2, 0.5)], response)
+
+    turn = memory.history[-1]
+    assert turn["assistant_response"] == '<file_update path="a.py">[500 lines]</file_update>'
+    assert turn["context_refs"] == [("a.py", 1, 2)]
@@ -0,0 +1,40 @@
+from prompt_builder import PromptBuilder, RetrievedChunk, estimate_tokens, format_chunk
+
+
+def chunk(chunk_id, path, start, end, score, text=None):
+    text = text if text is not None else "".join(f"line {n} of {path}\n" for n in range(start, end + 1))
+    return RetrievedChunk(chunk_id, path, text, start, end, score)
+
+
+def test_build_merges_adjacent_chunks_and_drops_covered_ones():
+    chunks = [
+        chunk("1", "a.py", 1, 3, 0.9),
+        chunk("2", "a.py", 4, 6, 0.5),
+        chunk("3", "a.py", 2, 3, 0.4),  # inside chunk 1
+        chunk("4", "b.py", 1, 2, 0.7),
+    ]
+    context, prompt, used = PromptBuilder(token_budget=4000).build("explain", chunks)
+
+    assert [(c.path, c.start_line, c.end_line) for c in used] == [("a.py", 1, 6), ("b.py", 1, 2)]
+    assert context.count("line 2 of a.py") == 1
+    assert prompt == "User: explain"
+
+
+def test_build_admits_chunks_by_score_within_budget():
+    big = "x" * 2000
+    chunks = [chunk("low", "low.py", 1, 1, 0.1, big), chunk("high", "high.py", 1, 1, 0.9, big)]
+    budget = 150 + 10 + estimate_tokens("q") + estimate_tokens(format_chunk(chunks[1])) + 1
+    _, _, used = PromptBuilder(token_budget=budget).build("q", chunks)
+    assert [c.chunk_id for c in used] == ["high"]
+
+
+def test_build_keeps_newest_history_within_its_share():
+    history = [{"summary": "earlier things"}] + [
+        {"user_input": f"question {n}", "assistant_response": "a" * 400} for n in range(10)
+    ]
+    _, prompt, _ = PromptBuilder(token_budget=1000, history_share=0.25).build("now", [], history)
+
+    assert "question 9" in prompt and "question 8" in prompt
+    assert "question 0" not in prompt and "earlier things" not in prompt
+    assert estimate_tokens(prompt) <= 250 + estimate_tokens("User: now") + 1
+    assert prompt.endswith("User: now")
@@ -0,0 +1,46 @@
+from repo_scanner import IgnoreRules, iter_source_files
+
+
+def make_repo(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.log\n/build-output/\ndocs/*.md\n!docs/keep.md\n")
+    (tmp_path / "src" / "gen").mkdir(parents=True)
+    (tmp_path / "src" / ".gitignore").write_text("gen/\n")
+    (tmp_path / "src" / "app.py").write_text("x = 1\n")
+    (tmp_path / "src" / "gen" / "out.py").write_text("x = 2\n")
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "skip.md").write_text("skip\n")
+    (tmp_path / "docs" / "keep.md").write_text("keep\n")
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "index.js").write_text("x\n")
+    return tmp_path
+
+
+def test_root_and_nested_gitignore_rules(tmp_path):
+    rules = IgnoreRules(make_repo(tmp_path))
+
+    assert rules.is_ignored("debug.log")
+    assert rules.is_ignored("src/deep/trace.log")
+    assert rules.is_ignored("build-output", is_dir=True)
+    # Anchored to the root: a nested directory of the same name is kept
+    assert not rules.is_ignored("src/build-output", is_dir=True)
+    assert rules.is_ignored("docs/skip.md")
+    assert not rules.is_ignored("docs/keep.md")
+    # src/.gitignore applies below src/ only
+    assert rules.is_ignored("src/gen/out.py")
+    assert not rules.is_ignored("gen/out.py")
+    assert not rules.is_ignored("src/app.py")
+
+
+def test_default_excludes_and_paths_outside_repo(tmp_path):
+    rules = IgnoreRules(make_repo(tmp_path))
+
+    assert rules.is_ignored("node_modules/lib/index.js")
+    assert rules.is_ignored("bundle.min.js")
+    assert rules.is_ignored("../elsewhere.py")
+    assert not rules.is_ignored("")
+
+
+def test_iter_source_files_prunes_ignored_directories(tmp_path):
+    repo = make_repo(tmp_path)
+    found = [path[len(str(repo)) + 1:] for path in iter_source_files(repo, (".py", ".md", ".js"))]
+    assert found == ["docs/keep.md", "src/app.py"]
@@ -0,0 +1,63 @@
+from prompt_builder import RetrievedChunk
+from reranker import Reranker
+
+
+def chunk(chunk_id, path, text, start=1, end=10):
+    return RetrievedChunk(chunk_id, path, text, start, end, 0.0)
+
+
+def test_unrelated_candidates_are_dropped():
+    chunks = [chunk("1", "a.py", "def render_page(): pass"), chunk("2", "b.py", "class Html: pass")]
+    reranker = Reranker(min_relevance=0.2)
+
+    assert reranker.select("database migration rollback", chunks, k=5) == []
+    assert reranker.select("database migration rollback", chunks, k=5, signals=[0.05, 0.1]) == []
+    assert reranker.select("anything", [], k=5) == []
+
+
+def test_scores_are_absolute_relevance():
+    chunks = [chunk("1", "a.py", "def rollback(): restore backups"), chunk("2", "b.py", "def other(): pass")]
+    selected = Reranker(lexical_weight=0.3).select("rollback backups", chunks, k=5, signals=[0.8, 0.3])
+
+    assert [c.chunk_id for c in selected][0] == "1"
+    # 0.7 * cosine + 0.3 * query-term coverage
+    assert abs(selected[0].score - (0.7 * 0.8 + 0.3 * 1.0)) < 1e-9
+    assert all(0.0 <= c.score <= 1.0 for c in selected)
+
+
+def test_caps_chunks_per_file():
+    chunks = [chunk(str(n), "a.py", f"parse token {n}", start=n * 100, end=n * 100 + 10) for n in range(5)]
+    chunks.append(chunk("other", "b.py", "parse token elsewhere"))
+    selected = Reranker(max_per_file=2, gap=1.0).select("parse token", chunks, k=5, signals=[0.9] * 6)
+
+    paths = [c.path for c in selected]
+    assert paths.count("a.py") == 2
+    assert "b.py" in paths
+
+
+def test_cuts_at_first_large_gap_after_min_k():
+    chunks = [chunk(str(n), f"{n}.py", f"cache entry {n}") for n in range(6)]
+    signals = [0.9, 0.88, 0.86, 0.5, 0.48, 0.46]
+    selected = Reranker(min_k=2, gap=0.15).select("cache entry", chunks, k=6, signals=signals)
+    assert [c.chunk_id for c in selected] == ["0", "1", "2"]
+
+    # A gap inside the first min_k chunks does not end the list
+    selected = Reranker(min_k=4, gap=0.15).select("cache entry", chunks, k=6, signals=signals)
+    assert len(selected) == 6
+
+
+def test_mmr_prefers_a_different_file_over_an_overlapping_window():
+    chunks = [
+        chunk("1", "a.py", "load config file", start=1, end=20),
+        chunk("2", "a.py", "load config file values", start=15, end=35),
+        chunk("3", "b.py", "load config defaults", start=1, end=20),
+    ]
+    selected = Reranker(gap=1.0).select("load config", chunks, k=2, signals=[0.9, 0.88, 0.85])
+    assert [c.chunk_id for c in selected] == ["1", "3"]
+
+
+def test_disabled_returns_top_k_unchanged():
+    chunks = [chunk(str(n), "a.py", "x") for n in range(5)]
+    reranker = Reranker(enabled=False, overfetch=3)
+    assert reranker.select("q", chunks, k=2) == chunks[:2]
+    assert reranker.candidates(4) == 4
@@ -0,0 +1,47 @@
+import response_cache
+from response_cache import TTLCache, make_cache_key, normalize_prompt
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache("test", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache("test", max_entries=4, ttl=10)
+    cache.put("a", 1)
+
+    now[0] += 9.9
+    assert cache.get("a") == 1
+    now[0] += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_entries_disables_the_cache():
+    cache = TTLCache("test", max_entries=0)
+    cache.put("a", 1)
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_from_env_overrides_defaults(monkeypatch):
+    monkeypatch.setenv("TEST_CACHE_MAX_ENTRIES", "7")
+    monkeypatch.setenv("TEST_CACHE_TTL", "0")
+    cache = TTLCache.from_env("test", "TEST_CACHE", max_entries=512, ttl=3600)
+    assert (cache.max_entries, cache.ttl) == (7, None)
+
+
+def test_keys_ignore_case_and_spacing_but_not_content():
+    assert normalize_prompt("  What does\n  foo DO? ") == "what does foo do?"
+    assert make_cache_key("a", ["b", "c"]) == make_cache_key("a", ("b", "c"))
+    assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+import pytest
+import session_engine
+from file_operations import FileChange
+from prompt_builder import RetrievedChunk
+from response_cache import TTLCache
+from session_engine import SessionEngine
+
+
+class FakeIndex:
+    def __init__(self):
+        self.refreshed = []
+        self.saved = 0
+
+    def search(self, query, k=8):
+        return [RetrievedChunk("c1", "app.py", "def handler():\n    pass\n", 1, 2, 0.9)]
+
+    def refresh(self, paths):
+        self.refreshed.append(paths)
+        return paths
+
+    def save(self):
+        self.saved += 1
+
+
+class FakeLLM:
+    """Replaces ask_llm: streams `tokens`, then "applies" `changes`, unless a token callback raised."""
+
+    def __init__(self, tokens, model="llama", changes=(), token_delay=0.0):
+        self.tokens = tokens
+        self.model = model
+        self.changes = list(changes)
+        self.token_delay = token_delay
+        self.calls = 0
+        self.applied = False
+        self.first_token = threading.Event()
+
+    def __call__(self, context, prompt, repo_path, changes=None, on_token=None, models=None):
+        self.calls += 1
+        for token in self.tokens:
+            on_token(token)
+            self.first_token.set()
+            time.sleep(self.token_delay)
+        self.applied = True
+        changes.extend(self.changes)
+        models.append(self.model)
+        return "".join(self.tokens)
+
+
+@pytest.fixture
+def make_engine(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_READ_MODEL", raising=False)
+    monkeypatch.delenv("LLM_EDIT_MODEL", raising=False)
+    monkeypatch.setenv("LLM_MODEL", "llama")
+    engines = []
+
+    def make(llm, cache=None):
+        monkeypatch.setattr(session_engine, "ask_llm", llm)
+        if cache is None:
+            cache = TTLCache("test", max_entries=16)
+        engine = SessionEngine(FakeIndex(), str(tmp_path), cache=cache)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close(wait_for_reindex=False)
+
+
+def test_edited_files_are_reindexed_in_the_background(make_engine, tmp_path):
+    path = str(tmp_path / "app.py")
+    llm = FakeLLM(['<file_update path="app.py">x = 1</file_update>'],
+                  changes=[FileChange(path, "updated", "a", "b", [(1, 1)])])
+    engine = make_engine(llm)
+
+    result = engine.ask("Rename handler")
+    engine.close()
+
+    assert result.changes[0].path == path
+    assert engine.index.refreshed == [[path]]
+    assert engine.index.saved == 1
+    assert len(engine.memory.history) == 1
+
+
+def test_close_can_be_called_twice(make_engine):
+    engine = make_engine(FakeLLM(["ok"]))
+    engine.ask("Explain handler")
+
+    closer = threading.Thread(target=lambda: (engine.close(), engine.close()))
+    closer.start()
+    closer.join(5)
+    assert not closer.is_alive()
+
+
+def test_cancel_stops_the_turn_before_files_are_applied(make_engine):
+    llm = FakeLLM(["a", "b", "c", "d"], token_delay=0.1)
+    engine = make_engine(llm)
+
+    def cancel_after_first_token():
+        llm.first_token.wait(5)
+        engine.cancel()
+
+    threading.Thread(target=cancel_after_first_token).start()
+    with pytest.raises(CancelledError):
+        engine.ask("Explain handler")
+
+    # The worker notices the cancel at its next token
+    time.sleep(0.3)
+    assert llm.calls == 1
+    assert not llm.applied
+    assert engine.memory.history == []
+    # The session stays usable
+    llm.token_delay = 0.0
+    assert engine.ask("Explain handler").response == "abcd"
+
+
+def test_a_repeated_question_is_answered_from_the_cache(make_engine):
+    cache = TTLCache("test", max_entries=16)
+    llm = FakeLLM(["It ", "handles requests."])
+    first = make_engine(llm, cache).ask("What does handler do?")
+
+    streamed = []
+    second = make_engine(llm, cache).ask("what does  handler do?", on_token=streamed.append)
+
+    assert llm.calls == 1
+    assert second.response == first.response == "It handles requests."
+    assert streamed == ["It handles requests."]
+
+
+def test_answers_that_edit_files_are_not_cached(make_engine, tmp_path):
+    cache = TTLCache("test", max_entries=16)
+    llm = FakeLLM(['<file_update path="app.py">x = 1</file_update>'],
+                  changes=[FileChange(str(tmp_path / "app.py"), "updated", "a", "b", [(1, 1)])])
+
+    make_engine(llm, cache).ask("Rename handler")
+    make_engine(llm, cache).ask("Rename handler")
+
+    assert llm.calls == 2
+    assert len(cache) == 0
+
+
+def test_a_fallback_models_answer_is_not_replayed_as_the_first_choice(make_engine):
+    cache = TTLCache("test", max_entries=16)
+    llm = FakeLLM(["From claude."], model="claude")
+
+    make_engine(llm, cache).ask("What does handler do?")
+    make_engine(llm, cache).ask("What does handler do?")
+
+    assert llm.calls == 2
+    # Stored for the model that gave it
+    assert len(cache) == 1
@@ -0,0 +1,84 @@
+import math
+import os
+
+# Index types selectable via VECTOR_INDEX_TYPE, smallest recall loss first:
+#   flat   - exact search, 4 bytes per dimension
+#   int8   - 8-bit scalar quantization, 1 byte per dimension
+#   pq     - product quantization, dimensions/16 bytes per vector
+#   ivf    - inverted file over exact vectors, sublinear search
+#   ivf_pq - inverted file over PQ codes, sublinear search and smallest memory
+INDEX_TYPES = ("flat", "int8", "pq", "ivf", "ivf_pq")
+TRAINED_INDEX_TYPES = ("int8", "pq", "ivf", "ivf_pq")
+# Vectors gathered before a trained index is created
+TRAINING_SIZE = 20_000
+# Below this many training vectors PQ/IVF codebooks are unreliable
+MIN_TRAINING_VECTORS = 1_000
+
+
+def index_type_from_env() -> str:
+    index_type = os.getenv("VECTOR_INDEX_TYPE", "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE {index_type!r}, expected one of {INDEX_TYPES}")
+    return index_type
+
+
+def _pq_subquantizers(dimensions):
+    # 16 dimensions per sub-quantizer, and it must divide the vector size
+    m = max(1, dimensions // 16)
+    while dimensions % m:
+        m -= 1
+    return m
+
+
+def create_faiss_index(index_type, dimensions, training_vectors=None, nprobe=8):
+    """
+    Build an empty FAISS index that accepts explicit int64 ids.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        dimensions: Vector size
+        training_vectors: float32 array of shape (n, dimensions), required
+            for the quantized and IVF types
+        nprobe: Inverted lists probed per IVF query (recall vs. speed)
+
+    Returns:
+        (index, actual_index_type); falls back to "flat" when there are too
+        few training vectors for the requested type
+    """
+    import faiss
+
+    if index_type in TRAINED_INDEX_TYPES and index_type != "int8":
+        if training_vectors is None or len(training_vectors) < MIN_TRAINING_VECTORS:
+            print(f"Too few vectors to train a {index_type} index, using flat")
+            index_type = "flat"
+
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimensions)), index_type
+    if index_type == "int8":
+        if training_vectors is None or not len(training_vectors):
+            return faiss.IndexIDMap2(faiss.IndexFlatL2(dimensions)), "flat"
+        base = faiss.IndexScalarQuantizer(dimensions, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        base.train(training_vectors)
+        return faiss.IndexIDMap2(base), index_type
+    if index_type == "pq":
+        base = faiss.IndexPQ(dimensions, _pq_subquantizers(dimensions), 8, faiss.METRIC_L2)
+        base.train(training_vectors)
+        return faiss.IndexIDMap2(base), index_type
+
+    # IVF: ~4*sqrt(n) lists, with at least ~39 training points per list
+    nlist = max(1, min(int(4 * math.sqrt(len(training_vectors))), len(training_vectors) // 39))
+    quantizer = faiss.IndexFlatL2(dimensions)
+    if index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dimensions, nlist, faiss.METRIC_L2)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimensions, nlist, _pq_subquantizers(dimensions), 8)
+    index.train(training_vectors)
+    index.nprobe = min(nprobe, nlist)
+    # IVF indexes accept explicit ids natively
+    return index, index_type
+
+
+def index_memory_bytes(index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory."""
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)